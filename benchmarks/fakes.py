@@ -0,0 +1,207 @@
+# benchmarks/fakes.py
+import re
+import json
+import time
+import asyncio
+import threading
+from collections import defaultdict, deque
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+from pydantic import PrivateAttr
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.runnables import RunnableLambda
+
+from src.components.researcher import normalize_tavily_response
+from src.components.search_scheduler import SearchProvider
+from src.utils.rate_limiter import TokenBucketRateLimiter
+
+from .fixtures import FixtureStore
+
+
+class FakeRateLimitError(Exception):
+    """Imita el 429 de Gemini para que el limitador adaptativo reaccione igual que en producción."""
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Modelo de chat determinista para benchmarks: responde con `responder(schema, prompt)`,
+    tarda `latency` segundos por llamada y, si se fija `requests_per_minute`, devuelve
+    un 429 al superar la cuota en una ventana deslizante de 60 s.
+    Informa `usage_metadata` (≈4 caracteres por token) como el modelo real.
+    """
+
+    responder: Callable[[Optional[str], str], Any]
+    latency: float = 0.05
+    requests_per_minute: Optional[int] = None
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _window: deque = PrivateAttr(default_factory=deque)
+    _calls: Dict[str, int] = PrivateAttr(default_factory=lambda: defaultdict(int))
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def calls(self) -> Dict[str, int]:
+        return dict(self._calls)
+
+    def with_structured_output(self, schema, **kwargs):
+        return self.bind(fake_schema=schema.__name__) | PydanticOutputParser(pydantic_object=schema)
+
+    def _check_quota(self) -> None:
+        if not self.requests_per_minute:
+            return
+        with self._lock:
+            now = time.monotonic()
+            while self._window and now - self._window[0] > 60:
+                self._window.popleft()
+            if len(self._window) >= self.requests_per_minute:
+                raise FakeRateLimitError("429 RESOURCE_EXHAUSTED: quota exceeded, retry in 1s")
+            self._window.append(now)
+
+    def _respond(self, messages: List[BaseMessage], schema: Optional[str]) -> ChatResult:
+        prompt = "\n".join(str(m.content) for m in messages)
+        output = self.responder(schema, prompt)
+        content = output if isinstance(output, str) else json.dumps(output, ensure_ascii=False)
+        with self._lock:
+            self._calls[schema or "text"] += 1
+        message = AIMessage(content=content, usage_metadata={
+            "input_tokens": len(prompt) // 4, "output_tokens": len(content) // 4,
+            "total_tokens": (len(prompt) + len(content)) // 4,
+        })
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, fake_schema: Optional[str] = None, **kwargs) -> ChatResult:
+        self._check_quota()
+        time.sleep(self.latency)
+        return self._respond(messages, fake_schema)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, fake_schema: Optional[str] = None, **kwargs) -> ChatResult:
+        self._check_quota()
+        await asyncio.sleep(self.latency)
+        return self._respond(messages, fake_schema)
+
+
+# --- Respuestas deterministas a partir de las fixtures ---
+
+_URL_PATTERN = re.compile(r"URL:\s*(\S+)")
+_BATCH_PATTERN = re.compile(r"\[(\d+)\][^\[]*?URL:\s*(\S+)", re.DOTALL)
+_EXTRACTOR_URL_PATTERN = re.compile(r"URL ORIGINAL:\s*(\S+)")
+_TITLE_PATTERN = re.compile(r"<h1>(.*?)</h1>|^(Convocatoria[^\n]*)", re.MULTILINE)
+_DEADLINE_PATTERN = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
+_ORIGINAL_PATTERN = re.compile(r"```json\s*(\{.*?\})\s*```", re.DOTALL)
+
+def make_responder(fixtures: FixtureStore) -> Callable[[Optional[str], str], Any]:
+    """Construye el `responder` del modelo falso para cada cadena del agente."""
+
+    def respond(schema: Optional[str], prompt: str) -> Any:
+        if schema is None:  # Generador de queries (salida JSON libre)
+            queries = fixtures.queries
+            pairs = [queries[i:i + 2] for i in range(0, len(queries), 2)]
+            return {"queries": [
+                {"idea": f"idea {i}", "international_query": pair[0], "national_query": pair[-1] if len(pair) > 1 else ""}
+                for i, pair in enumerate(pairs)
+            ]}
+        if schema == "ScrutinyResult":
+            match = _URL_PATTERN.search(prompt)
+            return {"is_relevant": fixtures.is_relevant(match.group(1)) if match else False}
+        if schema == "BatchScrutinyResult":
+            return {"verdicts": [
+                {"index": int(index), "is_relevant": fixtures.is_relevant(url)}
+                for index, url in _BATCH_PATTERN.findall(prompt)
+            ]}
+        if schema == "FundingOpportunityList":
+            match = _EXTRACTOR_URL_PATTERN.search(prompt)
+            url = match.group(1) if match else None
+            if not url or not fixtures.is_relevant(url):
+                return {"opportunities": []}
+            deadline = _DEADLINE_PATTERN.search(prompt)
+            requirements = ["Personas jurídicas colombianas"] if "Requisitos" in prompt else []
+            return {"opportunities": [{
+                "origin": f"Programa {url.rsplit('/', 1)[-1]} {url.split('/')[2]}",
+                "description": prompt[prompt.find("CONTEXTO:") + 9:][:300].strip(),
+                "application_deadline": deadline.group(0) if deadline else None,
+                "main_requirements": requirements,
+                "opportunity_url": url,
+            }]}
+        if schema == "FundingOpportunity":
+            match = _ORIGINAL_PATTERN.search(prompt)
+            try:
+                original = json.loads(match.group(1)) if match else {}
+            except json.JSONDecodeError:
+                original = {}
+            return {
+                "origin": original.get("origin") or "Desconocido",
+                "description": f"Refinada: {(original.get('description') or '')[:200]}",
+                "financing_type": "grant",
+                "main_requirements": ["Personas jurídicas colombianas"],
+                "application_deadline": original.get("application_deadline"),
+                "opportunity_url": original.get("opportunity_url"),
+            }
+        raise ValueError(f"Schema sin respuesta falsa: {schema}")
+
+    return respond
+
+
+# --- Buscadores, feeds y páginas grabados ---
+
+class CallCounter:
+    """Contador de llamadas por backend compartido por las fábricas falsas."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = defaultdict(int)
+
+    def add(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] += 1
+
+
+def make_search_providers_factory(fixtures: FixtureStore, counter: CallCounter, latency: float = 0.05,
+                                  requests_per_minute: int = 6000):
+    """Fábrica compatible con `create_search_providers`: un buscador que sirve las fixtures (formato Tavily)."""
+
+    def search(query: str) -> List[Dict]:
+        counter.add("search")
+        time.sleep(latency)
+        return fixtures.search_results(query)
+
+    async def asearch(query: str) -> List[Dict]:
+        counter.add("search")
+        await asyncio.sleep(latency)
+        return fixtures.search_results(query)
+
+    return lambda: [SearchProvider(
+        "fixtures", RunnableLambda(search, afunc=asearch, name="FakeSearch"), normalize_tavily_response,
+        requests_per_minute=requests_per_minute, rate_limiter=TokenBucketRateLimiter(requests_per_minute),
+        initial_latency=latency,
+    )]
+
+def make_rss_fetcher(fixtures: FixtureStore, counter: CallCounter):
+    """Sustituto de `fetch_and_limit_rss_feeds`."""
+    def fetch(rss_urls, limit_per_feed: int = 5) -> List[Dict]:
+        counter.add("rss")
+        return list(fixtures.rss)
+    return fetch
+
+def make_page_transport(fixtures: FixtureStore, counter: CallCounter, latency: float = 0.02) -> httpx.MockTransport:
+    """Transporte HTTP que sirve el HTML grabado (404 si la URL no está en las fixtures)."""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        counter.add("page")
+        await asyncio.sleep(latency)
+        html = fixtures.pages.get(str(request.url))
+        if html is None:
+            return httpx.Response(404, text="not found")
+        return httpx.Response(200, text=html, headers={"Content-Type": "text/html; charset=utf-8"})
+
+    return httpx.MockTransport(handler)
+
+def offline_url_finder(opportunity: Dict) -> Dict:
+    """Sustituto de `find_best_url`: sin red, la oportunidad se queda como está."""
+    return opportunity
@@ -0,0 +1,155 @@
+# benchmarks/fixtures.py
+import os
+import json
+import random
+import zlib
+from typing import Dict, List, Optional
+
+# Vocabulario para generar textos sintéticos distintos entre sí (el dedup por SimHash
+# trataría como duplicados textos casi iguales).
+_WORDS = (
+    "energía solar agua rural innovación salud educación biotecnología inteligencia artificial datos "
+    "clima agricultura sostenible movilidad eléctrica ciudades pesca océanos bosques minería hidrógeno "
+    "investigación desarrollo startups pymes universidades jóvenes mujeres comunidades indígenas región "
+    "caribe pacífico andina amazonía orinoquía exportación manufactura software robótica sensores satélites"
+).split()
+
+
+class FixtureStore:
+    """
+    Datos grabados (o sintéticos) que sustituyen a los servicios externos:
+    - `search`: consulta -> resultados en el formato de Tavily (title, url, content);
+    - `rss`: entradas ya normalizadas que devolvería la lectura de feeds;
+    - `pages`: URL -> HTML de la página;
+    - `relevant`: URL -> si la fuente es una convocatoria (lo que "decidiría" el LLM).
+
+    Se guarda como un directorio con un JSON por colección (ver `save` / `load`).
+    """
+
+    def __init__(self, search: Dict[str, List[Dict]], rss: List[Dict], pages: Dict[str, str],
+                 relevant: Optional[Dict[str, bool]] = None):
+        self.search = search
+        self.rss = rss
+        self.pages = pages
+        self.relevant = relevant or {}
+
+    @property
+    def queries(self) -> List[str]:
+        return list(self.search)
+
+    @property
+    def result_count(self) -> int:
+        return sum(len(results) for results in self.search.values()) + len(self.rss)
+
+    def search_results(self, query: str) -> List[Dict]:
+        # Las consultas desconocidas se reparten de forma estable entre las grabadas.
+        if query in self.search:
+            return self.search[query]
+        keys = sorted(self.search)
+        return self.search[keys[zlib.crc32(query.encode("utf-8")) % len(keys)]] if keys else []
+
+    def is_relevant(self, url: str) -> bool:
+        if url in self.relevant:
+            return self.relevant[url]
+        return zlib.crc32((url or "").encode("utf-8")) % 10 < 6
+
+    # --- Persistencia ---
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        for name in ("search", "rss", "pages", "relevant"):
+            with open(os.path.join(path, f"{name}.json"), "w", encoding="utf-8") as f:
+                json.dump(getattr(self, name), f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "FixtureStore":
+        def read(name, default):
+            file_path = os.path.join(path, f"{name}.json")
+            if not os.path.exists(file_path):
+                return default
+            with open(file_path, encoding="utf-8") as f:
+                return json.load(f)
+        return cls(read("search", {}), read("rss", []), read("pages", {}), read("relevant", {}))
+
+    # --- Cargas sintéticas ---
+
+    @classmethod
+    def synthetic(cls, n_results: int, n_queries: int = 10, relevant_ratio: float = 0.6,
+                  duplicate_ratio: float = 0.1, n_domains: int = 40, seed: int = 0) -> "FixtureStore":
+        """
+        Genera `n_results` resultados repartidos entre `n_queries` consultas (10% vía RSS).
+        Una fracción `duplicate_ratio` repite URLs ya vistas, como ocurre entre buscadores.
+        """
+        rng = random.Random(seed)
+        tag = f"w{n_results}s{seed}"
+        n_rss = n_results // 10
+        search: Dict[str, List[Dict]] = {f"synthetic query {i} {tag}": [] for i in range(n_queries)}
+        queries = list(search)
+        pages: Dict[str, str] = {}
+        relevant: Dict[str, bool] = {}
+        seen_urls: List[str] = []
+
+        def new_source(i: int) -> Dict:
+            words = rng.sample(_WORDS, 12)
+            is_call = rng.random() < relevant_ratio
+            kind = "convocatoria" if is_call else "noticia"
+            url = f"https://site{i % n_domains}.example/{tag}/{kind}/{i}"
+            title = f"{'Convocatoria' if is_call else 'Noticia'} {' '.join(words[:4])} {i}"
+            description = " ".join(words) + f" ({i})"
+            relevant[url] = is_call
+            pages[url] = _synthetic_page(title, description, i, is_call, rng)
+            seen_urls.append(url)
+            return {"title": title, "url": url, "content": description}
+
+        for i in range(n_results - n_rss):
+            if seen_urls and rng.random() < duplicate_ratio:
+                url = rng.choice(seen_urls)
+                result = {"title": f"Copia {i}", "url": url, "content": "resultado repetido"}
+            else:
+                result = new_source(i)
+            search[queries[i % n_queries]].append(result)
+
+        rss = []
+        for i in range(n_results - n_rss, n_results):
+            source = new_source(i)
+            rss.append({"title": source["title"], "url": source["url"], "description": source["content"]})
+        return cls(search, rss, pages, relevant)
+
+
+def _synthetic_page(title: str, description: str, i: int, is_call: bool, rng: random.Random) -> str:
+    paragraphs = "".join(f"<p>{' '.join(rng.choices(_WORDS, k=60))}</p>" for _ in range(8))
+    details = (
+        f"<h2>Requisitos</h2><p>Personas jurídicas colombianas. Monto máximo $ {100 + i} millones.</p>"
+        f"<h2>Fecha de cierre</h2><p>2099-{1 + i % 12:02d}-{1 + i % 28:02d}</p>"
+    ) if is_call else ""
+    return (
+        f"<html><head><title>{title}</title></head><body>"
+        f"<nav class='menu'>Inicio | Noticias | Contacto</nav>"
+        f"<main><h1>{title}</h1><p>{description}</p>{paragraphs}{details}</main>"
+        f"<footer>© Sitio {i}</footer></body></html>"
+    )
+
+
+def record_fixtures(project_input: Dict, path: str) -> FixtureStore:
+    """
+    Graba fixtures a partir de una ejecución REAL (consume cuota de Gemini y Tavily una vez):
+    consultas generadas, resultados de búsqueda, entradas RSS y el HTML de cada resultado.
+    """
+    from src.components.query_generator import create_query_generator_chain
+    from src.components.researcher import create_research_chain, fetch_and_limit_rss_feeds, RSS_FEEDS
+    from src.components.fetcher import fetch_page
+    from src.utils.normalizers import flatten_queries
+
+    queries = flatten_queries(create_query_generator_chain().invoke(project_input)["queries"])
+    research_chain = create_research_chain()
+    search = {q["query"]: research_chain.invoke(q).get("tavily", []) for q in queries}
+    rss = fetch_and_limit_rss_feeds(RSS_FEEDS, limit_per_feed=5)
+    pages = {}
+    for url in {r.get("url") for results in search.values() for r in results} | {e.get("url") for e in rss}:
+        try:
+            pages[url] = fetch_page(url).body.decode("utf-8", errors="replace")
+        except Exception as e:
+            print(f"  -> ⚠️ No se pudo grabar {url}: {e}")
+    store = FixtureStore(search, rss, pages)
+    store.save(path)
+    return store
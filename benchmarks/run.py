@@ -0,0 +1,168 @@
+# benchmarks/run.py
+"""
+Benchmark offline del agente (descubrimiento + enriquecimiento) sin consumir cuota.
+
+Reproduce búsquedas, feeds RSS y páginas desde fixtures (sintéticas o grabadas
+con `record_fixtures`) y sustituye Gemini por un modelo falso determinista con
+latencia y cuota configurables.
+
+Uso:
+    python -m benchmarks.run --sizes 10 100 1000
+    python -m benchmarks.run --fixtures ruta/a/fixtures --rpm 60 --output resultados.jsonl
+    python -m benchmarks.run --sizes 100 --max-llm-calls 20   # con presupuesto por ejecución
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import tracemalloc
+
+# Las rutas de datos se fijan al importar `settings`: usamos un directorio temporal
+# y desactivamos la caché de respuestas antes de importar el agente.
+os.environ.setdefault("FLOW_SEARCH_DATA_DIR", tempfile.mkdtemp(prefix="flow_search_bench_"))
+os.environ.setdefault("LLM_CACHE_BYPASS", "true")
+# Sin corte por idea: cada carga debe procesar todos sus resultados.
+os.environ.setdefault("SEARCH_MIN_URLS_PER_IDEA", str(10 ** 9))
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.components.query_generator import create_query_generator_chain
+from src.components.scrutinizer import create_scrutinizer_chain, create_batch_scrutinizer_chain
+from src.components.extractor import create_extractor_chain
+from src.components.enricher import create_deep_dive_chain
+from src.components.fetcher import use_fetch_transport
+from src.pipelines.discovery import create_discovery_pipeline
+from src.pipelines.enrichment import create_enrichment_orchestrator
+from src.utils.metrics import RunMetricsHandler, ITEM_RUN_PREFIX
+from src.utils.rate_limiter import TokenBucketRateLimiter
+from src.utils.budget import RunBudget, use_budget
+from src.utils.prompt_budget import get_prompt_token_stats
+
+from .fixtures import FixtureStore
+from .fakes import (
+    FakeChatModel, CallCounter, make_responder, make_search_providers_factory,
+    make_rss_fetcher, make_page_transport, offline_url_finder,
+)
+
+PROJECT_INPUT = {
+    "project_details": "Plataforma de monitoreo de energía solar para comunidades rurales del Caribe colombiano.",
+    "format_instructions": "Responde en JSON.",
+}
+
+
+class FirstOpportunityTimer(BaseCallbackHandler):
+    """Registra el instante en que termina el primer item enriquecido."""
+
+    def __init__(self):
+        self.first_at = None
+        self._items = set()
+
+    def on_chain_start(self, serialized, inputs, *, run_id, **kwargs):
+        if (kwargs.get("name") or "").startswith(ITEM_RUN_PREFIX):
+            self._items.add(run_id)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        if self.first_at is None and run_id in self._items and outputs is not None:
+            self.first_at = time.perf_counter()
+
+
+async def run_workload(fixtures: FixtureStore, args) -> dict:
+    counter = CallCounter()
+    llm = FakeChatModel(responder=make_responder(fixtures), latency=args.llm_latency,
+                        requests_per_minute=args.quota_rpm)
+    rate_limiter = TokenBucketRateLimiter(requests_per_minute=args.rpm)
+    use_fetch_transport(make_page_transport(fixtures, counter, args.page_latency))
+
+    discovery = create_discovery_pipeline(
+        query_generator_factory=lambda: create_query_generator_chain(llm),
+        search_providers_factory=make_search_providers_factory(fixtures, counter, args.search_latency),
+        rss_fetcher=make_rss_fetcher(fixtures, counter),
+        scrutinizer_factory=lambda: create_scrutinizer_chain(llm),
+        batch_scrutinizer_factory=lambda: create_batch_scrutinizer_chain(llm),
+        extractor_factory=lambda: create_extractor_chain(llm),
+        rate_limiter=rate_limiter,
+    )
+    enrichment = create_enrichment_orchestrator(
+        deep_dive_factory=lambda: create_deep_dive_chain(llm),
+        url_finder=offline_url_finder,
+        rate_limiter=rate_limiter,
+    )
+    pipeline = (
+        discovery.with_config({"run_name": "Stage 1: Discovery"})
+        | enrichment.with_config({"run_name": "Stage 2: Enrichment"})
+    )
+
+    metrics, timer = RunMetricsHandler(), FirstOpportunityTimer()
+    budget = RunBudget(args.max_llm_calls, args.max_tokens, args.max_wall_seconds)
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        with use_budget(budget):
+            opportunities = await pipeline.ainvoke(PROJECT_INPUT, config={"callbacks": [metrics, timer]})
+    finally:
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        use_fetch_transport(None)
+
+    summary = metrics.summary()
+    return {
+        "results": fixtures.result_count,
+        "opportunities": len(opportunities),
+        "end_to_end_seconds": round(elapsed, 3),
+        "time_to_first_opportunity_seconds": round(timer.first_at - started, 3) if timer.first_at else None,
+        "peak_memory_mb": round(peak / 2 ** 20, 2),
+        "llm_calls": llm.calls,
+        "backend_calls": dict(counter.counts),
+        "budget": budget.summary(),
+        "stages": {
+            name: {k: round(v, 3) for k, v in values.items()}
+            for name, values in summary["stages"].items()
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline del agente de oportunidades.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000],
+                        help="Número de resultados de búsqueda de cada carga sintética.")
+    parser.add_argument("--fixtures", help="Directorio con fixtures grabadas (ignora --sizes).")
+    parser.add_argument("--rpm", type=int, default=600, help="Cuota del limitador del agente (peticiones/min).")
+    parser.add_argument("--quota-rpm", type=int, default=None, help="Cuota real del modelo falso (429 al superarla).")
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--search-latency", type=float, default=0.05)
+    parser.add_argument("--page-latency", type=float, default=0.02)
+    parser.add_argument("--max-llm-calls", type=int, default=0, help="Límite de llamadas al LLM por ejecución (0 = sin límite).")
+    parser.add_argument("--max-tokens", type=int, default=0, help="Límite de tokens estimados por ejecución (0 = sin límite).")
+    parser.add_argument("--max-wall-seconds", type=float, default=0, help="Límite de tiempo por ejecución (0 = sin límite).")
+    parser.add_argument("--output", help="Añade los resultados como JSON lines a este fichero.")
+    args = parser.parse_args(argv)
+
+    workloads = [("fixtures", FixtureStore.load(args.fixtures))] if args.fixtures else [
+        (f"synthetic-{size}", FixtureStore.synthetic(size)) for size in args.sizes
+    ]
+    reports = []
+    for name, fixtures in workloads:
+        print(f"\n===== Benchmark: {name} ({fixtures.result_count} resultados) =====")
+        report = {"workload": name, **asyncio.run(run_workload(fixtures, args))}
+        reports.append(report)
+        if args.output:
+            with open(args.output, "a", encoding="utf-8") as f:
+                f.write(json.dumps(report, ensure_ascii=False) + "\n")
+
+    print("\n===== Resumen =====")
+    print(f"{'carga':<18}{'result.':>8}{'opps':>6}{'total s':>9}{'1ª opp s':>10}{'LLM':>6}{'pico MB':>9}")
+    for r in reports:
+        first = r["time_to_first_opportunity_seconds"]
+        print(f"{r['workload']:<18}{r['results']:>8}{r['opportunities']:>6}{r['end_to_end_seconds']:>9.2f}"
+              f"{(f'{first:.2f}' if first is not None else '-'):>10}{sum(r['llm_calls'].values()):>6}{r['peak_memory_mb']:>9.1f}")
+    print("\n===== Tokens de entrada por cadena (todas las cargas) =====")
+    print(get_prompt_token_stats().report())
+    return reports
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
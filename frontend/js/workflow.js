@@ -49,11 +49,22 @@ document.addEventListener('DOMContentLoaded', () => {
     ];
 
     // --- FUNCIONES DE RENDERIZADO ---
+    // Títulos, descripciones y URLs llegan de páginas de terceros: se escapan antes de ir a innerHTML
+    function escapeHtml(value) {
+        return String(value ?? '').replace(/[&<>"']/g, c => ({ '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' }[c]));
+    }
+    // Solo enlaces http(s) (o '#'); cualquier otro esquema (javascript:, data:...) se descarta
+    function safeUrl(url) {
+        return /^(https?:\/\/|#)/i.test(String(url ?? '').trim()) ? escapeHtml(String(url).trim()) : '#';
+    }
     function renderContextItems(data) {
-        return `<p>${data.length} items de contexto encontrados:</p><ul class="results-list">${data.map(r => `<li><a href="${r.url}" target="_blank">${r.title}</a><p>${r.description}</p></li>`).join('')}</ul>`;
+        return `<p>${data.length} items de contexto encontrados:</p><ul class="results-list">${data.map(r => `<li><a href="${safeUrl(r.url)}" target="_blank" rel="noopener noreferrer">${escapeHtml(r.title)}</a><p>${escapeHtml(r.description)}</p></li>`).join('')}</ul>`;
     }
     function renderOpportunities(data) {
-        return `<div class="opportunities-list">${data.map(o => `<div class="opportunity-card"><h4>${o.origin}</h4><p>${o.description}</p><div class="opportunity-meta"><span class="financing-type">${o.financing_type}</span> | <span><strong>Fecha Límite:</strong> ${o.application_deadline}</span></div></div>`).join('')}</div>`;
+        return `<div class="opportunities-list">${data.map(o => `<div class="opportunity-card"><h4>${escapeHtml(o.origin)}</h4><p>${escapeHtml(o.description)}</p><div class="opportunity-meta"><span class="financing-type">${escapeHtml(o.financing_type || 'Sin especificar')}</span> | <span><strong>Fecha Límite:</strong> ${escapeHtml(o.application_deadline || 'Sin especificar')}</span></div></div>`).join('')}</div>`;
+    }
+    function renderError(message) {
+        return `<p class="error-message">No se pudo completar la investigación: ${escapeHtml(message)}</p>`;
     }
     function renderReportLink(data) {
         return `<div><p>El reporte ejecutivo ha sido generado y está listo para su revisión.</p><br><a href="${data.reportUrl}" class="report-link" target="_blank"><svg xmlns="http://www.w3.org/2000/svg" width="16" height="16" fill="currentColor" viewBox="0 0 16 16"><path d="M10.854 7.854a.5.5 0 0 0-.708-.708L7.5 9.793 6.354 8.646a.5.5 0 1 0-.708.708l1.5 1.5a.5.5 0 0 0 .708 0l3-3z"/><path d="M14 14V4.5L9.5 0H4a2 2 0 0 0-2 2v12a2 2 0 0 0 2 2h8a2 2 0 0 0 2-2zM9.5 1.5L13 5H9.5V1.5z"/></svg> Ver Reporte_Deforestacion_IA_2025.pdf</a></div>`;
@@ -83,41 +94,147 @@ document.addEventListener('DOMContentLoaded', () => {
          });
     }
 
+    function setStepStatus(stepId, status) {
+        const stepElement = document.getElementById(`step-${stepId}`);
+        const statusElement = stepElement.querySelector('.step-status');
+        stepElement.classList.toggle('active', status === 'active');
+        stepElement.classList.toggle('completed', status === 'completed');
+        statusElement.className = `step-status ${status}`;
+    }
+
+    // Crea (o actualiza) la pestaña de resultados de un paso en el panel del flujo
+    function upsertResultSection(stepId, name, html) {
+        let resultSection = dom.resultsContent.querySelector(`.result-section[data-step="${stepId}"]`);
+        if (!resultSection) {
+            resultSection = document.createElement('div');
+            resultSection.className = 'result-section';
+            resultSection.dataset.step = stepId;
+            dom.resultsContent.appendChild(resultSection);
+
+            const tabButton = document.createElement('button');
+            tabButton.className = 'tab-btn';
+            tabButton.dataset.step = stepId;
+            tabButton.textContent = name;
+            tabButton.addEventListener('click', () => showResultInWorkflow(stepId));
+            dom.resultsTabs.appendChild(tabButton);
+        }
+        resultSection.innerHTML = html;
+        showResultInWorkflow(stepId);
+    }
+
     async function simulateWorkflow() {
         // Limpiar el placeholder inicial del panel de resultados
         dom.resultsContent.innerHTML = '';
         
         for (const step of steps) {
-            const stepElement = document.getElementById(`step-${step.id}`);
-            const statusElement = stepElement.querySelector('.step-status');
-            
-            stepElement.classList.add('active');
-            statusElement.className = 'step-status active';
+            setStepStatus(step.id, 'active');
 
             await delay(step.duration);
 
             // Crear contenido para el panel de resultados del flujo
             if (step.id !== 'queries') { // No crear pestaña para el primer paso
-                const resultSection = document.createElement('div');
-                resultSection.className = 'result-section';
-                resultSection.dataset.step = step.id;
-                resultSection.innerHTML = step.render(step.data);
-                dom.resultsContent.appendChild(resultSection);
-
-                const tabButton = document.createElement('button');
-                tabButton.className = 'tab-btn';
-                tabButton.dataset.step = step.id;
-                tabButton.textContent = step.name;
-                tabButton.addEventListener('click', () => showResultInWorkflow(step.id));
-                dom.resultsTabs.appendChild(tabButton);
-                showResultInWorkflow(step.id);
+                upsertResultSection(step.id, step.name, step.render(step.data));
             }
 
-            stepElement.classList.remove('active');
-            stepElement.classList.add('completed');
-            statusElement.className = 'step-status completed';
+            setStepStatus(step.id, 'completed');
         }
 
+        await finishWorkflow(searchResults, identifiedOpportunities);
+    }
+
+    // --- EJECUCIÓN REAL: servicio del agente (python -m src.server) con Server-Sent Events ---
+
+    // Runs con nombre del agente -> paso de la línea de tiempo
+    const STAGE_STEPS = {
+        'Recalling Known Opportunities': 'search',
+        'Generating Queries': 'queries',
+        'Performing Research (Web + RSS)': 'search',
+        'Deduplicating Results': 'search',
+        'Scrutinizing Results': 'identification',
+        'Extracting Opportunities': 'identification',
+        'Resolving Duplicate Opportunities': 'identification',
+        'Stage 2: Enrichment': 'identification',
+        'Formatting Final Output': 'report',
+    };
+    const STEP_ORDER = steps.map(s => s.id);
+    const API_BASE = window.FLOW_SEARCH_API || '';
+
+    // Fallo al contactar con el servicio (antes de que empiece la ejecución): se recurre a la simulación
+    class ServiceUnavailableError extends Error {}
+
+    async function runLiveWorkflow() {
+        let response;
+        try {
+            response = await fetch(`${API_BASE}/api/runs`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    project_details: `${projectInfo.title}\n${projectInfo.description}\nPalabras clave: ${projectInfo.keywords.join(', ')}`
+                })
+            });
+        } catch (error) {
+            throw new ServiceUnavailableError(error.message);
+        }
+        if (!response.ok) throw new ServiceUnavailableError(`El servicio respondió ${response.status}`);
+        const { run_id } = await response.json();
+
+        dom.resultsContent.innerHTML = '';
+        let sources = [];
+        const opportunities = [];
+        let currentStep = -1;
+
+        // Activa un paso y da por completados los anteriores
+        function advanceTo(stepId) {
+            const index = STEP_ORDER.indexOf(stepId);
+            if (index <= currentStep) return;
+            STEP_ORDER.slice(0, index).forEach(id => setStepStatus(id, 'completed'));
+            setStepStatus(stepId, 'active');
+            currentStep = index;
+        }
+
+        const result = await new Promise((resolve, reject) => {
+            const events = new EventSource(`${API_BASE}/api/runs/${run_id}/events`);
+            let connected = false;
+            events.addEventListener('open', () => { connected = true; });
+            events.addEventListener('stage', e => {
+                const data = JSON.parse(e.data);
+                if (STAGE_STEPS[data.name] && data.status === 'started') advanceTo(STAGE_STEPS[data.name]);
+            });
+            events.addEventListener('sources', e => {
+                sources = JSON.parse(e.data);
+                upsertResultSection('search', 'Resultados', renderContextItems(sources));
+            });
+            events.addEventListener('item', () => advanceTo('identification'));
+            events.addEventListener('opportunity', e => {
+                opportunities.push(JSON.parse(e.data));
+                upsertResultSection('identification', 'Oportunidades', renderOpportunities(opportunities));
+            });
+            events.addEventListener('done', e => {
+                events.close();
+                resolve(JSON.parse(e.data));
+            });
+            events.addEventListener('error', e => {
+                // Un 'error' sin datos es un corte de conexión: EventSource reconecta solo (Last-Event-ID)
+                if (e.data) {
+                    events.close();
+                    reject(new Error(JSON.parse(e.data).message));
+                } else if (events.readyState === EventSource.CLOSED) {
+                    // El navegador no reintentará (respuesta no válida del servicio)
+                    reject(connected ? new Error('Se perdió la conexión con el servicio') : new ServiceUnavailableError('No se pudo abrir el flujo de eventos'));
+                }
+            });
+        });
+
+        // El resultado final incluye también las oportunidades conocidas que no se re-enriquecieron
+        const finalOpportunities = result.opportunities.length ? result.opportunities : opportunities;
+        upsertResultSection('identification', 'Oportunidades', renderOpportunities(finalOpportunities));
+        advanceTo('report');
+        upsertResultSection('report', 'Reporte', renderReportLink({ reportUrl: '#' }));
+        setStepStatus('report', 'completed');
+        await finishWorkflow(sources, finalOpportunities);
+    }
+
+    async function finishWorkflow(contextItems, opportunities) {
         await delay(1500); // Pequeña pausa antes de la transición
         
         // MEJORA: Ocultar el panel del flujo de trabajo con una transición
@@ -129,9 +246,9 @@ document.addEventListener('DOMContentLoaded', () => {
             title: projectInfo.title, // El título completo se mantiene en los datos
             summary: projectInfo.summary, // El resumen se usa para la tarjeta
             date: projectInfo.creationDate,
-            opportunitiesCount: identifiedOpportunities.length,
-            contexto: renderContextItems(searchResults),
-            oportunidades: renderOpportunities(identifiedOpportunities),
+            opportunitiesCount: opportunities.length,
+            contexto: renderContextItems(contextItems),
+            oportunidades: renderOpportunities(opportunities),
             reportes: renderReportLink({ reportUrl: '#' })
         };
         completedResearches.push(finalData);
@@ -192,7 +309,24 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // --- INICIO DE LA APLICACIÓN ---
     loadProjectInfo();
-    simulateWorkflow(); // Inicia la simulación al cargar la página
+    // Servida por el servicio del agente se ejecuta de verdad; abierta como fichero, se simula
+    if (location.protocol.startsWith('http')) {
+        runLiveWorkflow().catch(error => {
+            if (error instanceof ServiceUnavailableError) {
+                console.warn('No se pudo usar el servicio del agente, se muestra la simulación:', error);
+                simulateWorkflow();
+                return;
+            }
+            // La ejecución real empezó y falló: se muestra el error en vez de datos simulados
+            console.error('La ejecución del agente falló:', error);
+            STEP_ORDER.forEach(id => {
+                if (document.getElementById(`step-${id}`).classList.contains('active')) setStepStatus(id, 'error');
+            });
+            upsertResultSection('error', 'Error', renderError(error.message));
+        });
+    } else {
+        simulateWorkflow();
+    }
     
     // Event listener para las pestañas de la sección de detalles
     dom.detailsTabs.addEventListener('click', (e) => {
@@ -1,60 +1,95 @@
 import time
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough, RunnableLambda
+from langchain_core.runnables import RunnableLambda
+from langchain_core.language_models import BaseChatModel
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_community.document_loaders import WebBaseLoader
 from langchain_community.tools.tavily_search import TavilySearchResults
 
 from ..schemas.models import FundingOpportunity # ¡Importamos el schema de salida!
 from ..config import settings
+from .fetcher import fetch_page_content, afetch_page_content
+from ..utils.llm_cache import with_response_cache
+from ..utils.prompt_budget import compact_json, with_prompt_budget, with_token_accounting
 
 # --- PASO 1: Lógica para obtener el contenido de la mejor fuente ---
 
-def get_best_content(opportunity: Dict[str, Any]) -> Dict[str, Any]:
+def find_best_url(opportunity: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Toma una oportunidad, busca la mejor URL si es necesario, la scrapea,
-    y devuelve la oportunidad original junto con el contenido de la página.
+    Si la oportunidad no trae URL, busca en la web la página oficial más probable
+    y la guarda en `opportunity_url`.
     """
-    content = "No se pudo cargar contenido relevante."
-    target_url = opportunity.get("opportunity_url")
+    if opportunity.get("opportunity_url"):
+        return opportunity
+
+    print(f"  ->  URL no encontrada para '{opportunity.get('origin')}'. Buscando en la web...")
+    try:
+        search_tool = TavilySearchResults(max_results=1)
+        query = f"funding opportunity official page {opportunity.get('origin')} {opportunity.get('description', '')[:100]}"
+        search_results = search_tool.invoke(query)
+        if search_results and search_results[0].get("url"):
+            target_url = search_results[0]["url"]
+            print(f"  -> URL encontrada: {target_url}")
+            # Actualizamos la URL en la oportunidad original para el siguiente paso
+            opportunity["opportunity_url"] = target_url
+    except Exception as e:
+        print(f"  -> ⚠️ Error durante la búsqueda: {e}")
+    return opportunity
+
+def _content_query(opportunity: Dict[str, Any]) -> str:
+    # Las secciones más parecidas a la oportunidad preliminar son las que queremos conservar.
+    return f"{opportunity.get('origin') or ''} {opportunity.get('description') or ''}"
 
-    # Si no hay una URL, intentamos encontrar una
-    if not target_url:
-        print(f"  ->  URL no encontrada para '{opportunity.get('origin')}'. Buscando en la web...")
+def load_page_content(opportunity: Dict[str, Any]) -> Dict[str, Any]:
+    """Scrapea la `opportunity_url` (si existe) y guarda el texto en `page_content`."""
+    target_url = opportunity.get("opportunity_url")
+    if target_url:
         try:
-            search_tool = TavilySearchResults(max_results=1)
-            query = f"funding opportunity official page {opportunity.get('origin')} {opportunity.get('description', '')[:100]}"
-            search_results = search_tool.invoke(query)
-            if search_results and search_results[0].get("url"):
-                target_url = search_results[0]["url"]
-                print(f"  -> URL encontrada: {target_url}")
-                # Actualizamos la URL en la oportunidad original para el siguiente paso
-                opportunity["opportunity_url"] = target_url
+            print(f"  -> Scrapeando: {target_url}")
+            # Conservamos solo las secciones más relevantes dentro del presupuesto de tokens
+            opportunity["page_content"] = fetch_page_content(target_url, settings.ENRICHER_CONTENT_TOKENS, _content_query(opportunity))
         except Exception as e:
-            print(f"  -> ⚠️ Error durante la búsqueda: {e}")
+            print(f"  -> ⚠️ Error al scrapear {target_url}: {e}")
+            opportunity["page_content"] = "Error al cargar el contenido de la página."
+    else:
+        opportunity["page_content"] = "No se pudo encontrar una URL para scrapear."
+    return opportunity
 
-    # Si tenemos una URL (original o encontrada), la scrapeamos
+async def aload_page_content(opportunity: Dict[str, Any]) -> Dict[str, Any]:
+    """Versión asíncrona de `load_page_content` sobre el cliente HTTP compartido."""
+    target_url = opportunity.get("opportunity_url")
     if target_url:
         try:
             print(f"  -> Scrapeando: {target_url}")
-            loader = WebBaseLoader(target_url)
-            docs = loader.load()
-            content = " ".join([doc.page_content for doc in docs])
-            # Limitamos el contenido para no exceder los límites de tokens del LLM
-            opportunity["page_content"] = content[:15000]
+            opportunity["page_content"] = await afetch_page_content(target_url, settings.ENRICHER_CONTENT_TOKENS, _content_query(opportunity))
         except Exception as e:
             print(f"  -> ⚠️ Error al scrapear {target_url}: {e}")
             opportunity["page_content"] = "Error al cargar el contenido de la página."
     else:
         opportunity["page_content"] = "No se pudo encontrar una URL para scrapear."
-
     return opportunity
 
+def get_best_content(opportunity: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Toma una oportunidad, busca la mejor URL si es necesario, la scrapea,
+    y devuelve la oportunidad original junto con el contenido de la página.
+    """
+    return load_page_content(find_best_url(opportunity))
+
 
 # --- PASO 2: Lógica del LLM para refinar la información ---
 
-def create_deep_dive_chain():
+def build_refinement_inputs(opportunity: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Entradas del prompt de refinamiento: la oportunidad preliminar UNA sola vez,
+    en JSON compacto y sin el contenido de la página, que va en su propio campo.
+    """
+    return {
+        "original_opportunity": compact_json(opportunity, exclude=("page_content", "source_url")),
+        "page_content": opportunity.get("page_content") or "",
+    }
+
+def create_deep_dive_chain(llm: Optional[BaseChatModel] = None):
     """
     Crea una cadena que usa un LLM para analizar el contenido de una página
     y refinar los detalles de una oportunidad de financiación.
@@ -62,24 +97,28 @@ def create_deep_dive_chain():
     refinement_prompt = ChatPromptTemplate.from_messages([
         ("system",
         """Eres un analista de investigación experto y meticuloso.
-        Tu tarea es tomar una oportunidad de financiación preliminar y, basándote en el contenido detallado de su página web, verificar, completar y refinar la información.
-        - Corrige cualquier dato incorrecto en la oportunidad original.
-        - Completa los campos que estén vacíos (como `application_deadline` o `main_requirements`) si encuentras la información en el texto.
-        - Mejora la `description` para que sea más precisa y concisa.
-        - Asegúrate de que `opportunity_url` sea el enlace más directo y relevante.
-        - Si la página menciona múltiples convocatorias, enfócate únicamente en la que más se parezca a la oportunidad original.
-        - Responde únicamente con el formato JSON solicitado."""),
+Tu tarea es tomar una oportunidad de financiación preliminar y, basándote en el contenido detallado de su página web, verificar, completar y refinar la información.
+- Corrige cualquier dato incorrecto en la oportunidad original.
+- Completa los campos que estén vacíos (como `application_deadline` o `main_requirements`) si encuentras la información en el texto.
+- Mejora la `description` para que sea más precisa y concisa.
+- Asegúrate de que `opportunity_url` sea el enlace más directo y relevante.
+- Si la página menciona múltiples convocatorias, enfócate únicamente en la que más se parezca a la oportunidad original.
+- Responde únicamente con el formato JSON solicitado."""),
         ("human",
         """Aquí está la información que debes analizar:
 
-        **1. Oportunidad Preliminar (Datos Originales):**
-        ```json
-        {original_opportunity}
-        {page_content}
-        Ahora, por favor, refina la oportunidad basándote en el contenido de la página.""")
+**1. Oportunidad Preliminar (Datos Originales):**
+```json
+{original_opportunity}
+```
+
+**2. Contenido de la Página Web:**
+{page_content}
+
+Ahora, por favor, refina la oportunidad basándote en el contenido de la página.""")
     ])
 
-    llm = ChatGoogleGenerativeAI(
+    llm = llm or ChatGoogleGenerativeAI(
         model="gemini-1.5-flash",
         api_key=settings.GEMINI_API_KEY,
         temperature=0.1
@@ -90,11 +129,13 @@ def create_deep_dive_chain():
 
     # Creamos la cadena que alimenta el prompt y llama al LLM
     chain = (
-        RunnablePassthrough.assign(
-            original_opportunity=RunnableLambda(lambda x: x) # Pasamos la oportunidad completa
+        RunnableLambda(build_refinement_inputs)
+        | with_response_cache(
+            with_prompt_budget(refinement_prompt, "deep_dive", settings.DEEP_DIVE_MAX_INPUT_TOKENS, ("page_content",),
+                               query=lambda x: x["original_opportunity"]),
+            with_token_accounting(structured_llm, "deep_dive"),
+            chain_name="deep_dive", model_name="gemini-1.5-flash", temperature=0.1, output_schema=FundingOpportunity
         )
-        | refinement_prompt
-        | structured_llm
     )
 
     return chain
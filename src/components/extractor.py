@@ -1,10 +1,18 @@
+from typing import Optional
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableLambda
+from langchain_core.language_models import BaseChatModel
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_community.document_loaders import WebBaseLoader
 
 from ..schemas.models import FundingOpportunityList
+from .fetcher import fetch_page_content, afetch_page_content
 from ..config import settings
+from ..utils.llm_cache import with_response_cache
+from ..utils.prompt_budget import with_prompt_budget, with_token_accounting
+
+def _content_query(item: dict) -> str:
+    # El título y la descripción del resultado guían qué secciones de la página conservar.
+    return f"{item.get('title') or ''} {item.get('description') or ''}"
 
 def scrape_content(item: dict) -> dict:
     """
@@ -12,16 +20,22 @@ def scrape_content(item: dict) -> dict:
     Maneja errores de forma robusta.
     """
     try:
-        loader = WebBaseLoader(item["url"])
-        docs = loader.load()
-        content = " ".join([doc.page_content for doc in docs])
-        item["page_content"] = content[:10000] 
+        item["page_content"] = fetch_page_content(item["url"], settings.EXTRACTOR_CONTENT_TOKENS, _content_query(item))
+    except Exception as e:
+        print(f"  -> ⚠️ Error al scrapear {item['url']}: {e}")
+        item["page_content"] = "Error al cargar el contenido de la página."
+    return item
+
+async def ascrape_content(item: dict) -> dict:
+    """Versión asíncrona de `scrape_content` sobre el cliente HTTP compartido."""
+    try:
+        item["page_content"] = await afetch_page_content(item["url"], settings.EXTRACTOR_CONTENT_TOKENS, _content_query(item))
     except Exception as e:
         print(f"  -> ⚠️ Error al scrapear {item['url']}: {e}")
         item["page_content"] = "Error al cargar el contenido de la página."
     return item
 
-def create_extractor_chain():
+def create_extractor_chain(llm: Optional[BaseChatModel] = None):
     """
     Crea una cadena que toma contenido de una página y extrae UNA LISTA de oportunidades.
     """
@@ -33,11 +47,13 @@ def create_extractor_chain():
 Tu tarea es leer el contenido de una página web y extraer la información clave de TODAS las convocatorias, subvenciones o grants que encuentres.
 Debes devolver una lista, incluso si encuentras una sola oportunidad o ninguna.
 Si un dato específico (como la fecha límite o la URL de la convocatoria) no se encuentra en el texto, omite ese campo.
+Cuando aparezcan, extrae también los requisitos principales y la fecha límite (YYYY-MM-DD).
+Si la convocatoria se describe en esta misma página, usa la URL ORIGINAL como `opportunity_url`.
 Como mínimo, cada oportunidad debe tener un origen y una descripción."""),
         ("human", "Aquí está el contenido de la página:\n\nCONTEXTO:\n{page_content}\n\nURL ORIGINAL:\n{url}")
     ])
     
-    llm = ChatGoogleGenerativeAI(
+    llm = llm or ChatGoogleGenerativeAI(
         model="gemini-1.5-flash",
         api_key=settings.GEMINI_API_KEY,
         temperature=0
@@ -46,7 +62,12 @@ Como mínimo, cada oportunidad debe tener un origen y una descripción."""),
     #  Usamos el modelo de lista para la salida estructurada
     structured_llm = llm.with_structured_output(FundingOpportunityList)
     
-    extractor_chain = extractor_prompt | structured_llm
+    extractor_chain = with_response_cache(
+        with_prompt_budget(extractor_prompt, "extractor", settings.EXTRACTOR_MAX_INPUT_TOKENS, ("page_content",),
+                           query=_content_query),
+        with_token_accounting(structured_llm, "extractor"),
+        chain_name="extractor", model_name="gemini-1.5-flash", temperature=0, output_schema=FundingOpportunityList
+    )
     
     return extractor_chain
 
@@ -55,5 +76,5 @@ def create_full_extraction_pipeline():
     Encapsula el scraping y la extracción en un único pipeline.
     """
     extractor = create_extractor_chain()
-    scraper_runnable = RunnableLambda(scrape_content)
+    scraper_runnable = RunnableLambda(scrape_content, afunc=ascrape_content)
     return scraper_runnable | extractor
\ No newline at end of file
@@ -0,0 +1,234 @@
+# src/components/fetcher.py
+import re
+import time
+import asyncio
+import threading
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+from ..config import settings
+from ..utils.page_cache import get_page_cache, CachedPage
+from ..utils.document_parser import (
+    reduce_document, areduce_document, adocument_to_text,
+    reduce_document_isolated, document_to_text_isolated, pdf_extractor_available,
+)
+from ..utils.metrics import record_metric, arecord_metric
+
+# --- API única de descarga de páginas (usada por el extractor y el enricher) ---
+
+DEFAULT_HEADERS = {
+    "User-Agent": settings.HTTP_USER_AGENT,
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "es-CO,es;q=0.9,en;q=0.8",
+}
+
+TEXT_CONTENT_TYPES = ("text/", "application/xhtml", "application/xml", "application/rss", "application/atom", "application/json")
+# Documentos binarios de los que sí se extrae el texto (en el pool de procesos).
+DOCUMENT_CONTENT_TYPES = ("application/pdf", "application/x-pdf")
+
+# Firmas de los primeros bytes de formatos binarios que no tiene sentido parsear.
+BINARY_SIGNATURES = (b"\x89PNG", b"\xff\xd8\xff", b"GIF8", b"PK\x03\x04", b"\xd0\xcf\x11\xe0", b"\x1f\x8b")
+
+class UnsupportedContentError(Exception):
+    """La URL apunta a un contenido binario sin extractor de texto (imagen, ZIP, documento de Office...)."""
+
+
+class _FetchService:
+    """
+    Cliente HTTP asíncrono compartido por todo el proceso.
+
+    Vive en su propio event loop (hilo en segundo plano) para que tanto el código
+    async como el síncrono reutilicen el mismo pool de conexiones keep-alive.
+    Limita conexiones globales y por host, y corta la lectura en cuanto se tiene
+    el texto que el LLM va a ver.
+    """
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="fetch-service", daemon=True)
+        self._thread.start()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._transport: Optional[httpx.AsyncBaseTransport] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            try:
+                import h2  # noqa: F401
+                http2 = True
+            except ImportError:
+                http2 = False
+            self._client = httpx.AsyncClient(
+                headers=DEFAULT_HEADERS,
+                follow_redirects=True,
+                http2=http2,
+                transport=self._transport,
+                timeout=httpx.Timeout(settings.FETCH_READ_TIMEOUT, connect=settings.FETCH_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=settings.FETCH_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.FETCH_MAX_CONNECTIONS // 2,
+                ),
+            )
+        return self._client
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc.lower()
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(settings.FETCH_MAX_PER_HOST)
+        return self._host_semaphores[host]
+
+    async def _fetch(self, url: str, max_age: Optional[float] = None) -> CachedPage:
+        cache = get_page_cache()
+        cached = await asyncio.to_thread(cache.get, url)
+        if cached and cached.is_fresh(settings.PAGE_CACHE_FRESH_SECONDS if max_age is None else max_age):
+            return cached
+
+        headers = {}
+        if cached and cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached and cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+
+        async with self._host_semaphore(url):
+            async with self._get_client().stream("GET", url, headers=headers) as response:
+                if response.status_code == 304 and cached:
+                    await asyncio.to_thread(cache.touch, url)
+                    return cached
+                response.raise_for_status()
+                content_type = response.headers.get("Content-Type")
+                if content_type and not content_type.lower().startswith(TEXT_CONTENT_TYPES + DOCUMENT_CONTENT_TYPES):
+                    raise UnsupportedContentError(f"Contenido no soportado ({content_type}): {url}")
+                body, truncated = await _read_limited(response)
+
+        if body.startswith(BINARY_SIGNATURES):
+            raise UnsupportedContentError(f"Contenido binario detectado: {url}")
+        # Los validadores describen el cuerpo completo: con uno truncado, un 304 futuro
+        # perpetuaría la copia parcial. Sin ellos, al caducar se vuelve a descargar.
+        etag = None if truncated else response.headers.get("ETag")
+        last_modified = None if truncated else response.headers.get("Last-Modified")
+        content_hash = await asyncio.to_thread(cache.put, url, body, content_type, etag, last_modified)
+        return CachedPage(url, body, content_type, etag, last_modified, content_hash, time.time(), len(body))
+
+    def set_transport(self, transport: Optional[httpx.AsyncBaseTransport]) -> None:
+        """Cambia el transporte del cliente; el cliente anterior se cierra en el loop del servicio."""
+        old_client, self._client, self._transport = self._client, None, transport
+        if old_client is not None:
+            asyncio.run_coroutine_threadsafe(old_client.aclose(), self._loop)
+
+    def submit(self, url: str, timeout: Optional[float] = None, max_age: Optional[float] = None):
+        """Programa la descarga en el loop del servicio y devuelve un `concurrent.futures.Future`."""
+        coro = asyncio.wait_for(self._fetch(url, max_age), timeout or settings.FETCH_TOTAL_TIMEOUT)
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+
+_TAG_PATTERN = re.compile(rb"<script.*?</script>|<style.*?</style>|<[^>]+>", re.DOTALL | re.IGNORECASE)
+
+async def _read_limited(response: httpx.Response) -> Tuple[bytes, bool]:
+    """
+    Lee el cuerpo por trozos y se detiene cuando el texto visible estimado ya cubre
+    `FETCH_MAX_TEXT_CHARS` (o al llegar a `FETCH_MAX_BYTES`). Devuelve el cuerpo y
+    si quedó truncado.
+    Los PDFs no admiten lectura parcial: se leen enteros hasta `FETCH_MAX_PDF_BYTES`
+    (y se rechazan de entrada si no hay extractor de PDF instalado).
+    """
+    chunks, size, next_check = [], 0, 64 * 1024
+    max_bytes, is_pdf, truncated = settings.FETCH_MAX_BYTES, False, False
+    async for chunk in response.aiter_bytes():
+        if not chunks and (chunk.startswith(b"%PDF") or
+                           (response.headers.get("Content-Type") or "").lower().startswith(DOCUMENT_CONTENT_TYPES)):
+            if not pdf_extractor_available():
+                raise UnsupportedContentError(f"PDF sin extractor instalado (pymupdf o pypdf): {response.url}")
+            max_bytes, is_pdf = settings.FETCH_MAX_PDF_BYTES, True
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= max_bytes:
+            if is_pdf:
+                raise UnsupportedContentError(f"PDF mayor de {max_bytes // 2 ** 20} MB: {response.url}")
+            truncated = True
+            break
+        if not is_pdf and size >= next_check:
+            next_check = size + 64 * 1024
+            visible = len(_TAG_PATTERN.sub(b" ", b"".join(chunks)).split())
+            # Aproximamos ~6 caracteres por palabra visible.
+            if visible * 6 >= settings.FETCH_MAX_TEXT_CHARS * 1.5:
+                truncated = True
+                break
+    body = b"".join(chunks)
+    return body[:max_bytes], truncated or len(body) > max_bytes
+
+
+_service: Optional[_FetchService] = None
+_service_lock = threading.Lock()
+
+def _get_service() -> _FetchService:
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = _FetchService()
+        return _service
+
+def use_fetch_transport(transport: Optional[httpx.AsyncBaseTransport]) -> None:
+    """
+    Sustituye el transporte HTTP del cliente compartido, p. ej. por un
+    `httpx.MockTransport` que sirve páginas grabadas en los benchmarks offline.
+    Con `None` se vuelve a la red real.
+    """
+    _get_service().set_transport(transport)
+
+async def afetch_page(url: str, timeout: Optional[float] = None, max_age: Optional[float] = None) -> CachedPage:
+    """
+    Devuelve la página pasando por la caché persistente.
+    - Si la copia local es reciente (menos de `max_age` segundos, por defecto
+      `PAGE_CACHE_FRESH_SECONDS`), no se toca la red.
+    - Si está caducada, se revalida con If-None-Match / If-Modified-Since y un 304
+      reutiliza el cuerpo guardado. Con `max_age=0` siempre se revalida.
+    Lanza una excepción si la página no se puede obtener ni hay copia en caché,
+    o `UnsupportedContentError` si el contenido es binario.
+    """
+    try:
+        page = await asyncio.wrap_future(_get_service().submit(url, timeout, max_age))
+    except Exception:
+        await arecord_metric("fetch_errors")
+        raise
+    await arecord_metric("http_bytes", page.network_bytes)
+    await arecord_metric("page_cache_misses" if page.network_bytes else "page_cache_hits")
+    return page
+
+def fetch_page(url: str, timeout: Optional[float] = None) -> CachedPage:
+    """Versión síncrona de `afetch_page` (comparte el mismo pool de conexiones)."""
+    try:
+        page = _get_service().submit(url, timeout).result()
+    except Exception:
+        record_metric("fetch_errors")
+        raise
+    record_metric("http_bytes", page.network_bytes)
+    record_metric("page_cache_misses" if page.network_bytes else "page_cache_hits")
+    return page
+
+# El parseo (BeautifulSoup, PDFs) es trabajo de CPU: los documentos grandes se
+# procesan en el pool de procesos de `document_parser` para no frenar al resto.
+
+async def afetch_page_text(url: str) -> str:
+    """Descarga (o recupera de la caché) una página y devuelve su texto plano."""
+    page = await afetch_page(url)
+    return await adocument_to_text(page.body, page.content_type, url)
+
+def fetch_page_text(url: str) -> str:
+    """Versión síncrona de `afetch_page_text`."""
+    page = fetch_page(url)
+    return document_to_text_isolated(page.body, page.content_type, url)
+
+def reduce_page(page: CachedPage, max_tokens: int, query: str = "") -> str:
+    """Quita el boilerplate y empaqueta las secciones más relevantes en `max_tokens`."""
+    return reduce_document(page.body, page.content_type, page.url, max_tokens, query)
+
+async def afetch_page_content(url: str, max_tokens: int, query: str = "") -> str:
+    """Descarga la página y devuelve solo el contenido relevante que cabe en el presupuesto."""
+    page = await afetch_page(url)
+    return await areduce_document(page.body, page.content_type, page.url, max_tokens, query)
+
+def fetch_page_content(url: str, max_tokens: int, query: str = "") -> str:
+    """Versión síncrona de `afetch_page_content`."""
+    page = fetch_page(url)
+    return reduce_document_isolated(page.body, page.content_type, page.url, max_tokens, query)
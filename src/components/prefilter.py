@@ -0,0 +1,252 @@
+# src/components/prefilter.py
+import os
+import re
+import json
+import math
+import zlib
+import random
+import threading
+from collections import Counter, deque
+from typing import List, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from ..config import settings
+
+# --- SECCIÓN DE REGLAS POR URL / DOMINIO ---
+
+# Dominios que casi nunca son una convocatoria directa (prensa, redes, academia).
+REJECT_DOMAINS = {
+    "eltiempo.com", "elespectador.com", "semana.com", "portafolio.co", "larepublica.co",
+    "bbc.com", "reuters.com", "nytimes.com", "theguardian.com", "forbes.com", "techcrunch.com",
+    "medium.com", "substack.com", "wordpress.com", "blogspot.com",
+    "linkedin.com", "facebook.com", "twitter.com", "x.com", "instagram.com", "youtube.com",
+    "wikipedia.org", "researchgate.net", "sciencedirect.com", "springer.com", "arxiv.org",
+    "scholar.google.com", "crunchbase.com",
+}
+REJECT_PATH_PATTERN = re.compile(r"/(blog|blogs|news|noticias|noticia|prensa|press|articulo|articles?|opinion|eventos?)(/|$)", re.IGNORECASE)
+ACCEPT_PATH_PATTERN = re.compile(
+    r"/(convocatorias?|grants?|funding[-_]opportunit(y|ies)|call[-_]for[-_]proposals|calls?[-_]for[-_]applications|"
+    r"oportunidades[-_]de[-_]financiacion|financiacion|fondos?[-_]concursables)(/|$)",
+    re.IGNORECASE,
+)
+ACCEPT_DOMAINS = {"grants.gov", "grantforward.com"}
+
+def _domain(url: str) -> str:
+    netloc = urlparse(url or "").netloc.lower()
+    return netloc[4:] if netloc.startswith("www.") else netloc
+
+def _matches_domain(domain: str, candidates: set) -> bool:
+    return any(domain == d or domain.endswith("." + d) for d in candidates)
+
+def classify_by_rules(result: Dict) -> Optional[bool]:
+    """Decide por reglas de URL/dominio. Devuelve None si ninguna regla es concluyente."""
+    url = result.get("url") or ""
+    domain = _domain(url)
+    path = urlparse(url).path
+    reject = _matches_domain(domain, REJECT_DOMAINS) or bool(REJECT_PATH_PATTERN.search(path))
+    accept = _matches_domain(domain, ACCEPT_DOMAINS) or bool(ACCEPT_PATH_PATTERN.search(path))
+    if accept and not reject:
+        return True
+    if reject and not accept:
+        return False
+    return None
+
+
+# --- SECCIÓN DE PUNTUACIÓN POR PALABRAS CLAVE ---
+
+POSITIVE_KEYWORDS = [
+    "convocatoria", "convocatorias", "grant", "grants", "funding opportunity", "call for proposals",
+    "call for applications", "financiación", "financiacion", "subvención", "subvencion", "términos de referencia",
+    "terminos de referencia", "fecha de cierre", "fecha límite", "deadline", "postulación", "postulaciones",
+    "apply now", "how to apply", "eligibility", "requisitos", "cofinanciación", "fondo", "premio", "award",
+]
+NEGATIVE_KEYWORDS = [
+    "noticia", "noticias", "news", "blog", "artículo", "articulo", "opinión", "opinion", "entrevista",
+    "interview", "paper", "journal", "revista", "ranking", "directorio", "directory", "top 10", "podcast",
+    "webinar", "curso", "course", "empleo", "job",
+]
+
+def _count_hits(text: str, keywords: List[str]) -> int:
+    return sum(1 for k in keywords if re.search(r"\b" + re.escape(k) + r"\b", text))
+
+def keyword_score(result: Dict) -> float:
+    """
+    Puntuación en [-1, 1]: positiva si abundan términos de convocatoria, negativa si
+    abundan términos de contenido secundario. Los aciertos en el título pesan el doble.
+    """
+    title = (result.get("title") or "").lower()
+    description = (result.get("description") or "").lower()
+    positives = 2 * _count_hits(title, POSITIVE_KEYWORDS) + _count_hits(description, POSITIVE_KEYWORDS)
+    negatives = 2 * _count_hits(title, NEGATIVE_KEYWORDS) + _count_hits(description, NEGATIVE_KEYWORDS)
+    return (positives - negatives) / (positives + negatives + 1)
+
+
+def relevance_signal(result: Dict, model: Optional["TfidfLogisticModel"] = None) -> float:
+    """
+    Señal continua de relevancia en [0, 1] para priorizar el trabajo: 1/0 si una
+    regla es concluyente; si no, la probabilidad del modelo aprendido o, sin
+    modelo, la puntuación de palabras clave reescalada.
+    """
+    decision = classify_by_rules(result)
+    if decision is not None:
+        return 1.0 if decision else 0.0
+    if model is not None:
+        return model.predict_proba(result)
+    return (keyword_score(result) + 1) / 2
+
+
+# --- SECCIÓN DEL MODELO APRENDIDO (TF-IDF + REGRESIÓN LOGÍSTICA) ---
+
+_TOKEN_PATTERN = re.compile(r"[a-záéíóúñü0-9]{3,}")
+
+def _tokenize(result: Dict) -> List[str]:
+    url = result.get("url") or ""
+    text = " ".join([result.get("title") or "", result.get("description") or "", urlparse(url).path.replace("-", " ")])
+    tokens = _TOKEN_PATTERN.findall(text.lower())
+    return tokens + ["domain:" + _domain(url)]
+
+class TfidfLogisticModel:
+    """
+    Clasificador pequeño entrenado con las decisiones pasadas del escrutador LLM.
+    Usa rasgos TF-IDF con hashing y regresión logística por descenso de gradiente,
+    sin dependencias externas.
+    """
+
+    def __init__(self, n_features: int = 2 ** 16, epochs: int = 15, learning_rate: float = 0.5, l2: float = 1e-4):
+        self.n_features = n_features
+        self.epochs = epochs
+        self.learning_rate = learning_rate
+        self.l2 = l2
+        self.idf: Dict[int, float] = {}
+        self.weights: Dict[int, float] = {}
+        self.bias = 0.0
+
+    def _hash(self, token: str) -> int:
+        return zlib.crc32(token.encode("utf-8")) % self.n_features
+
+    def _vectorize(self, result: Dict) -> Dict[int, float]:
+        counts = Counter(self._hash(t) for t in _tokenize(result))
+        vector = {h: (1 + math.log(c)) * self.idf.get(h, 1.0) for h, c in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {h: v / norm for h, v in vector.items()}
+
+    def fit(self, results: List[Dict], labels: List[bool]) -> "TfidfLogisticModel":
+        document_frequency = Counter()
+        for result in results:
+            document_frequency.update({self._hash(t) for t in _tokenize(result)})
+        n = len(results)
+        self.idf = {h: math.log((1 + n) / (1 + df)) + 1 for h, df in document_frequency.items()}
+
+        samples = [(self._vectorize(r), 1.0 if y else 0.0) for r, y in zip(results, labels)]
+        rng = random.Random(0)
+        for _ in range(self.epochs):
+            rng.shuffle(samples)
+            for vector, y in samples:
+                error = self._sigmoid(vector) - y
+                self.bias -= self.learning_rate * error
+                for h, v in vector.items():
+                    w = self.weights.get(h, 0.0)
+                    self.weights[h] = w - self.learning_rate * (error * v + self.l2 * w)
+        return self
+
+    def _sigmoid(self, vector: Dict[int, float]) -> float:
+        z = self.bias + sum(self.weights.get(h, 0.0) * v for h, v in vector.items())
+        return 1 / (1 + math.exp(-max(min(z, 30), -30)))
+
+    def predict_proba(self, result: Dict) -> float:
+        return self._sigmoid(self._vectorize(result))
+
+
+def record_scrutiny_decision(result: Dict, is_relevant: bool, path: str = settings.SCRUTINY_DECISIONS_PATH) -> None:
+    """Guarda una decisión del escrutador LLM para entrenar el modelo local."""
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "title": result.get("title"),
+                "url": result.get("url"),
+                "description": (result.get("description") or "")[:1000],
+                "is_relevant": is_relevant,
+            }, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"  -> ⚠️ No se pudo registrar la decisión de escrutinio: {e}")
+
+# Último modelo entrenado por histórico: (firma del fichero, modelo).
+_trained_models: Dict[Tuple[str, int], Tuple[Tuple[int, int], Optional[TfidfLogisticModel]]] = {}
+_trained_models_lock = threading.Lock()
+
+def load_trained_model(path: str = settings.SCRUTINY_DECISIONS_PATH, max_examples: int = 5000) -> Optional[TfidfLogisticModel]:
+    """
+    Entrena el modelo con las últimas `max_examples` decisiones del histórico.
+    Devuelve None si no hay datos suficientes. El modelo se reutiliza mientras el
+    fichero no cambie (mismo tamaño y fecha de modificación). Bloquea mientras
+    lee y entrena: desde código async, llamarlo con `asyncio.to_thread`.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _trained_models_lock:
+        cached = _trained_models.get((path, max_examples))
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        results, labels = [], []
+        with open(path, encoding="utf-8") as f:
+            for line in deque(f, maxlen=max_examples):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                results.append(record)
+                labels.append(bool(record.get("is_relevant")))
+        # Necesitamos ejemplos de ambas clases para que el modelo sea útil.
+        if len(results) < settings.PREFILTER_MIN_TRAINING_EXAMPLES or len(set(labels)) < 2:
+            model = None
+        else:
+            model = TfidfLogisticModel().fit(results, labels)
+        _trained_models[(path, max_examples)] = (signature, model)
+        return model
+
+
+# --- SECCIÓN DE LA CASCADA ---
+
+def prefilter_results(search_results: List[Dict], model: Optional[TfidfLogisticModel] = None) -> Tuple[List[Optional[bool]], Dict[str, int]]:
+    """
+    Aplica la cascada local a cada resultado: reglas -> palabras clave -> modelo.
+    Devuelve una decisión por resultado (True/False, o None si debe ir al LLM)
+    y el número de aciertos por nivel.
+    """
+    decisions: List[Optional[bool]] = []
+    stats = Counter()
+    for result in search_results:
+        decision = classify_by_rules(result)
+        if decision is not None:
+            stats["rules_accept" if decision else "rules_reject"] += 1
+            decisions.append(decision)
+            continue
+
+        score = keyword_score(result)
+        if score >= settings.PREFILTER_ACCEPT_SCORE:
+            stats["keywords_accept"] += 1
+            decisions.append(True)
+            continue
+        if score <= settings.PREFILTER_REJECT_SCORE:
+            stats["keywords_reject"] += 1
+            decisions.append(False)
+            continue
+
+        if model is not None:
+            probability = model.predict_proba(result)
+            if probability >= settings.PREFILTER_MODEL_ACCEPT_PROB:
+                stats["model_accept"] += 1
+                decisions.append(True)
+                continue
+            if probability <= settings.PREFILTER_MODEL_REJECT_PROB:
+                stats["model_reject"] += 1
+                decisions.append(False)
+                continue
+
+        stats["uncertain"] += 1
+        decisions.append(None)
+    return decisions, dict(stats)
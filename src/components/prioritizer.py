@@ -0,0 +1,158 @@
+# src/components/prioritizer.py
+import os
+import json
+import threading
+from collections import defaultdict, deque
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from ..schemas.models import FundingOpportunity
+from ..utils.opportunity_store import parse_deadline
+from ..config import settings
+from .prefilter import (
+    relevance_signal, TfidfLogisticModel, REJECT_DOMAINS, ACCEPT_DOMAINS, _domain, _matches_domain
+)
+
+# --- SECCIÓN DE REPUTACIÓN DE FUENTES ---
+
+# Financiadores y agregadores de convocatorias conocidos.
+REPUTABLE_DOMAINS = ACCEPT_DOMAINS | {
+    "minciencias.gov.co", "innpulsacolombia.com", "colombiaproductiva.com", "sena.edu.co",
+    "ec.europa.eu", "worldbank.org", "iadb.org", "idbinvest.org", "caf.com", "undp.org", "usaid.gov",
+    "nsf.gov", "gatesfoundation.org", "fundsforngos.org", "opportunitydesk.org",
+}
+# Reputación a priori por sufijo del dominio (el primero que coincida).
+SUFFIX_REPUTATION = [
+    (".gov", 0.8), (".gov.co", 0.8), (".gob.mx", 0.8), (".gob.es", 0.8), (".int", 0.8),
+    (".edu", 0.5), (".edu.co", 0.5), (".org", 0.55),
+]
+DEFAULT_REPUTATION = 0.4
+# Peso (en decisiones "virtuales") del valor a priori frente al histórico del dominio.
+_PRIOR_STRENGTH = 5
+
+# Últimas decisiones leídas de cada histórico: (posición leída, ventana de (dominio, relevante)).
+_history_windows: Dict[Tuple[str, int], Tuple[int, deque]] = {}
+_history_lock = threading.Lock()
+
+def load_domain_history(path: str = settings.SCRUTINY_DECISIONS_PATH, max_examples: int = 5000) -> Dict[str, Tuple[int, int]]:
+    """
+    Relevantes y total de decisiones del escrutador por dominio, a partir de las
+    últimas `max_examples` líneas del histórico. El fichero solo crece, así que
+    entre llamadas se leen únicamente las líneas añadidas desde la anterior
+    (si se truncó o rotó, se vuelve a leer entero).
+    """
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return {}
+    with _history_lock:
+        offset, window = _history_windows.get((path, max_examples), (0, None))
+        if window is None or size < offset:
+            offset, window = 0, deque(maxlen=max_examples)
+        if size > offset:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # línea a medio escribir: se lee en la próxima llamada
+                    offset += len(line)
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    window.append((_domain(record.get("url") or ""), bool(record.get("is_relevant"))))
+        _history_windows[(path, max_examples)] = (offset, window)
+        history: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        for domain, is_relevant in window:
+            counts = history[domain]
+            counts[0] += is_relevant
+            counts[1] += 1
+    return {domain: (relevant, total) for domain, (relevant, total) in history.items()}
+
+def source_reputation(url: Optional[str], history: Optional[Dict[str, Tuple[int, int]]] = None) -> float:
+    """
+    Reputación de la fuente en [0, 1]: un valor a priori por dominio (financiadores
+    conocidos, sufijos institucionales, prensa/redes) suavizado con la tasa de
+    aciertos que el escrutador le ha dado a ese dominio en ejecuciones anteriores.
+    """
+    domain = _domain(url or "")
+    if _matches_domain(domain, REPUTABLE_DOMAINS):
+        prior = 1.0
+    elif _matches_domain(domain, REJECT_DOMAINS):
+        prior = 0.1
+    else:
+        prior = next((score for suffix, score in SUFFIX_REPUTATION if domain.endswith(suffix)), DEFAULT_REPUTATION)
+    relevant, total = (history or {}).get(domain, (0, 0))
+    return (relevant + prior * _PRIOR_STRENGTH) / (total + _PRIOR_STRENGTH)
+
+
+# --- SECCIÓN DE PUNTUACIÓN ---
+
+def deadline_score(deadline: Optional[str], today: Optional[date] = None) -> Optional[float]:
+    """
+    Cercanía de la fecha límite en [0, 1]: más alta cuanto antes cierra (dentro del
+    horizonte configurado). Sin fecha legible, un valor neutro. Devuelve None si ya venció.
+    """
+    parsed = parse_deadline(deadline)
+    if parsed is None:
+        return 0.5
+    days_left = (parsed - (today or date.today())).days
+    if days_left < 0:
+        return None
+    horizon = settings.PRIORITY_DEADLINE_HORIZON_DAYS
+    return max(0.1, 1 - days_left / horizon) if horizon else 0.5
+
+def cluster_score(cluster_size: int) -> float:
+    """Cuantas más fuentes repiten un resultado, más probable es que sea una convocatoria real."""
+    return 1 - 1 / max(cluster_size, 1)
+
+def result_priority(result: Dict, model: Optional[TfidfLogisticModel] = None,
+                    history: Optional[Dict[str, Tuple[int, int]]] = None) -> float:
+    """Prioridad de un resultado de búsqueda (escrutinio y extracción)."""
+    return (
+        settings.PRIORITY_SIGNAL_WEIGHT * relevance_signal(result, model)
+        + settings.PRIORITY_REPUTATION_WEIGHT * source_reputation(result.get("url"), history)
+        + settings.PRIORITY_CLUSTER_WEIGHT * cluster_score(result.get("cluster_size", 1))
+    )
+
+def opportunity_priority(opportunity: FundingOpportunity,
+                         history: Optional[Dict[str, Tuple[int, int]]] = None) -> Optional[float]:
+    """Prioridad de una oportunidad extraída (enriquecimiento). None si la convocatoria ya venció."""
+    deadline = deadline_score(opportunity.application_deadline)
+    if deadline is None:
+        return None
+    as_result = {
+        "title": opportunity.origin, "description": opportunity.description,
+        "url": opportunity.opportunity_url or opportunity.source_url,
+    }
+    return (
+        settings.PRIORITY_DEADLINE_WEIGHT * deadline
+        + settings.PRIORITY_SIGNAL_WEIGHT * relevance_signal(as_result)
+        + settings.PRIORITY_REPUTATION_WEIGHT * source_reputation(as_result["url"], history)
+    )
+
+
+# --- SECCIÓN DE ORDENACIÓN ---
+
+def prioritize_results(results: List[Dict], model: Optional[TfidfLogisticModel] = None,
+                       history: Optional[Dict[str, Tuple[int, int]]] = None) -> List[Dict]:
+    """Ordena los resultados de mayor a menor prioridad (estable ante empates)."""
+    if not settings.PRIORITY_ENABLED or len(results) < 2:
+        return results
+    history = load_domain_history() if history is None else history
+    return sorted(results, key=lambda r: -result_priority(r, model, history))
+
+def prioritize_opportunities(opportunities: List[FundingOpportunity]) -> List[FundingOpportunity]:
+    """
+    Descarta las convocatorias vencidas y ordena el resto de mayor a menor
+    prioridad, para que con la cuota justa se enriquezcan primero las mejores.
+    """
+    if not settings.PRIORITY_ENABLED:
+        return opportunities
+    history = load_domain_history()
+    scored = [(opportunity_priority(o, history), o) for o in opportunities]
+    expired = sum(1 for score, _ in scored if score is None)
+    if expired:
+        print(f"\n[Priority] {expired} oportunidades vencidas descartadas.")
+    live = [(score, o) for score, o in scored if score is not None]
+    return [o for _, o in sorted(live, key=lambda pair: -pair[0])]
@@ -1,35 +1,52 @@
+from typing import Optional
+from langchain_core.language_models import BaseChatModel
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.runnables import RunnableLambda
 
 from ..config import settings
 from ..schemas.models import QueryList
+from ..utils.llm_cache import with_response_cache
+from ..utils.prompt_budget import compact_schema, with_prompt_budget, with_token_accounting
 
-def create_query_generator_chain():
+def create_query_generator_chain(llm: Optional[BaseChatModel] = None):
     """Construye y devuelve la cadena para generar queries de búsqueda."""
     
-    system_prompt = """
-    Actúa como un experto en la búsqueda de financiación para proyectos de innovación y tecnología. 
-    Tu tarea es generar consultas de búsqueda (queries) estratégicas para encontrar oportunidades de financiación (grants, funding, convocatorias, etc.) basadas en la descripción de un proyecto que te proporcionará el usuario.
-    Debes analizar el título, la descripción y las palabras clave del proyecto para crear 5 ideas de búsqueda diferentes y efectivas.
-    Por cada idea, genera dos versiones de la query:
-    1.  Una para búsquedas internacionales, en inglés.
-    2.  Una para búsquedas a nivel nacional (Colombia), en español.
-    Utiliza sinónimos y términos relacionados como "funding", "grants", "convocatorias", "financiación", "proyectos de investigación", "venture capital for green tech", etc.
-    {format_instructions}
-    """
+    system_prompt = """Actúa como un experto en la búsqueda de financiación para proyectos de innovación y tecnología.
+Tu tarea es generar consultas de búsqueda (queries) estratégicas para encontrar oportunidades de financiación (grants, funding, convocatorias, etc.) basadas en la descripción de un proyecto que te proporcionará el usuario.
+Debes analizar el título, la descripción y las palabras clave del proyecto para crear 5 ideas de búsqueda diferentes y efectivas.
+Por cada idea, genera dos versiones de la query:
+1. Una para búsquedas internacionales, en inglés.
+2. Una para búsquedas a nivel nacional (Colombia), en español.
+Utiliza sinónimos y términos relacionados como "funding", "grants", "convocatorias", "financiación", "proyectos de investigación", "venture capital for green tech", etc.
+{format_instructions}"""
     
-    llm = ChatGoogleGenerativeAI(
+    llm = llm or ChatGoogleGenerativeAI(
         model=settings.GEMINI_MODEL_NAME,
         api_key=settings.GEMINI_API_KEY,
         temperature=0.2
     )
     
     parser = JsonOutputParser(pydantic_object=QueryList)
+    verbose_instructions = parser.get_format_instructions()
+    compact_instructions = compact_schema(QueryList)
+
+    def compact_inputs(inputs: dict) -> dict:
+        # Las instrucciones por defecto de `JsonOutputParser` (ejemplo genérico + JSON schema
+        # completo) se sustituyen por su versión compacta; las personalizadas se respetan.
+        instructions = inputs.get("format_instructions")
+        if not instructions or instructions == verbose_instructions:
+            return {**inputs, "format_instructions": compact_instructions}
+        return inputs
     
     prompt_template = ChatPromptTemplate.from_messages([
         ("system", system_prompt),
         ("user", "{project_details}"),
     ])
     
-    return prompt_template | llm | parser
\ No newline at end of file
+    return RunnableLambda(compact_inputs) | with_response_cache(
+        with_prompt_budget(prompt_template, "query_generator", settings.QUERY_GENERATOR_MAX_INPUT_TOKENS, ("project_details",)),
+        with_token_accounting(llm | parser, "query_generator"),
+        chain_name="query_generator", model_name=settings.GEMINI_MODEL_NAME, temperature=0.2, output_schema=QueryList
+    )
\ No newline at end of file
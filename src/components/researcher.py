@@ -1,5 +1,8 @@
 # src/components/researcher.py
 
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
 import feedparser
 from langchain_core.runnables import RunnableParallel, RunnableLambda
 from langchain_community.tools.tavily_search import TavilySearchResults
@@ -7,6 +10,9 @@ from langchain_community.tools import BraveSearch
 
 # <-- ¡IMPORTANTE! Las importaciones ahora son relativas a la carpeta 'src'
 from ..config import settings 
+from ..utils.feed_state import FeedStateStore, get_feed_state
+from ..utils.normalizers import normalize_search_results
+from .search_scheduler import SearchProvider
 
 # --- SECCIÓN DE LÓGICA RSS ---
 
@@ -18,27 +24,69 @@ RSS_FEEDS = [
 #    "https://www.nsf.gov/funding/rss/agencylist.xml"
 ]
 
+def _entry_id(entry) -> str:
+    return entry.get("id") or entry.get("guid") or entry.get("link") or entry.get("title", "")
+
+def _entry_hash(entry) -> str:
+    raw = "\x1f".join([
+        entry.get("title", ""), entry.get("summary", entry.get("description", "")), entry.get("updated", "")
+    ])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def fetch_new_feed_entries(url: str, limit: int, state: FeedStateStore) -> list[dict]:
+    """
+    Descarga UN feed con GET condicional (ETag / Last-Modified) y devuelve solo
+    las entradas nuevas o actualizadas que aún no se han procesado. Las entradas
+    devueltas quedan pendientes hasta que el escrutinio las descarte o el
+    extractor las procese (`FeedStateStore.mark_processed`).
+    """
+    # Con entradas pendientes de una ejecución interrumpida no sirve un 304: hay que volver a ofrecerlas.
+    etag, modified = (None, None) if state.has_pending(url) else state.get_validators(url)
+    feed = feedparser.parse(url, etag=etag, modified=modified, agent=settings.HTTP_USER_AGENT)
+    if getattr(feed, "status", None) == 304:
+        print(f"  -> Sin cambios en {url} (304).")
+        return []
+
+    new_entries, pending = [], False
+    for entry in feed.entries:
+        entry_id, content_hash = _entry_id(entry), _entry_hash(entry)
+        if not state.is_new_or_updated(url, entry_id, content_hash):
+            continue
+        if len(new_entries) >= limit:
+            pending = True
+            break
+        new_entries.append({
+            "title": entry.get("title", "Sin título"),
+            "url": entry.get("link"),
+            "description": entry.get("summary", entry.get("description", ""))
+        })
+        state.mark_ingested(url, entry_id, entry.get("link"), content_hash)
+    # Si quedaron entradas nuevas fuera del límite no guardamos los validadores:
+    # así la próxima ejecución vuelve a descargar el feed y las recoge.
+    if not pending:
+        state.save_validators(url, feed.get("etag"), feed.get("modified"))
+    return new_entries
+
 def fetch_and_limit_rss_feeds(rss_urls: list[str], limit_per_feed: int = 5) -> list[dict]:
     """
-    Lee una lista de feeds RSS y limita el número de entradas por cada uno.
+    Lee una lista de feeds RSS en paralelo y devuelve, como máximo, `limit_per_feed`
+    entradas NUEVAS o ACTUALIZADAS por feed. Se omiten las que ya se extrajeron
+    en ejecuciones anteriores (sus oportunidades están en el almacén compartido).
     Esta función es independiente y será llamada una sola vez por el pipeline.
     """
     all_entries = []
-    print(f"\n[Researcher] Leyendo {len(rss_urls)} fuentes RSS (límite: {limit_per_feed} por feed)...")
-    for url in rss_urls:
-        try:
-            feed = feedparser.parse(url)
-            # Usamos slicing para tomar solo los primeros N elementos.
-            for entry in feed.entries[:limit_per_feed]:
-                all_entries.append({
-                    "title": entry.get("title", "Sin título"),
-                    "url": entry.get("link"),
-                    "description": entry.get("summary", entry.get("description", ""))
-                })
-        except Exception as e:
-            print(f"  -> ⚠️ Error al leer el feed RSS {url}: {e}")
-            continue
-    print(f"  -> Se encontraron {len(all_entries)} entradas en total en los feeds RSS.")
+    state = get_feed_state()
+    print(f"\n[Researcher] Leyendo {len(rss_urls)} fuentes RSS (límite: {limit_per_feed} nuevas por feed)...")
+    with ThreadPoolExecutor(max_workers=max(1, min(settings.RSS_MAX_WORKERS, len(rss_urls)))) as executor:
+        futures = {url: executor.submit(fetch_new_feed_entries, url, limit_per_feed, state) for url in rss_urls}
+        # Recorremos en el orden original de RSS_FEEDS para que la salida sea estable.
+        for url, future in futures.items():
+            try:
+                all_entries.extend(future.result())
+            except Exception as e:
+                print(f"  -> ⚠️ Error al leer el feed RSS {url}: {e}")
+                continue
+    print(f"  -> Se encontraron {len(all_entries)} entradas nuevas en total en los feeds RSS.")
     return all_entries
 
 
@@ -72,4 +120,41 @@ def create_research_chain():
         #brave=brave_tool
     )
     
-    return parallel_search_step
\ No newline at end of file
+    return parallel_search_step
+
+
+def normalize_tavily_response(raw) -> list[dict]:
+    # Ante un error HTTP la herramienta de Tavily devuelve el mensaje como texto.
+    if not isinstance(raw, list):
+        raise ValueError(f"Respuesta inesperada de Tavily: {str(raw)[:200]}")
+    return normalize_search_results({"tavily": raw})
+
+def normalize_brave_response(raw) -> list[dict]:
+    # Brave devuelve un JSON serializado (normalize_search_results lo decodifica).
+    return normalize_search_results({"brave": raw})
+
+def create_search_providers() -> list[SearchProvider]:
+    """
+    Devuelve los buscadores web disponibles para el planificador de búsquedas
+    (ver `SearchScheduler`), cada uno con su tasa, cuota mensual y coste.
+    Brave solo se añade si hay API key configurada.
+    """
+    providers = [SearchProvider(
+        "tavily",
+        TavilySearchResults(max_results=settings.TAVILY_MAX_RESULTS),
+        normalize_tavily_response,
+        requests_per_minute=settings.TAVILY_RPM_LIMIT,
+        monthly_quota=settings.TAVILY_MONTHLY_QUOTA,
+        cost_per_call=settings.TAVILY_COST_PER_CALL,
+    )]
+    if settings.BRAVE_SEARCH_API_KEY:
+        providers.append(SearchProvider(
+            "brave",
+            BraveSearch.from_api_key(api_key=settings.BRAVE_SEARCH_API_KEY,
+                                     search_kwargs={"count": settings.BRAVE_SEARCH_COUNT}),
+            normalize_brave_response,
+            requests_per_minute=settings.BRAVE_RPM_LIMIT,
+            monthly_quota=settings.BRAVE_MONTHLY_QUOTA,
+            cost_per_call=settings.BRAVE_COST_PER_CALL,
+        ))
+    return providers
@@ -1,10 +1,14 @@
+from typing import Optional
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.language_models import BaseChatModel
 from langchain_google_genai import ChatGoogleGenerativeAI
 
-from ..schemas.models import ScrutinyResult
+from ..schemas.models import ScrutinyResult, BatchScrutinyResult
 from ..config import settings
+from ..utils.llm_cache import with_response_cache
+from ..utils.prompt_budget import with_prompt_budget, with_token_accounting
 
-def create_scrutinizer_chain():
+def create_scrutinizer_chain(llm: Optional[BaseChatModel] = None):
     """
     Crea una cadena que actúa como un filtro.
     Toma un resultado de búsqueda y decide si vale la pena scrapear la página.
@@ -23,7 +27,7 @@ Responde únicamente con el formato JSON solicitado."""),
     ])
     
     # Usamos el modelo más rápido y económico para esta tarea de clasificación simple.
-    llm = ChatGoogleGenerativeAI(
+    llm = llm or ChatGoogleGenerativeAI(
         model="gemini-1.5-flash",
         api_key=settings.GEMINI_API_KEY,
         temperature=0.1
@@ -31,13 +35,63 @@ Responde únicamente con el formato JSON solicitado."""),
     
     # Forzamos la salida al schema que definimos
     structured_llm = llm.with_structured_output(ScrutinyResult)
-    chain_with_retry = (
-        scrutinizer_prompt 
-        | structured_llm.with_retry(
-            stop_after_attempt=4,           # Intentará hasta 4 veces
-            wait_exponential_jitter=True,   # Usa una espera variable para evitar colisiones
-            #wait_exponential_max=10         # Esperará un máximo de 10 segundos entre intentos
+    # Sin reintentos propios: los hace `ainvoke_rate_limited`, que así ve cada 429 y frena el limitador.
+    chain = with_response_cache(
+        # Las descripciones de RSS pueden ser largas: se recortan al techo de la cadena.
+        with_prompt_budget(scrutinizer_prompt, "scrutinizer", settings.SCRUTINIZER_MAX_INPUT_TOKENS, ("description",),
+                           query=lambda x: x.get("title") or ""),
+        with_token_accounting(structured_llm, "scrutinizer"),
+        chain_name="scrutinizer", model_name="gemini-1.5-flash", temperature=0.1, output_schema=ScrutinyResult
+    )
+
+    return chain
+
+def format_sources_for_batch(results: list[dict], max_description_chars: int = 500) -> str:
+    """
+    Serializa un lote de resultados como lista numerada para el prompt por lotes,
+    sin sangrías ni saltos de línea repetidos dentro de las descripciones.
+    """
+    lines = []
+    for i, result in enumerate(results):
+        description = " ".join((result.get("description") or "").split())[:max_description_chars]
+        lines.append(
+            f"[{i}] Título: {result.get('title', 'Sin título')}\n"
+            f"URL: {result.get('url')}\n"
+            f"Descripción: {description}"
         )
+    return "\n".join(lines)
+
+def create_batch_scrutinizer_chain(llm: Optional[BaseChatModel] = None):
+    """
+    Variante por lotes del escrutador: clasifica VARIAS fuentes en una sola llamada.
+    Espera un dict con la clave `sources` (ver `format_sources_for_batch`) y devuelve
+    un `BatchScrutinyResult` con un veredicto por índice.
+    """
+
+    batch_prompt = ChatPromptTemplate.from_messages([
+        ("system",
+         """Eres un analista de inteligencia encargado de pre-filtrar fuentes de información.
+Para CADA fuente de la lista debes decidir si es una **fuente directa de financiación** (como una convocatoria, una página de 'grants', o un premio) o si es **contenido secundario** (como una noticia, un artículo de blog, un directorio de empresas, o un paper académico).
+Devuelve exactamente un veredicto por fuente, usando el índice que aparece entre corchetes.
+Responde únicamente con el formato JSON solicitado."""),
+        ("human",
+         """Analiza las siguientes fuentes y determina cuáles son relevantes para una extracción detallada:
+
+{sources}""")
+    ])
+
+    llm = llm or ChatGoogleGenerativeAI(
+        model="gemini-1.5-flash",
+        api_key=settings.GEMINI_API_KEY,
+        temperature=0.1
     )
 
-    return chain_with_retry
\ No newline at end of file
+    # Sin reintentos internos: el orquestador divide el lote si la respuesta falla.
+    structured_llm = llm.with_structured_output(BatchScrutinyResult)
+
+    # Sin campos recortables: si un lote no cabe, `PromptBudgetError` hace que el orquestador lo divida.
+    return with_response_cache(
+        with_prompt_budget(batch_prompt, "batch_scrutinizer", settings.BATCH_SCRUTINIZER_MAX_INPUT_TOKENS),
+        with_token_accounting(structured_llm, "batch_scrutinizer"),
+        chain_name="batch_scrutinizer", model_name="gemini-1.5-flash", temperature=0.1, output_schema=BatchScrutinyResult
+    )
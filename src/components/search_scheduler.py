@@ -0,0 +1,302 @@
+# src/components/search_scheduler.py
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from langchain_core.runnables import Runnable
+
+from ..config import settings
+from ..utils.normalizers import canonicalize_url
+from ..utils.metrics import arecord_metric
+from ..utils.rate_limiter import TokenBucketRateLimiter, is_rate_limit_error, get_retry_after
+
+
+def normalize_search_query(query: str) -> str:
+    """Clave de una consulta para la caché: minúsculas y sin espacios repetidos."""
+    return " ".join((query or "").lower().split())
+
+def _current_period() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m")
+
+
+class SearchCache:
+    """
+    Estado persistente de la búsqueda web (SQLite):
+    - resultados normalizados por (consulta, proveedor), reutilizables durante un TTL;
+    - llamadas consumidas por proveedor y mes, para respetar la cuota entre ejecuciones.
+    """
+
+    def __init__(self, path: str = settings.SEARCH_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS results (
+                    query_key TEXT NOT NULL,
+                    provider TEXT NOT NULL,
+                    results TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (query_key, provider)
+                );
+                CREATE TABLE IF NOT EXISTS usage (
+                    provider TEXT NOT NULL,
+                    period TEXT NOT NULL,
+                    calls INTEGER NOT NULL,
+                    PRIMARY KEY (provider, period)
+                );
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, query: str, ttl_seconds: float = settings.SEARCH_CACHE_TTL_SECONDS) -> Dict[str, List[Dict]]:
+        """Resultados vigentes de la consulta, por proveedor (vacío si nadie la respondió dentro del TTL)."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT provider, results FROM results WHERE query_key = ? AND created_at >= ?",
+                (normalize_search_query(query), time.time() - ttl_seconds)
+            ).fetchall()
+        return {provider: json.loads(results) for provider, results in rows}
+
+    def put(self, query: str, provider: str, results: List[Dict]) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO results (query_key, provider, results, created_at) VALUES (?, ?, ?, ?)",
+                         (normalize_search_query(query), provider, json.dumps(results, ensure_ascii=False), time.time()))
+
+    def record_call(self, provider: str) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("""
+                INSERT INTO usage (provider, period, calls) VALUES (?, ?, 1)
+                ON CONFLICT(provider, period) DO UPDATE SET calls = calls + 1
+            """, (provider, _current_period()))
+
+    def calls_this_period(self, provider: str) -> int:
+        with self._connect() as conn:
+            row = conn.execute("SELECT calls FROM usage WHERE provider = ? AND period = ?",
+                               (provider, _current_period())).fetchone()
+        return row[0] if row else 0
+
+
+_search_cache: Optional[SearchCache] = None
+_search_cache_lock = threading.Lock()
+
+def get_search_cache() -> SearchCache:
+    """Devuelve la instancia compartida de la caché de búsquedas."""
+    global _search_cache
+    with _search_cache_lock:
+        if _search_cache is None:
+            _search_cache = SearchCache()
+        return _search_cache
+
+
+# Limitadores por proveedor compartidos por todos los planificadores del proceso.
+_provider_rate_limiters: Dict[str, TokenBucketRateLimiter] = {}
+_provider_rate_limiters_lock = threading.Lock()
+
+def get_provider_rate_limiter(name: str, requests_per_minute: int) -> TokenBucketRateLimiter:
+    """Devuelve el limitador compartido del proveedor `name` (se crea la primera vez)."""
+    with _provider_rate_limiters_lock:
+        if name not in _provider_rate_limiters:
+            _provider_rate_limiters[name] = TokenBucketRateLimiter(requests_per_minute=requests_per_minute)
+        return _provider_rate_limiters[name]
+
+
+class SearchProvider:
+    """
+    Un buscador web con su cuota y su estado de salud:
+    - `search`: runnable que recibe la consulta (str) y devuelve la respuesta bruta;
+    - `normalize`: convierte la respuesta bruta en [{title, url, description}]
+      (lanza una excepción si la respuesta es un error);
+    - límite de peticiones por minuto, cuota mensual (0 = sin límite) y coste por llamada.
+    La latencia se sigue con una media móvil exponencial.
+    """
+
+    def __init__(self, name: str, search: Runnable, normalize: Callable[[Any], List[Dict]],
+                 requests_per_minute: int, monthly_quota: int = 0, cost_per_call: float = 1.0,
+                 rate_limiter: Optional[TokenBucketRateLimiter] = None, initial_latency: float = 1.0):
+        self.name = name
+        self.search = search
+        self.normalize = normalize
+        self.monthly_quota = monthly_quota
+        self.cost_per_call = cost_per_call
+        self.rate_limiter = rate_limiter or get_provider_rate_limiter(name, requests_per_minute)
+        self.latency = initial_latency
+        self.consecutive_errors = 0
+        self.disabled_until = 0.0
+        self._lock = threading.Lock()
+
+    def record_success(self, latency: float, alpha: float = 0.3) -> None:
+        with self._lock:
+            self.latency = (1 - alpha) * self.latency + alpha * latency
+            self.consecutive_errors = 0
+        self.rate_limiter.on_success()
+
+    def record_error(self, error: Exception) -> None:
+        if is_rate_limit_error(error):
+            self.rate_limiter.on_rate_limited(get_retry_after(error))
+            return
+        with self._lock:
+            self.consecutive_errors += 1
+            if self.consecutive_errors >= settings.SEARCH_PROVIDER_MAX_ERRORS:
+                self.disabled_until = time.monotonic() + settings.SEARCH_PROVIDER_COOLDOWN_SECONDS
+                self.consecutive_errors = 0
+
+
+class SearchScheduler:
+    """
+    Reparte las consultas entre varios buscadores:
+    - cada llamada espera turno en el limitador de SU proveedor, así que los
+      proveedores trabajan en paralelo sin superar su tasa;
+    - cada consulta va al proveedor con menor coste estimado en ese momento
+      (espera en el limitador + latencia media + coste ponderado por la cuota
+      restante); los agotados o en enfriamiento no se eligen;
+    - las consultas respondidas dentro del TTL se sirven desde la caché;
+    - por idea, se deja de buscar en cuanto hay `min_urls_per_idea` URLs distintas.
+    """
+
+    def __init__(self, providers: List[SearchProvider], cache: Optional[SearchCache] = None,
+                 min_urls_per_idea: int = settings.SEARCH_MIN_URLS_PER_IDEA,
+                 ttl_seconds: float = settings.SEARCH_CACHE_TTL_SECONDS,
+                 max_attempts: int = settings.SEARCH_MAX_ATTEMPTS):
+        self.providers = providers
+        self.cache = cache or get_search_cache()
+        self.min_urls_per_idea = min_urls_per_idea
+        self.ttl_seconds = ttl_seconds
+        self.max_attempts = max_attempts
+
+    # --- Elección de proveedor ---
+
+    def _remaining_quota(self, provider: SearchProvider) -> float:
+        """Fracción de la cuota mensual que queda (1.0 si no hay límite)."""
+        if not provider.monthly_quota:
+            return 1.0
+        used = self.cache.calls_this_period(provider.name)
+        return max(0.0, 1.0 - used / provider.monthly_quota)
+
+    def estimated_cost(self, provider: SearchProvider) -> Optional[float]:
+        """Coste estimado (en segundos equivalentes) de lanzar ahora una consulta; None si no está disponible."""
+        if time.monotonic() < provider.disabled_until:
+            return None
+        remaining = self._remaining_quota(provider)
+        if remaining <= 0:
+            return None
+        # El coste pesa más a medida que se agota la cuota del proveedor.
+        quota_cost = settings.SEARCH_COST_WEIGHT * provider.cost_per_call / max(remaining, 0.05)
+        return provider.rate_limiter.estimated_delay() + provider.latency + quota_cost
+
+    def choose_provider(self, exclude: Set[str] = frozenset()) -> Optional[SearchProvider]:
+        candidates = []
+        for provider in self.providers:
+            if provider.name in exclude:
+                continue
+            cost = self.estimated_cost(provider)
+            if cost is not None:
+                candidates.append((cost, provider))
+        return min(candidates, key=lambda c: c[0])[1] if candidates else None
+
+    # --- Llamadas ---
+
+    async def _call(self, provider: SearchProvider, query: str) -> List[Dict]:
+        await provider.rate_limiter.acquire()
+        self.cache.record_call(provider.name)
+        await arecord_metric("search_calls")
+        started = time.perf_counter()
+        try:
+            results = provider.normalize(await provider.search.ainvoke(query))
+        except Exception as e:
+            provider.record_error(e)
+            await arecord_metric("search_errors")
+            raise
+        provider.record_success(time.perf_counter() - started)
+        self.cache.put(query, provider.name, results)
+        return results
+
+    async def search_with(self, query: str, exclude: Optional[Set[str]] = None) -> Optional[List[Dict]]:
+        """
+        Lanza la consulta en el mejor proveedor disponible (fuera de `exclude`),
+        pasando al siguiente si falla. Marca en `exclude` el proveedor que respondió.
+        Devuelve None si no queda ningún proveedor al que preguntar.
+        """
+        exclude = set() if exclude is None else exclude
+        failed: Set[str] = set()
+        for _ in range(self.max_attempts):
+            provider = self.choose_provider(exclude | failed)
+            if provider is None:
+                # Sin alternativas: reintentamos los que fallaron (el limitador aplica la espera).
+                provider = self.choose_provider(exclude)
+                if provider is None:
+                    return None
+            try:
+                results = await self._call(provider, query)
+                exclude.add(provider.name)
+                return results
+            except Exception as e:
+                print(f"  -> ⚠️ Error de {provider.name} en la búsqueda '{query}': {e}")
+                failed.add(provider.name)
+        return None
+
+    async def search(self, query: str) -> List[Dict]:
+        """Resultados de UNA consulta: desde la caché si está vigente, si no del mejor proveedor."""
+        cached = self.cache.get(query, self.ttl_seconds)
+        if cached:
+            await arecord_metric("search_cache_hits")
+            return [result for results in cached.values() for result in results]
+        return await self.search_with(query) or []
+
+    async def search_idea(self, queries: List[str]) -> List[Dict]:
+        """
+        Busca las consultas de UNA idea hasta reunir `min_urls_per_idea` URLs distintas.
+        Primero cada consulta en un solo proveedor (o la caché); si no basta, se
+        repite en los demás proveedores y se combinan los resultados.
+        """
+        merged: List[Dict] = []
+        seen: Set[str] = set()
+
+        def merge(results: List[Dict]) -> None:
+            for result in results:
+                key = canonicalize_url(result.get("url") or "")
+                if result.get("url") and key not in seen:
+                    seen.add(key)
+                    merged.append(result)
+
+        asked: Dict[str, Set[str]] = {query: set() for query in queries}
+        for _ in range(max(1, len(self.providers))):
+            for query in queries:
+                if len(seen) >= self.min_urls_per_idea:
+                    return merged
+                cached = self.cache.get(query, self.ttl_seconds)
+                fresh = {name: results for name, results in cached.items() if name not in asked[query]}
+                if fresh:
+                    await arecord_metric("search_cache_hits")
+                    asked[query].update(fresh)
+                    for results in fresh.values():
+                        merge(results)
+                    continue
+                merge(await self.search_with(query, asked[query]) or [])
+        return merged
+
+    async def search_ideas(self, ideas: List[Dict]) -> List[Dict]:
+        """
+        Recibe las ideas del generador ({idea, international_query, national_query})
+        y las busca en paralelo. Devuelve los resultados normalizados de todas.
+        """
+        idea_queries = [
+            [q for q in (idea.get("international_query"), idea.get("national_query")) if q]
+            for idea in ideas
+        ]
+        idea_queries = [queries for queries in idea_queries if queries]
+        if not idea_queries or not self.providers:
+            return []
+        print(f"\n[Researcher] Buscando {len(idea_queries)} ideas en {', '.join(p.name for p in self.providers)} "
+              f"(objetivo: {self.min_urls_per_idea} URLs por idea)...")
+        grouped = await asyncio.gather(*(self.search_idea(queries) for queries in idea_queries))
+        results = [result for group in grouped for result in group]
+        print(f"  -> {len(results)} resultados web de {len(idea_queries)} ideas.")
+        return results
@@ -11,5 +11,192 @@ BRAVE_SEARCH_API_KEY = os.getenv("BRAVE_SEARCH_API_KEY")
 
 # --- Model & Tool Configurations ---
 GEMINI_MODEL_NAME = "gemini-1.5-flash"
-TAVILY_MAX_RESULTS = 1
-BRAVE_SEARCH_COUNT = 1
\ No newline at end of file
+TAVILY_MAX_RESULTS = int(os.getenv("TAVILY_MAX_RESULTS", "5"))
+BRAVE_SEARCH_COUNT = int(os.getenv("BRAVE_SEARCH_COUNT", "5"))
+
+# --- Rate Limits (cuota de Gemini compartida por todas las cadenas) ---
+GEMINI_RPM_LIMIT = int(os.getenv("GEMINI_RPM_LIMIT", "15"))
+GEMINI_TPM_LIMIT = int(os.getenv("GEMINI_TPM_LIMIT", "1000000"))
+
+# --- Scrutiny Stage ---
+SCRUTINY_MAX_CONCURRENCY = int(os.getenv("SCRUTINY_MAX_CONCURRENCY", "8"))
+SCRUTINY_MAX_ATTEMPTS = 3
+
+# --- Batched Scrutiny (varias fuentes por llamada al LLM) ---
+SCRUTINY_BATCH_MODE = os.getenv("SCRUTINY_BATCH_MODE", "true").lower() == "true"
+SCRUTINY_BATCH_MAX_ITEMS = int(os.getenv("SCRUTINY_BATCH_MAX_ITEMS", "20"))
+SCRUTINY_BATCH_MAX_TOKENS = int(os.getenv("SCRUTINY_BATCH_MAX_TOKENS", "4000"))
+
+# --- Almacenamiento local (cachés, estado y registros entre ejecuciones) ---
+DATA_DIR = os.getenv("FLOW_SEARCH_DATA_DIR", ".flow_search")
+
+# --- Pre-filtro local en cascada (antes del escrutador LLM) ---
+PREFILTER_ENABLED = os.getenv("PREFILTER_ENABLED", "true").lower() == "true"
+PREFILTER_ACCEPT_SCORE = float(os.getenv("PREFILTER_ACCEPT_SCORE", "0.6"))
+PREFILTER_REJECT_SCORE = float(os.getenv("PREFILTER_REJECT_SCORE", "-0.6"))
+PREFILTER_MODEL_ACCEPT_PROB = float(os.getenv("PREFILTER_MODEL_ACCEPT_PROB", "0.9"))
+PREFILTER_MODEL_REJECT_PROB = float(os.getenv("PREFILTER_MODEL_REJECT_PROB", "0.1"))
+PREFILTER_MIN_TRAINING_EXAMPLES = int(os.getenv("PREFILTER_MIN_TRAINING_EXAMPLES", "50"))
+SCRUTINY_DECISIONS_PATH = os.path.join(DATA_DIR, "scrutiny_decisions.jsonl")
+
+# --- Caché persistente de páginas (compartida por extractor y enricher) ---
+PAGE_CACHE_PATH = os.path.join(DATA_DIR, "page_cache.sqlite3")
+PAGE_CACHE_FRESH_SECONDS = int(os.getenv("PAGE_CACHE_FRESH_SECONDS", str(6 * 3600)))
+PAGE_CACHE_TTL_SECONDS = int(os.getenv("PAGE_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+HTTP_USER_AGENT = os.getenv("USER_AGENT", "Mozilla/5.0 (compatible; flow-search/0.1)")
+
+# --- Caché de respuestas del LLM ---
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_BYPASS", "false").lower() != "true"
+LLM_CACHE_PATH = os.path.join(DATA_DIR, "llm_cache.sqlite3")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+
+# --- Enrichment Stage ---
+ENRICHMENT_MAX_CONCURRENCY = int(os.getenv("ENRICHMENT_MAX_CONCURRENCY", "6"))
+ENRICHMENT_MAX_PER_DOMAIN = int(os.getenv("ENRICHMENT_MAX_PER_DOMAIN", "2"))
+ENRICHMENT_MAX_ATTEMPTS = 3
+# Las oportunidades ya completas en su propia página de origen no se re-enriquecen.
+ENRICHMENT_SKIP_COMPLETE = os.getenv("ENRICHMENT_SKIP_COMPLETE", "true").lower() == "true"
+
+# --- Planificación por prioridad y presupuesto por ejecución ---
+# Escrutinio, extracción y enriquecimiento procesan primero los items con mayor
+# prioridad (señal del pre-filtro, cercanía de la fecha límite, reputación de la
+# fuente y tamaño del grupo de duplicados). Las convocatorias vencidas se descartan.
+PRIORITY_ENABLED = os.getenv("PRIORITY_ENABLED", "true").lower() == "true"
+PRIORITY_SIGNAL_WEIGHT = float(os.getenv("PRIORITY_SIGNAL_WEIGHT", "0.4"))
+PRIORITY_DEADLINE_WEIGHT = float(os.getenv("PRIORITY_DEADLINE_WEIGHT", "0.3"))
+PRIORITY_REPUTATION_WEIGHT = float(os.getenv("PRIORITY_REPUTATION_WEIGHT", "0.2"))
+PRIORITY_CLUSTER_WEIGHT = float(os.getenv("PRIORITY_CLUSTER_WEIGHT", "0.1"))
+PRIORITY_DEADLINE_HORIZON_DAYS = int(os.getenv("PRIORITY_DEADLINE_HORIZON_DAYS", "120"))
+# Límites duros por ejecución (0 = sin límite). Al alcanzarlos se devuelve el mejor resultado parcial.
+BUDGET_MAX_LLM_CALLS = int(os.getenv("BUDGET_MAX_LLM_CALLS", "0"))
+BUDGET_MAX_TOKENS = int(os.getenv("BUDGET_MAX_TOKENS", "0"))
+BUDGET_MAX_WALL_SECONDS = float(os.getenv("BUDGET_MAX_WALL_SECONDS", "0"))
+
+# --- Streaming Pipeline ---
+STREAM_EXTRACTION_WORKERS = int(os.getenv("STREAM_EXTRACTION_WORKERS", "4"))
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "20"))
+
+# --- Cliente HTTP compartido (descarga de páginas) ---
+FETCH_MAX_CONNECTIONS = int(os.getenv("FETCH_MAX_CONNECTIONS", "32"))
+FETCH_MAX_PER_HOST = int(os.getenv("FETCH_MAX_PER_HOST", "4"))
+FETCH_CONNECT_TIMEOUT = float(os.getenv("FETCH_CONNECT_TIMEOUT", "5"))
+FETCH_READ_TIMEOUT = float(os.getenv("FETCH_READ_TIMEOUT", "15"))
+FETCH_TOTAL_TIMEOUT = float(os.getenv("FETCH_TOTAL_TIMEOUT", "30"))
+# Texto visible que se lee antes de cortar la descarga (luego se reduce por relevancia).
+FETCH_MAX_TEXT_CHARS = int(os.getenv("FETCH_MAX_TEXT_CHARS", "60000"))
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(2 * 1024 * 1024)))
+# Los PDFs (p. ej. términos de referencia) no se pueden cortar a medias: límite propio.
+FETCH_MAX_PDF_BYTES = int(os.getenv("FETCH_MAX_PDF_BYTES", str(25 * 1024 * 1024)))
+
+# --- Parseo de documentos en un pool de procesos (HTML grandes y PDFs) ---
+PARSE_POOL_ENABLED = os.getenv("PARSE_POOL_ENABLED", "true").lower() == "true"
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 2)))
+# Por debajo de este tamaño el HTML se parsea en un hilo (no compensa cambiar de proceso).
+PARSE_INLINE_MAX_BYTES = int(os.getenv("PARSE_INLINE_MAX_BYTES", str(256 * 1024)))
+PARSE_TIMEOUT_SECONDS = float(os.getenv("PARSE_TIMEOUT_SECONDS", "30"))
+PARSE_MAX_MEMORY_MB = int(os.getenv("PARSE_MAX_MEMORY_MB", "1024"))
+PARSE_PDF_MAX_PAGES = int(os.getenv("PARSE_PDF_MAX_PAGES", "200"))
+
+# --- Reducción de contenido (presupuesto de tokens de página por cadena) ---
+EXTRACTOR_CONTENT_TOKENS = int(os.getenv("EXTRACTOR_CONTENT_TOKENS", "2500"))
+ENRICHER_CONTENT_TOKENS = int(os.getenv("ENRICHER_CONTENT_TOKENS", "3750"))
+
+# --- Presupuesto de tokens de entrada por cadena (prompt ya renderizado) ---
+# Si el prompt no cabe se recortan sus campos de contenido (página, descripción).
+QUERY_GENERATOR_MAX_INPUT_TOKENS = int(os.getenv("QUERY_GENERATOR_MAX_INPUT_TOKENS", "1500"))
+SCRUTINIZER_MAX_INPUT_TOKENS = int(os.getenv("SCRUTINIZER_MAX_INPUT_TOKENS", "600"))
+BATCH_SCRUTINIZER_MAX_INPUT_TOKENS = int(os.getenv("BATCH_SCRUTINIZER_MAX_INPUT_TOKENS", "5000"))
+EXTRACTOR_MAX_INPUT_TOKENS = int(os.getenv("EXTRACTOR_MAX_INPUT_TOKENS", "3200"))
+DEEP_DIVE_MAX_INPUT_TOKENS = int(os.getenv("DEEP_DIVE_MAX_INPUT_TOKENS", "4800"))
+# Llamadas reales necesarias antes de corregir la estimación con el uso que informa el modelo.
+PROMPT_CALIBRATION_MIN_CALLS = int(os.getenv("PROMPT_CALIBRATION_MIN_CALLS", "5"))
+
+# --- Ingesta incremental de RSS ---
+FEED_STATE_PATH = os.path.join(DATA_DIR, "feed_state.sqlite3")
+RSS_MAX_WORKERS = int(os.getenv("RSS_MAX_WORKERS", "8"))
+
+# --- Checkpoints de ejecución (reanudación tras un fallo) ---
+CHECKPOINT_PATH = os.path.join(DATA_DIR, "checkpoints.sqlite3")
+
+# --- Modo por lotes (varios proyectos) ---
+# Similitud mínima (coseno de tokens) para asignar a un proyecto una oportunidad
+# que no salió de sus propias búsquedas.
+BATCH_MATCH_THRESHOLD = float(os.getenv("BATCH_MATCH_THRESHOLD", "0.12"))
+
+# --- Almacén local de oportunidades conocidas (índice vectorial) ---
+OPPORTUNITY_STORE_ENABLED = os.getenv("OPPORTUNITY_STORE_ENABLED", "true").lower() == "true"
+OPPORTUNITY_STORE_PATH = os.path.join(DATA_DIR, "opportunities.sqlite3")
+OPPORTUNITY_INDEX_DIM = int(os.getenv("OPPORTUNITY_INDEX_DIM", "4096"))
+OPPORTUNITY_STORE_TOP_K = int(os.getenv("OPPORTUNITY_STORE_TOP_K", "10"))
+OPPORTUNITY_STORE_MIN_SCORE = float(os.getenv("OPPORTUNITY_STORE_MIN_SCORE", "0.2"))
+# Con al menos este número de coincidencias vigentes no se lanza la búsqueda web.
+OPPORTUNITY_STORE_MIN_HITS = int(os.getenv("OPPORTUNITY_STORE_MIN_HITS", "5"))
+# Vigencia de las oportunidades sin fecha límite legible.
+OPPORTUNITY_STORE_MAX_AGE_DAYS = int(os.getenv("OPPORTUNITY_STORE_MAX_AGE_DAYS", "60"))
+
+# --- Métricas de ejecución ---
+METRICS_PATH = os.path.join(DATA_DIR, "run_metrics.jsonl")
+
+# --- Búsqueda web multi-proveedor (planificador de búsquedas) ---
+SEARCH_CACHE_PATH = os.path.join(DATA_DIR, "search_cache.sqlite3")
+# Una consulta ya respondida por un proveedor dentro de este plazo no se vuelve a lanzar.
+SEARCH_CACHE_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", str(24 * 3600)))
+# Se deja de buscar para una idea en cuanto se reúnen estas URLs distintas.
+SEARCH_MIN_URLS_PER_IDEA = int(os.getenv("SEARCH_MIN_URLS_PER_IDEA", "8"))
+SEARCH_MAX_ATTEMPTS = 3
+# Segundos de latencia que "vale" una unidad de coste (crédito) al elegir proveedor.
+SEARCH_COST_WEIGHT = float(os.getenv("SEARCH_COST_WEIGHT", "1.0"))
+# Tras este número de errores seguidos el proveedor se aparta durante el enfriamiento.
+SEARCH_PROVIDER_MAX_ERRORS = 3
+SEARCH_PROVIDER_COOLDOWN_SECONDS = float(os.getenv("SEARCH_PROVIDER_COOLDOWN_SECONDS", "60"))
+# Cuota mensual (0 = sin límite), tasa y coste por llamada de cada proveedor.
+TAVILY_MONTHLY_QUOTA = int(os.getenv("TAVILY_MONTHLY_QUOTA", "1000"))
+TAVILY_RPM_LIMIT = int(os.getenv("TAVILY_RPM_LIMIT", "100"))
+TAVILY_COST_PER_CALL = float(os.getenv("TAVILY_COST_PER_CALL", "1.0"))
+BRAVE_MONTHLY_QUOTA = int(os.getenv("BRAVE_MONTHLY_QUOTA", "2000"))
+BRAVE_RPM_LIMIT = int(os.getenv("BRAVE_RPM_LIMIT", "60"))
+BRAVE_COST_PER_CALL = float(os.getenv("BRAVE_COST_PER_CALL", "1.0"))
+
+# --- Servicio HTTP residente (python -m src.server) ---
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8000"))
+SERVICE_MAX_CONCURRENT_RUNS = int(os.getenv("SERVICE_MAX_CONCURRENT_RUNS", "2"))
+# Las ejecuciones terminadas se conservan este tiempo para consultas y reconexiones SSE.
+SERVICE_RUN_TTL_SECONDS = int(os.getenv("SERVICE_RUN_TTL_SECONDS", "3600"))
+SERVICE_SSE_HEARTBEAT_SECONDS = float(os.getenv("SERVICE_SSE_HEARTBEAT_SECONDS", "15"))
+SERVICE_ALLOW_ORIGIN = os.getenv("SERVICE_ALLOW_ORIGIN", "*")
+SERVICE_ACCESS_LOG = os.getenv("SERVICE_ACCESS_LOG", "false").lower() == "true"
+
+# --- Modo vigilancia (python -m src.pipelines.watch) ---
+# Revalida las páginas de las oportunidades del almacén y re-enriquece solo las que cambiaron.
+WATCH_STATE_PATH = os.path.join(DATA_DIR, "watch_state.sqlite3")
+WATCH_CHANGES_PATH = os.path.join(DATA_DIR, "watch_changes.jsonl")
+WATCH_INTERVAL_SECONDS = int(os.getenv("WATCH_INTERVAL_SECONDS", str(24 * 3600)))
+WATCH_MAX_CONCURRENCY = int(os.getenv("WATCH_MAX_CONCURRENCY", "16"))
+# Tokens del texto reducido de la página sobre los que se calcula la huella.
+WATCH_FINGERPRINT_TOKENS = int(os.getenv("WATCH_FINGERPRINT_TOKENS", "8000"))
+# Hasta esta distancia de Hamming (SimHash de 64 bits) el cambio se considera menor,
+# salvo que cambien las fechas que aparecen en la página.
+WATCH_SIMHASH_MAX_DISTANCE = int(os.getenv("WATCH_SIMHASH_MAX_DISTANCE", "3"))
+
+# --- Cola de tareas distribuida (workers: python -m src.worker) ---
+# Con la cola activada, el escrutinio, la extracción y el enriquecimiento se encolan
+# y los procesan los workers (en este u otros hosts, con sus propias API keys).
+# Aplica al pipeline principal y al de lotes; el de streaming y el grafo con checkpoints trabajan en el propio proceso.
+TASK_QUEUE_ENABLED = os.getenv("TASK_QUEUE_ENABLED", "false").lower() == "true"
+TASK_QUEUE_BACKEND = os.getenv("TASK_QUEUE_BACKEND", "sqlite")
+TASK_QUEUE_PATH = os.getenv("TASK_QUEUE_PATH", os.path.join(DATA_DIR, "task_queue.sqlite3"))
+# Un item arrendado vuelve a la cola si su worker no lo confirma (ni renueva) en este tiempo.
+TASK_QUEUE_VISIBILITY_TIMEOUT = float(os.getenv("TASK_QUEUE_VISIBILITY_TIMEOUT", "300"))
+# Intentos antes de mandar el item a la cola de fallidos (dead letter).
+TASK_QUEUE_MAX_ATTEMPTS = int(os.getenv("TASK_QUEUE_MAX_ATTEMPTS", "3"))
+TASK_QUEUE_RETRY_BACKOFF_SECONDS = float(os.getenv("TASK_QUEUE_RETRY_BACKOFF_SECONDS", "10"))
+TASK_QUEUE_POLL_SECONDS = float(os.getenv("TASK_QUEUE_POLL_SECONDS", "0.5"))
+# Los resultados más antiguos se recalculan al volver a encolar la misma clave.
+TASK_QUEUE_RESULT_TTL_SECONDS = int(os.getenv("TASK_QUEUE_RESULT_TTL_SECONDS", str(24 * 3600)))
+# Espera máxima del productor por los resultados de una etapa.
+TASK_QUEUE_WAIT_TIMEOUT_SECONDS = float(os.getenv("TASK_QUEUE_WAIT_TIMEOUT_SECONDS", "1800"))
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "8"))
+# Registro de cuotas por API key compartido por todos los workers del host.
+RATE_LIMIT_REGISTRY_PATH = os.getenv("RATE_LIMIT_REGISTRY_PATH", os.path.join(DATA_DIR, "rate_limits.sqlite3"))
@@ -0,0 +1,186 @@
+# src/pipelines/batch.py
+import re
+import math
+import asyncio
+from typing import Dict, List, Optional, Set
+
+from langchain_core.runnables import RunnableLambda
+
+from ..components.query_generator import create_query_generator_chain
+from ..components.researcher import create_search_providers, fetch_and_limit_rss_feeds, RSS_FEEDS
+from ..components.search_scheduler import SearchScheduler
+from ..components.enricher import create_deep_dive_chain
+from ..components.prefilter import load_trained_model
+from ..schemas.models import FundingOpportunity
+from ..utils.normalizers import flatten_queries
+from ..utils.dedup import dedupe_results_with_clusters, cluster_opportunities, merge_opportunities, content_tokens
+from ..utils.concurrency import run_sync
+from ..config import settings
+from .discovery import (
+    create_llm_scrutinizer, create_item_extractor, scrutinize_with_prefilter, scrutinize_queued, extract_queued_by_source,
+    mark_if_rejected,
+)
+from .enrichment import create_item_enricher, enrich_queued_by_item
+
+
+def normalize_query(query: str) -> str:
+    """Clave para deduplicar consultas entre proyectos: minúsculas, sin comillas ni espacios repetidos."""
+    return re.sub(r"\s+", " ", re.sub(r"[\"'“”]", "", (query or "").lower())).strip()
+
+def _token_cosine(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / math.sqrt(len(a) * len(b)) if a and b else 0.0
+
+def _opportunity_text(opportunity: FundingOpportunity) -> str:
+    return " ".join([opportunity.origin or "", opportunity.description or "", *(opportunity.main_requirements or [])])
+
+def match_opportunities_to_projects(
+    opportunities: List[FundingOpportunity],
+    provenance: List[Set[int]],
+    project_inputs: List[Dict],
+    threshold: float = settings.BATCH_MATCH_THRESHOLD,
+) -> List[List[int]]:
+    """
+    Asigna cada oportunidad del pool común a los proyectos que la encontraron
+    (procedencia) y a cualquier otro proyecto cuya descripción sea lo bastante
+    parecida. Devuelve, por proyecto, los índices de sus oportunidades.
+    """
+    project_tokens = [content_tokens(p.get("project_details", "")) for p in project_inputs]
+    matches: List[List[int]] = [[] for _ in project_inputs]
+    for i, opportunity in enumerate(opportunities):
+        opportunity_tokens = content_tokens(_opportunity_text(opportunity))
+        for p, tokens in enumerate(project_tokens):
+            if p in provenance[i] or _token_cosine(opportunity_tokens, tokens) >= threshold:
+                matches[p].append(i)
+    return matches
+
+
+def create_batch_pipeline():
+    """
+    Ejecuta el agente completo para N proyectos compartiendo el trabajo común:
+    1. Genera las consultas de cada proyecto y las deduplica globalmente.
+    2. Busca cada consulta distinta (repartidas entre buscadores) y lee los feeds RSS UNA sola vez.
+    3. Deduplica los resultados, y escruta, scrapea y extrae cada URL una sola vez.
+    4. Resuelve duplicados en el pool común y enriquece cada oportunidad una vez.
+    5. Reparte el pool entre los proyectos (procedencia + similitud).
+    El coste crece con el número de URLs distintas y no con proyectos × URLs.
+    Con `TASK_QUEUE_ENABLED`, el escrutinio, la extracción y el enriquecimiento
+    los hacen los workers de la cola (`python -m src.worker`), como en el pipeline principal.
+
+    Recibe una lista de inputs de proyecto ({"project_details", "format_instructions"})
+    y devuelve, en el mismo orden, la lista de oportunidades enriquecidas de cada uno.
+    """
+    query_generator = create_query_generator_chain().with_config({"run_name": "Generating Queries"})
+    scheduler = SearchScheduler(create_search_providers())
+    if settings.TASK_QUEUE_ENABLED:
+        llm_scrutinize, extract_item, enrich_item = scrutinize_queued, None, None
+    else:
+        llm_scrutinize = create_llm_scrutinizer()
+        extract_item = create_item_extractor()
+        enrich_item = create_item_enricher(create_deep_dive_chain())
+
+    async def run_batch(project_inputs: List[Dict]) -> List[List[Dict]]:
+        if not project_inputs: return []
+        total_projects = len(project_inputs)
+
+        # --- 1. Consultas: una generación por proyecto, búsqueda por consulta distinta ---
+        # Un proyecto cuya generación falla se queda sin consultas propias, no tumba el lote.
+        generated = await query_generator.abatch(project_inputs, return_exceptions=True)
+        query_projects: Dict[str, Set[int]] = {}
+        distinct_queries: List[Dict] = []
+        total_queries = 0
+        for p, output in enumerate(generated):
+            if isinstance(output, Exception):
+                print(f"  -> ⚠️ Error al generar las consultas del proyecto {p + 1}: {output}")
+                continue
+            for query in flatten_queries(output["queries"]):
+                total_queries += 1
+                key = normalize_query(query["query"])
+                if key not in query_projects:
+                    query_projects[key] = set()
+                    distinct_queries.append(query)
+                query_projects[key].add(p)
+        print(f"\n[Batch] {total_projects} proyectos: {total_queries} consultas, {len(distinct_queries)} distintas.")
+
+        # --- 2. Investigación compartida (web por consulta distinta + RSS una vez) ---
+        search_outputs, rss_results = await asyncio.gather(
+            asyncio.gather(*(scheduler.search(q["query"]) for q in distinct_queries), return_exceptions=True),
+            asyncio.to_thread(fetch_and_limit_rss_feeds, RSS_FEEDS, 5),
+        )
+        results: List[Dict] = []
+        result_projects: List[Set[int]] = []
+        for query, output in zip(distinct_queries, search_outputs):
+            if isinstance(output, Exception):
+                print(f"  -> ⚠️ Error en la búsqueda '{query['query']}': {output}")
+                continue
+            for result in output:
+                results.append(result)
+                result_projects.append(query_projects[normalize_query(query["query"])])
+        # Las entradas RSS no salen de ninguna consulta: se asignan solo por similitud.
+        results.extend(rss_results)
+        result_projects.extend(set() for _ in rss_results)
+
+        unique_results, clusters = dedupe_results_with_clusters(results)
+        unique_projects = [set().union(*(result_projects[i] for i in c)) for c in clusters]
+        print(f"[Batch] {len(results)} resultados -> {len(unique_results)} URLs distintas.")
+
+        # --- 3. Escrutinio y extracción, una vez por URL ---
+        if settings.PREFILTER_ENABLED:
+            relevant = await scrutinize_with_prefilter(unique_results, llm_scrutinize, await asyncio.to_thread(load_trained_model))
+        else:
+            relevant = await llm_scrutinize(unique_results, on_verdict=mark_if_rejected)
+        relevant_ids = {id(r) for r in relevant}
+        relevant_indices = [i for i, r in enumerate(unique_results) if id(r) in relevant_ids]
+
+        semaphore = asyncio.Semaphore(settings.STREAM_EXTRACTION_WORKERS)
+
+        async def extract_one(index: int) -> List[FundingOpportunity]:
+            async with semaphore:
+                try:
+                    return await extract_item(unique_results[index])
+                except Exception as e:
+                    print(f"    ⚠️ Error durante la extracción de {unique_results[index].get('url')}: {e}")
+                    return []
+
+        if settings.TASK_QUEUE_ENABLED:
+            extracted = await extract_queued_by_source([unique_results[i] for i in relevant_indices])
+        else:
+            extracted = await asyncio.gather(*(extract_one(i) for i in relevant_indices))
+        opportunities: List[FundingOpportunity] = []
+        opportunity_projects: List[Set[int]] = []
+        for index, group in zip(relevant_indices, extracted):
+            opportunities.extend(group)
+            opportunity_projects.extend(unique_projects[index] for _ in group)
+
+        # --- 4. Resolución global y enriquecimiento único por oportunidad ---
+        groups = cluster_opportunities(opportunities)
+        pool = [merge_opportunities([opportunities[i] for i in g]) if len(g) > 1 else opportunities[g[0]] for g in groups]
+        pool_projects = [set().union(*(opportunity_projects[i] for i in g)) for g in groups]
+        print(f"[Batch] {len(opportunities)} oportunidades extraídas -> {len(pool)} distintas.")
+
+        enrich_semaphore = asyncio.Semaphore(settings.ENRICHMENT_MAX_CONCURRENCY)
+
+        async def enrich_one(opportunity: FundingOpportunity) -> Optional[FundingOpportunity]:
+            async with enrich_semaphore:
+                try:
+                    return await enrich_item(opportunity)
+                except Exception as e:
+                    print(f"  -> ❌ Error crítico durante el enriquecimiento de '{opportunity.origin}': {e}")
+                    return None
+
+        if settings.TASK_QUEUE_ENABLED:
+            enriched = await enrich_queued_by_item(pool)
+        else:
+            enriched = await asyncio.gather(*(enrich_one(o) for o in pool))
+        kept = [i for i, o in enumerate(enriched) if o is not None]
+        enriched_pool = [enriched[i] for i in kept]
+
+        # --- 5. Reparto del pool entre proyectos ---
+        matches = match_opportunities_to_projects(enriched_pool, [pool_projects[i] for i in kept], project_inputs)
+        for p, indices in enumerate(matches):
+            print(f"[Batch] Proyecto {p + 1}/{total_projects}: {len(indices)} oportunidades.")
+        return [[enriched_pool[i].dict() for i in indices] for indices in matches]
+
+    return RunnableLambda(
+        lambda project_inputs: run_sync(run_batch(project_inputs)),
+        afunc=run_batch
+    ).with_config({"run_name": "Batch Agent"})
@@ -1,88 +1,354 @@
 # src/pipelines/discovery.py
 import time
-from typing import List, Dict
+import asyncio
+import inspect
+from typing import List, Dict, Optional, Tuple, Callable, Awaitable, Union
 from langchain_core.runnables import Runnable, RunnableLambda, RunnableParallel
 
 from ..components.query_generator import create_query_generator_chain
-from ..components.researcher import create_research_chain, fetch_and_limit_rss_feeds, RSS_FEEDS
-from ..components.scrutinizer import create_scrutinizer_chain
-from ..components.extractor import create_full_extraction_pipeline
-from ..utils.normalizers import flatten_queries, combine_results, normalize_search_results
-from ..schemas.models import FundingOpportunityList
+from ..components.researcher import create_search_providers, fetch_and_limit_rss_feeds, RSS_FEEDS
+from ..components.search_scheduler import SearchProvider, SearchScheduler
+from ..components.scrutinizer import create_scrutinizer_chain, create_batch_scrutinizer_chain, format_sources_for_batch
+from ..components.extractor import create_extractor_chain, ascrape_content
+from ..components.prefilter import prefilter_results, record_scrutiny_decision, load_trained_model, TfidfLogisticModel
+from ..components.prioritizer import prioritize_results
+from ..utils.dedup import dedupe_search_results, resolve_extracted_opportunities
+from ..schemas.models import FundingOpportunity, BatchScrutinyResult
+from ..utils.rate_limiter import TokenBucketRateLimiter, get_gemini_rate_limiter, ainvoke_rate_limited
+from ..utils.prompt_budget import estimate_tokens
+from ..utils.concurrency import run_sync
+from ..utils.budget import BudgetExceededError, check_budget
+from ..utils.task_queue import SCRUTINIZE_STAGE, EXTRACT_STAGE, adispatch, task_key
+from ..utils.normalizers import canonicalize_url
+from ..utils.feed_state import get_feed_state
+from ..config import settings
 
-# --- ¡AQUÍ VIVE LA LÓGICA DE ORQUESTACIÓN SECUENCIAL! ---
+# --- ¡AQUÍ VIVE LA LÓGICA DE ORQUESTACIÓN! ---
 
-def scrutinize_sequentially(search_results: List[Dict], scrutinizer_chain: Runnable) -> List[Dict]:
-    """Evalúa los resultados de búsqueda uno por uno para encontrar fuentes relevantes."""
+# Callback por veredicto. Puede ser una corrutina: el escrutinio la espera, así
+# que un consumidor lento (p. ej. una cola acotada) frena al productor.
+VerdictCallback = Callable[[Dict, bool], Union[None, Awaitable[None]]]
+
+async def notify_verdict(on_verdict: Optional[VerdictCallback], result: Dict, is_relevant: bool) -> None:
+    """Llama a `on_verdict` (si lo hay) y espera su resultado si es awaitable."""
+    if on_verdict:
+        outcome = on_verdict(result, is_relevant)
+        if inspect.isawaitable(outcome):
+            await outcome
+
+async def mark_rejected_entries(results: List[Dict]) -> None:
+    """
+    Las entradas RSS descartadas en el escrutinio (pre-filtro o LLM) cuentan ya
+    como vistas: no se vuelven a ofrecer ni a escrutar en la próxima ejecución.
+    """
+    if results:
+        await asyncio.to_thread(get_feed_state().mark_processed, [r.get("url") for r in results])
+
+async def mark_if_rejected(result: Dict, is_relevant: bool) -> None:
+    """Callback de veredicto: da por vista la entrada RSS si el escrutinio la descarta."""
+    if not is_relevant:
+        await mark_rejected_entries([result])
+
+async def record_verdict(result: Dict, is_relevant: bool) -> None:
+    """Callback de veredicto del LLM: lo registra para el pre-filtro (`record_scrutiny_decision`) y marca los descartes."""
+    record_scrutiny_decision(result, is_relevant)
+    await mark_if_rejected(result, is_relevant)
+
+async def scrutinize_concurrently(
+    search_results: List[Dict],
+    scrutinizer_chain: Runnable,
+    rate_limiter: Optional[TokenBucketRateLimiter] = None,
+    max_concurrency: int = settings.SCRUTINY_MAX_CONCURRENCY,
+    on_verdict: Optional[VerdictCallback] = None,
+) -> List[Dict]:
+    """
+    Evalúa los resultados de búsqueda en paralelo, acotado por la cuota de Gemini.
+    En lugar de pausas fijas, cada llamada espera su turno en el limitador compartido,
+    así que el tiempo total depende de la cuota y no de `time.sleep`.
+    Devuelve las fuentes relevantes en el mismo orden en que llegaron.
+    """
     if not search_results: return []
-    print(f"\n[Discovery Stage] Escrutando {len(search_results)} resultados secuencialmente...")
+    rate_limiter = rate_limiter or get_gemini_rate_limiter()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    print(f"\n[Discovery Stage] Escrutando {len(search_results)} resultados (concurrencia máx: {max_concurrency})...")
+
+    async def scrutinize_one(index: int, result: Dict) -> Tuple[int, Optional[bool], float, float]:
+        title = result.get('title', 'Sin título')
+        tokens = estimate_tokens(title, result.get('url'), result.get('description'))
+        async with semaphore:
+            try:
+                scrutiny_output, latency, waited = await ainvoke_rate_limited(
+                    scrutinizer_chain, result, rate_limiter, tokens,
+                    max_attempts=settings.SCRUTINY_MAX_ATTEMPTS, label=title
+                )
+                await notify_verdict(on_verdict, result, scrutiny_output.is_relevant)
+                return index, scrutiny_output.is_relevant, latency, waited
+            except BudgetExceededError:
+                return index, None, 0.0, 0.0
+            except Exception as e:
+                print(f"    ⚠️ Error durante el escrutinio de '{title}': {e}")
+                return index, None, 0.0, 0.0
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(scrutinize_one(i, r) for i, r in enumerate(search_results)))
+
     filtered_results = []
-    for result in search_results:
+    for index, is_relevant, latency, waited in sorted(outcomes):
+        title = search_results[index].get('title', 'Sin título')
+        if is_relevant:
+            print(f"  -> ✅ Relevante ({latency:.2f}s, espera {waited:.2f}s): {title}")
+            filtered_results.append(search_results[index])
+        elif is_relevant is False:
+            print(f"  -> ❌ Descartado ({latency:.2f}s, espera {waited:.2f}s): {title}")
+    latencies = [latency for _, _, latency, _ in outcomes]
+    print(f"  -> Escrutinio completado en {time.perf_counter() - started:.1f}s "
+          f"(latencia media {sum(latencies) / len(latencies):.2f}s, máx {max(latencies):.2f}s). "
+          f"{len(filtered_results)}/{len(search_results)} relevantes.")
+    return filtered_results
+
+def plan_scrutiny_batches(
+    search_results: List[Dict],
+    max_items: int = settings.SCRUTINY_BATCH_MAX_ITEMS,
+    max_tokens: int = settings.SCRUTINY_BATCH_MAX_TOKENS,
+) -> List[List[int]]:
+    """
+    Agrupa los índices de los resultados en lotes que caben en el presupuesto de tokens.
+    El tamaño del lote se adapta a la longitud de cada resultado.
+    """
+    batches, current, current_tokens = [], [], 0
+    for i, result in enumerate(search_results):
+        tokens = estimate_tokens(result.get('title'), result.get('url'), (result.get('description') or '')[:500])
+        if current and (len(current) >= max_items or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def batch_verdicts(output: Optional[BatchScrutinyResult], size: int) -> Optional[List[bool]]:
+    """
+    Veredictos de un lote de `size` fuentes, en orden, solo si el modelo devolvió
+    exactamente uno por cada índice 0..size-1. Con índices desplazados (p. ej.
+    empezando en 1), repetidos u omitidos no se puede saber a qué fuente se
+    refiere cada veredicto, así que se devuelve None y el lote se reintenta.
+    """
+    verdicts = output.verdicts if output else []
+    by_index = {verdict.index: verdict.is_relevant for verdict in verdicts}
+    if len(verdicts) != size or set(by_index) != set(range(size)):
+        return None
+    return [by_index[i] for i in range(size)]
+
+async def scrutinize_in_batches(
+    search_results: List[Dict],
+    batch_scrutinizer_chain: Runnable,
+    scrutinizer_chain: Runnable,
+    rate_limiter: Optional[TokenBucketRateLimiter] = None,
+    max_concurrency: int = settings.SCRUTINY_MAX_CONCURRENCY,
+    on_verdict: Optional[VerdictCallback] = None,
+) -> List[Dict]:
+    """
+    Escruta los resultados empaquetando varios por llamada al LLM.
+    Un lote solo se acepta si trae exactamente un veredicto por índice 0..n-1
+    (ver `batch_verdicts`); si no, se reintenta partido en lotes más pequeños y,
+    en último caso, uno a uno con la cadena individual. Devuelve las fuentes
+    relevantes en el orden original.
+    """
+    if not search_results: return []
+    rate_limiter = rate_limiter or get_gemini_rate_limiter()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    batches = plan_scrutiny_batches(search_results)
+    verdicts: Dict[int, bool] = {}
+    llm_calls = 0
+    print(f"\n[Discovery Stage] Escrutando {len(search_results)} resultados en {len(batches)} lotes...")
+
+    async def scrutinize_single(index: int) -> None:
+        nonlocal llm_calls
+        result = search_results[index]
+        tokens = estimate_tokens(result.get('title'), result.get('url'), result.get('description'))
+        try:
+            llm_calls += 1
+            output, _, _ = await ainvoke_rate_limited(
+                scrutinizer_chain, result, rate_limiter, tokens,
+                max_attempts=settings.SCRUTINY_MAX_ATTEMPTS, label=result.get('title', 'Sin título')
+            )
+            verdicts[index] = output.is_relevant
+            await notify_verdict(on_verdict, result, output.is_relevant)
+        except BudgetExceededError:
+            return
+        except Exception as e:
+            print(f"    ⚠️ Error durante el escrutinio de '{result.get('title', 'Sin título')}': {e}")
+
+    async def scrutinize_batch(indices: List[int]) -> None:
+        nonlocal llm_calls
+        if len(indices) == 1:
+            await scrutinize_single(indices[0])
+            return
+        batch = [search_results[i] for i in indices]
+        sources = format_sources_for_batch(batch)
+        missing = list(indices)
         try:
-            print(f"  -> Escrutando: {result.get('title', 'Sin título')}")
-            scrutiny_output = scrutinizer_chain.invoke(result)
-            if scrutiny_output.is_relevant:
-                print("    ✅ Relevante.")
-                filtered_results.append(result)
+            llm_calls += 1
+            output, latency, waited = await ainvoke_rate_limited(
+                batch_scrutinizer_chain, {"sources": sources}, rate_limiter, estimate_tokens(sources),
+                max_attempts=settings.SCRUTINY_MAX_ATTEMPTS, label=f"lote de {len(indices)}"
+            )
+            batch_result = batch_verdicts(output, len(indices))
+            if batch_result is None:
+                print(f"  -> ⚠️ Lote de {len(indices)} con índices inválidos o incompletos: se reintenta partido.")
             else:
-                print("    ❌ Descartado.")
-            time.sleep(4.1) # Pausa para respetar el límite de 15 RPM
+                for index, result, is_relevant in zip(indices, batch, batch_result):
+                    verdicts[index] = is_relevant
+                    await notify_verdict(on_verdict, result, is_relevant)
+                missing = []
+                print(f"  -> Lote de {len(indices)} escrutado ({latency:.2f}s, espera {waited:.2f}s).")
+        except BudgetExceededError:
+            return
         except Exception as e:
-            print(f"    ⚠️ Error durante el escrutinio: {e}")
-            continue
+            print(f"    ⚠️ Respuesta inválida para un lote de {len(indices)}: {e}")
+        if missing:
+            # Reintentamos los que faltan partiendo el lote a la mitad.
+            half = (len(missing) + 1) // 2
+            await asyncio.gather(*(scrutinize_batch(part) for part in (missing[:half], missing[half:]) if part))
+
+    async def run_batch(indices: List[int]) -> None:
+        async with semaphore:
+            await scrutinize_batch(indices)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_batch(b) for b in batches))
+
+    filtered_results = [r for i, r in enumerate(search_results) if verdicts.get(i)]
+    print(f"  -> Escrutinio por lotes completado en {time.perf_counter() - started:.1f}s con {llm_calls} llamadas al LLM. "
+          f"{len(filtered_results)}/{len(search_results)} relevantes.")
     return filtered_results
 
-def extract_sequentially(relevant_results: List[Dict], extractor_chain: Runnable) -> List[Dict]:
-    """Extrae información detallada de las fuentes relevantes, una por una."""
+async def scrutinize_with_prefilter(
+    search_results: List[Dict],
+    llm_scrutinize: Callable[..., Awaitable[List[Dict]]],
+    model: Optional[TfidfLogisticModel] = None,
+) -> List[Dict]:
+    """
+    Resuelve localmente los casos evidentes (reglas, palabras clave y modelo aprendido)
+    y envía al escrutador LLM solo la franja incierta. Las decisiones del LLM se
+    registran para reentrenar el modelo local. Mantiene el orden original.
+    """
+    if not search_results: return []
+    decisions, stats = prefilter_results(search_results, model)
+    uncertain = [r for r, d in zip(search_results, decisions) if d is None]
+    saved = len(search_results) - len(uncertain)
+    print(f"\n[Discovery Stage] Pre-filtro local: {saved}/{len(search_results)} resueltos sin LLM {stats}")
+
+    await mark_rejected_entries([r for r, d in zip(search_results, decisions) if d is False])
+    llm_relevant = await llm_scrutinize(uncertain, on_verdict=record_verdict) if uncertain else []
+    llm_relevant_ids = {id(r) for r in llm_relevant}
+    return [r for r, d in zip(search_results, decisions) if d or (d is None and id(r) in llm_relevant_ids)]
+
+async def extract_concurrently(
+    relevant_results: List[Dict],
+    extract_item: Callable[[Dict], Awaitable[List[FundingOpportunity]]],
+    max_concurrency: int = settings.STREAM_EXTRACTION_WORKERS,
+) -> List[FundingOpportunity]:
+    """
+    Extrae las oportunidades de las fuentes relevantes en paralelo. La cuota la
+    regula el limitador compartido (ver `create_item_extractor`), no pausas fijas.
+    Un fallo en una fuente no afecta a las demás; el orden de salida se conserva.
+    Las fuentes se lanzan en el orden recibido (ya priorizado), así que si se
+    agota el presupuesto de la ejecución quedan sin extraer las menos prioritarias.
+    """
     if not relevant_results: return []
-    print(f"\n[Discovery Stage] Extrayendo de {len(relevant_results)} fuentes secuencialmente...")
-    all_opportunities = []
-    for result in relevant_results:
-        try:
-            print(f"  -> Extrayendo de: {result.get('url')}")
-            opportunity_list = extractor_chain.invoke(result)
-            # La salida del extractor es FundingOpportunityList, accedemos a su contenido
-            all_opportunities.extend(opportunity_list.opportunities)
-        except Exception as e:
-            print(f"    ⚠️ Error durante la extracción: {e}")
-            continue
-        time.sleep(2) # Pausa entre extracciones
-    return all_opportunities
+    print(f"\n[Discovery Stage] Extrayendo de {len(relevant_results)} fuentes (concurrencia máx: {max_concurrency})...")
+    semaphore = asyncio.Semaphore(max_concurrency)
 
-# --- FIN DE LA LÓGICA DE ORQUESTACIÓN ---
+    async def extract_one(result: Dict) -> List[FundingOpportunity]:
+        async with semaphore:
+            try:
+                print(f"  -> Extrayendo de: {result.get('url')}")
+                return await extract_item(result)
+            except BudgetExceededError:
+                return []
+            except Exception as e:
+                print(f"    ⚠️ Error durante la extracción: {e}")
+                return []
+
+    extracted = await asyncio.gather(*(extract_one(r) for r in relevant_results))
+    return [opportunity for group in extracted for opportunity in group]
 
-def create_discovery_pipeline():
+async def scrutinize_queued(
+    search_results: List[Dict],
+    on_verdict: Optional[VerdictCallback] = None,
+) -> List[Dict]:
     """
-    Crea el pipeline de descubrimiento con el flujo de datos corregido y pasos nombrados.
+    Como `scrutinize_in_batches`, pero los lotes se encolan y los escrutan los
+    workers (`python -m src.worker`). Los veredictos se registran aquí, en el
+    productor. Devuelve las fuentes relevantes en el orden original.
     """
-    query_generator = create_query_generator_chain()
-    web_researcher = create_research_chain()
-    scrutinizer = create_scrutinizer_chain()
-    extractor = create_full_extraction_pipeline()
+    if not search_results: return []
+    batches = plan_scrutiny_batches(search_results)
+    items = [
+        (task_key(SCRUTINIZE_STAGE, [[search_results[i].get(f) for f in ("url", "title", "description")] for i in batch]),
+         [search_results[i] for i in batch])
+        for batch in batches
+    ]
+    outcomes = await adispatch(SCRUTINIZE_STAGE, items)
+    relevant = set()
+    for batch, (key, _) in zip(batches, items):
+        outcome = outcomes.get(key)
+        verdicts = (outcome.result if outcome and outcome.status == "done" else None) or []
+        for index, is_relevant in zip(batch, verdicts):
+            if is_relevant is None:
+                continue
+            await notify_verdict(on_verdict, search_results[index], is_relevant)
+            if is_relevant:
+                relevant.add(index)
+    print(f"  -> Escrutinio en la cola completado: {len(relevant)}/{len(search_results)} relevantes.")
+    return [r for i, r in enumerate(search_results) if i in relevant]
 
-    # --- LÓGICA DE PIPELINE CORREGIDA ---
+async def extract_queued_by_source(relevant_results: List[Dict]) -> List[List[FundingOpportunity]]:
+    """
+    Encola cada fuente (clave: su URL canónica) para que la extraigan los workers.
+    Devuelve, por fuente y en el mismo orden, sus oportunidades; las fuentes que
+    acaban en fallidos o no se resuelven a tiempo no aportan ninguna.
+    """
+    if not relevant_results: return []
+    items = [(task_key(EXTRACT_STAGE, canonicalize_url(r.get("url") or "") or r.get("title")), r) for r in relevant_results]
+    outcomes = await adispatch(EXTRACT_STAGE, items)
+    extracted = []
+    for key, _ in items:
+        outcome = outcomes.get(key)
+        done = outcome is not None and outcome.status == "done"
+        extracted.append([FundingOpportunity(**o) for o in outcome.result or []] if done else [])
+    return extracted
 
-    # Paso 1: Definimos una cadena que BUSCA y LUEGO NORMALIZA un resultado de búsqueda.
-    # La salida de web_researcher es un dict {'tavily': ..., 'brave': ...}.
-    # La entrada de normalize_search_results es exactamente ese dict. Encajan perfectamente.
-    search_and_normalize_one = (
-        web_researcher 
-        | RunnableLambda(normalize_search_results)
-    ).with_config({"run_name": "Search & Normalize One Query"})
-
-    # Paso 2: Creamos el pipeline de búsqueda web.
-    web_search_pipeline = (
-        RunnableLambda(flatten_queries).with_config({"run_name": "Flattening Queries"})
-        # Ahora mapeamos la cadena 'search_and_normalize_one'. 
-        # Su salida será una lista de listas de resultados normalizados.
-        | search_and_normalize_one.map()
-        # combine_results ahora recibe la entrada correcta (una lista de listas) y funciona.
-        | RunnableLambda(combine_results).with_config({"run_name": "Combining Web Results"})
-    )
+async def extract_queued(relevant_results: List[Dict]) -> List[FundingOpportunity]:
+    """Como `extract_concurrently`, pero la extracción la hacen los workers (ver `extract_queued_by_source`)."""
+    return [o for group in await extract_queued_by_source(relevant_results) for o in group]
+
+# --- FIN DE LA LÓGICA DE ORQUESTACIÓN ---
+
+def create_research_pipeline(
+    search_providers_factory: Callable[[], List[SearchProvider]] = create_search_providers,
+    rss_fetcher: Callable[..., List[Dict]] = fetch_and_limit_rss_feeds,
+):
+    """
+    Crea la etapa de investigación: recibe la lista de ideas de búsqueda y devuelve
+    los resultados normalizados de la web y de RSS, combinados y deduplicados.
+    Las fábricas inyectables permiten sustituir los buscadores y los feeds
+    (p. ej. por fixtures grabados en los benchmarks).
+    """
+    scheduler = SearchScheduler(search_providers_factory())
+
+    # Paso 1-2: El planificador reparte las consultas de cada idea entre los
+    # buscadores (según cuota, latencia y coste) y corta al reunir suficientes URLs.
+    web_search_pipeline = RunnableLambda(
+        lambda ideas: run_sync(scheduler.search_ideas(ideas)),
+        afunc=scheduler.search_ideas
+    ).with_config({"run_name": "Searching Web"})
 
     # Paso 3: Creamos el pipeline de RSS (sin cambios)
     rss_fetcher_pipeline = RunnableLambda(
-        lambda _: fetch_and_limit_rss_feeds(RSS_FEEDS, limit_per_feed=5)
+        lambda _: rss_fetcher(RSS_FEEDS, limit_per_feed=5)
     ).with_config({"run_name": "Fetching RSS Feeds"})
 
     # Paso 4: Unimos la búsqueda web y RSS en paralelo
@@ -90,25 +356,122 @@ def create_discovery_pipeline():
         web_results=web_search_pipeline,
         rss_results=rss_fetcher_pipeline
     ).with_config({"run_name": "Performing Research (Web + RSS)"})
-    
+
+    return (
+        research_step
+        # Combinamos los resultados de las dos ramas de investigación
+        | RunnableLambda(lambda x: x['web_results'] + x['rss_results']).with_config({"run_name": "Combining All Sources"})
+        | RunnableLambda(dedupe_search_results).with_config({"run_name": "Deduplicating Results"})
+    )
+
+def create_llm_scrutinizer(
+    scrutinizer_factory: Callable[[], Runnable] = create_scrutinizer_chain,
+    batch_scrutinizer_factory: Callable[[], Runnable] = create_batch_scrutinizer_chain,
+    rate_limiter: Optional[TokenBucketRateLimiter] = None,
+) -> Callable[..., Awaitable[List[Dict]]]:
+    """
+    Devuelve la función asíncrona que escruta con el LLM (por lotes o item a item,
+    según `SCRUTINY_BATCH_MODE`). Acepta un callback `on_verdict` por resultado,
+    síncrono o corrutina (ver `VerdictCallback`).
+    """
+    scrutinizer = scrutinizer_factory()
+    batch_scrutinizer = batch_scrutinizer_factory()
+
+    async def llm_scrutinize(results: List[Dict], on_verdict: Optional[VerdictCallback] = None) -> List[Dict]:
+        if settings.SCRUTINY_BATCH_MODE:
+            return await scrutinize_in_batches(results, batch_scrutinizer, scrutinizer, rate_limiter, on_verdict=on_verdict)
+        return await scrutinize_concurrently(results, scrutinizer, rate_limiter, on_verdict=on_verdict)
+
+    return llm_scrutinize
+
+def create_item_extractor(
+    extractor_factory: Callable[[], Runnable] = create_extractor_chain,
+    rate_limiter: Optional[TokenBucketRateLimiter] = None,
+) -> Callable[[Dict], Awaitable[List[FundingOpportunity]]]:
+    """
+    Devuelve la función asíncrona que scrapea UNA fuente relevante y extrae sus
+    oportunidades, respetando el limitador compartido. Lanza la excepción si falla.
+    """
+    extractor_chain = extractor_factory()
+    rate_limiter = rate_limiter or get_gemini_rate_limiter()
+
+    async def extract_item(result: Dict) -> List[FundingOpportunity]:
+        check_budget()  # Sin presupuesto no merece la pena ni descargar la página.
+        item = await ascrape_content(dict(result))
+        opportunity_list, _, _ = await ainvoke_rate_limited(
+            extractor_chain, item, rate_limiter, estimate_tokens(item.get("page_content", "")),
+            max_attempts=settings.SCRUTINY_MAX_ATTEMPTS, label=result.get("url", "")
+        )
+        # Una entrada RSS relevante cuenta como vista solo cuando se completa su extracción.
+        await asyncio.to_thread(get_feed_state().mark_processed, [result.get("url")])
+        if not opportunity_list:
+            return []
+        for opportunity in opportunity_list.opportunities:
+            opportunity.source_url = result.get("url")
+        return list(opportunity_list.opportunities)
+
+    return extract_item
+
+def create_discovery_pipeline(
+    query_generator_factory: Callable[[], Runnable] = create_query_generator_chain,
+    search_providers_factory: Callable[[], List[SearchProvider]] = create_search_providers,
+    rss_fetcher: Callable[..., List[Dict]] = fetch_and_limit_rss_feeds,
+    scrutinizer_factory: Callable[[], Runnable] = create_scrutinizer_chain,
+    batch_scrutinizer_factory: Callable[[], Runnable] = create_batch_scrutinizer_chain,
+    extractor_factory: Callable[[], Runnable] = create_extractor_chain,
+    rate_limiter: Optional[TokenBucketRateLimiter] = None,
+):
+    """
+    Crea el pipeline de descubrimiento con el flujo de datos corregido y pasos nombrados.
+
+    Todas las dependencias externas (LLM, buscadores, feeds y limitador de cuota)
+    se obtienen de fábricas inyectables; por defecto son las reales. Los
+    benchmarks offline las sustituyen por fixtures y un modelo falso.
+    """
+    query_generator = query_generator_factory()
+    research_pipeline = create_research_pipeline(search_providers_factory, rss_fetcher)
+    # Con la cola activada, el escrutinio y la extracción los hacen los workers (`python -m src.worker`).
+    if settings.TASK_QUEUE_ENABLED:
+        llm_scrutinize = scrutinize_queued
+    else:
+        llm_scrutinize = create_llm_scrutinizer(scrutinizer_factory, batch_scrutinizer_factory, rate_limiter)
+    extract_item = create_item_extractor(extractor_factory, rate_limiter)
+
+    # --- LÓGICA DE PIPELINE CORREGIDA ---
+
     # Paso 5: Nombramos los pasos secuenciales de análisis
+    # Los resultados se ordenan por prioridad antes del escrutinio: el orden se
+    # conserva en la extracción y, con el presupuesto justo, se procesan los mejores.
+    async def scrutinize_step_async(results):
+        if settings.PREFILTER_ENABLED:
+            model = await asyncio.to_thread(load_trained_model)
+            prioritized = await asyncio.to_thread(prioritize_results, results, model)
+            return await scrutinize_with_prefilter(prioritized, llm_scrutinize, model)
+        return await llm_scrutinize(await asyncio.to_thread(prioritize_results, results), on_verdict=mark_if_rejected)
+
     scrutinizer_step = RunnableLambda(
-        lambda results: scrutinize_sequentially(results, scrutinizer)
+        lambda results: run_sync(scrutinize_step_async(results)),
+        afunc=scrutinize_step_async
     ).with_config({"run_name": "Scrutinizing Results"})
     
+    async def extractor_step_async(results):
+        if settings.TASK_QUEUE_ENABLED:
+            return await extract_queued(results)
+        return await extract_concurrently(results, extract_item)
+
     extractor_step = RunnableLambda(
-        lambda results: extract_sequentially(results, extractor)
+        lambda results: run_sync(extractor_step_async(results)),
+        afunc=extractor_step_async
     ).with_config({"run_name": "Extracting Opportunities"})
 
     # Paso 6: Ensamblamos el pipeline de descubrimiento final
     discovery_pipeline = (
         query_generator.with_config({"run_name": "Generating Queries"})
         | RunnableLambda(lambda x: x['queries'])
-        | research_step
-        # Combinamos los resultados de las dos ramas de investigación
-        | RunnableLambda(lambda x: x['web_results'] + x['rss_results']).with_config({"run_name": "Combining All Sources"})
+        | research_pipeline
         | scrutinizer_step
         | extractor_step
+        | RunnableLambda(resolve_extracted_opportunities).with_config({"run_name": "Resolving Duplicate Opportunities"})
     )
     
-    return discovery_pipeline
\ No newline at end of file
+    return discovery_pipeline
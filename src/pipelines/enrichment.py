@@ -1,41 +1,186 @@
 # src/pipelines/enrichment.py
-import time
-from typing import List, Dict
-from langchain_core.runnables import RunnableLambda
-from ..components.enricher import create_full_enrichment_pipeline
+import json
+import asyncio
+from typing import List, Dict, Optional, Callable, Awaitable
+from urllib.parse import urlparse
+from langchain_core.runnables import Runnable, RunnableLambda, RunnableConfig
+from ..components.enricher import create_deep_dive_chain, find_best_url, aload_page_content
+from ..components.prioritizer import prioritize_opportunities
 from ..schemas.models import FundingOpportunity
+from ..utils.rate_limiter import TokenBucketRateLimiter, get_gemini_rate_limiter, ainvoke_rate_limited
+from ..utils.prompt_budget import estimate_tokens
+from ..utils.concurrency import run_sync
+from ..utils.opportunity_store import get_opportunity_store, parse_deadline, opportunity_key
+from ..utils.normalizers import canonicalize_url
+from ..utils.metrics import arecord_metric
+from ..utils.budget import BudgetExceededError, check_budget
+from ..utils.task_queue import ENRICH_STAGE, adispatch, task_key
+from ..config import settings
 
-def create_enrichment_orchestrator():
-    """Crea una cadena que toma una LISTA de oportunidades y las enriquece secuencialmente."""
-    
-    enrichment_worker_pipeline = create_full_enrichment_pipeline()
-
-    def process_list_sequentially(opportunities_list: List[FundingOpportunity]) -> List[FundingOpportunity]:
-        print(f"\n[Enrichment Stage] Iniciando enriquecimiento para {len(opportunities_list)} oportunidades...")
-        enriched_opportunities = []
-        
-        for i, opportunity in enumerate(opportunities_list):
-            print(f"--- Enriqueciendo {i+1}/{len(opportunities_list)}: {opportunity.origin} ---")
+def is_complete(opportunity: FundingOpportunity) -> bool:
+    """
+    Una oportunidad está completa si ya tiene fecha límite legible, requisitos y
+    URL, y esa URL es la misma página de la que se extrajo: el enriquecimiento
+    volvería a leer la misma página para no aportar nada.
+    """
+    return bool(
+        parse_deadline(opportunity.application_deadline)
+        and opportunity.main_requirements
+        and opportunity.opportunity_url
+        and opportunity.source_url
+        and canonicalize_url(opportunity.opportunity_url) == canonicalize_url(opportunity.source_url)
+    )
+
+def create_item_enricher(
+    refinement_chain: Runnable,
+    rate_limiter: Optional[TokenBucketRateLimiter] = None,
+    max_per_domain: int = settings.ENRICHMENT_MAX_PER_DOMAIN,
+    url_finder: Callable[[Dict], Dict] = find_best_url,
+) -> Callable[[FundingOpportunity], Awaitable[FundingOpportunity]]:
+    """
+    Devuelve la función asíncrona que enriquece UNA oportunidad: busca la URL si
+    falta, la scrapea respetando el límite por dominio y la refina con el LLM
+    usando el limitador compartido. Las oportunidades ya completas (ver
+    `is_complete`) se devuelven tal cual, sin scrape ni llamada al LLM.
+    Cada item se ejecuta como un run con nombre propio ("Enriching Item: ...")
+    para el streaming de eventos.
+    Las oportunidades enriquecidas se guardan en el almacén local de oportunidades.
+    """
+    rate_limiter = rate_limiter or get_gemini_rate_limiter()
+    domain_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def domain_semaphore(url: Optional[str]) -> asyncio.Semaphore:
+        domain = urlparse(url or "").netloc.lower()
+        if domain not in domain_semaphores:
+            domain_semaphores[domain] = asyncio.Semaphore(max_per_domain)
+        return domain_semaphores[domain]
+
+    async def enrich_one(opportunity: dict, config: RunnableConfig) -> FundingOpportunity:
+        source_url = opportunity.get("source_url")
+        if settings.ENRICHMENT_SKIP_COMPLETE and is_complete(FundingOpportunity(**opportunity)):
+            print(f"  -> ⚡ Ya completa en su página de origen, se omite el enriquecimiento: {opportunity.get('origin')}")
+            await arecord_metric("enrichment_skipped", 1, config)
+            return FundingOpportunity(**opportunity)
+        check_budget()
+        opportunity = await asyncio.to_thread(url_finder, opportunity)
+        async with domain_semaphore(opportunity.get("opportunity_url")):
+            opportunity = await aload_page_content(opportunity)
+        tokens = estimate_tokens(json.dumps(opportunity, ensure_ascii=False))
+        enriched_result, _, _ = await ainvoke_rate_limited(
+            refinement_chain, opportunity, rate_limiter, tokens,
+            max_attempts=settings.ENRICHMENT_MAX_ATTEMPTS, label=opportunity.get("origin", ""), config=config
+        )
+        if enriched_result is not None:
+            enriched_result.source_url = source_url
+        return enriched_result
+
+    worker = RunnableLambda(lambda x, config: run_sync(enrich_one(x, config)), afunc=enrich_one)
+
+    async def enrich_item(opportunity: FundingOpportunity, config: Optional[RunnableConfig] = None) -> FundingOpportunity:
+        # Nombre dinámico por item: el frontend podrá mostrar "Enriching Item: Climate Change AI"...
+        enriched = await worker.ainvoke(
+            opportunity.dict(), # El worker espera un dict
+            config={**(config or {}), "run_name": f"Enriching Item: {opportunity.origin[:40]}"} # Limitamos a 40 chars
+        )
+        if enriched is not None and settings.OPPORTUNITY_STORE_ENABLED:
+            await asyncio.to_thread(get_opportunity_store().upsert, [enriched])
+        return enriched
+
+    return enrich_item
+
+async def enrich_concurrently(
+    opportunities_list: List[FundingOpportunity],
+    refinement_chain: Runnable,
+    rate_limiter: Optional[TokenBucketRateLimiter] = None,
+    max_concurrency: int = settings.ENRICHMENT_MAX_CONCURRENCY,
+    max_per_domain: int = settings.ENRICHMENT_MAX_PER_DOMAIN,
+    url_finder: Callable[[Dict], Dict] = find_best_url,
+) -> List[FundingOpportunity]:
+    """
+    Enriquece las oportunidades en paralelo solapando la E/S de red entre items.
+    - Un semáforo global limita los items en vuelo y otro por dominio evita
+      saturar el mismo sitio.
+    - Las llamadas al LLM comparten el limitador de cuota de Gemini.
+    - Un fallo en un item no afecta a los demás.
+    - Las vencidas se descartan y el resto se procesa (y se devuelve) por orden
+      de prioridad. Si se agota el presupuesto de la ejecución, las que faltan
+      se devuelven tal como salieron de la extracción (resultado parcial).
+    """
+    opportunities_list = await asyncio.to_thread(prioritize_opportunities, opportunities_list)
+    if not opportunities_list: return []
+    enrich_item = create_item_enricher(refinement_chain, rate_limiter, max_per_domain, url_finder)
+    global_semaphore = asyncio.Semaphore(max_concurrency)
+    total = len(opportunities_list)
+    print(f"\n[Enrichment Stage] Iniciando enriquecimiento para {total} oportunidades "
+          f"(concurrencia máx: {max_concurrency}, por dominio: {max_per_domain})...")
+
+    async def process_item(i: int, opportunity: FundingOpportunity) -> Optional[FundingOpportunity]:
+        async with global_semaphore:
+            print(f"--- Enriqueciendo {i+1}/{total}: {opportunity.origin} ---")
             try:
-                # --- ¡MODIFICACIÓN CLAVE AQUÍ! ---
-                # Creamos un nombre dinámico para la ejecución de cada item.
-                # El frontend podrá mostrar "Enriqueciendo: Climate Change AI"...
-                run_config = {
-                    "run_name": f"Enriching Item: {opportunity.origin[:40]}" # Limitamos a 40 chars
-                }
-                
-                # Pasamos la configuración directamente a la llamada .invoke()
-                enriched_result = enrichment_worker_pipeline.invoke(
-                    opportunity.dict(), # El worker espera un dict
-                    config={"callbacks": run_config.get("callbacks"), **run_config}
-                )
-                
-                enriched_opportunities.append(enriched_result)
+                return await enrich_item(opportunity)
+            except BudgetExceededError:
+                return opportunity
             except Exception as e:
-                print(f"  -> ❌ Error crítico durante el enriquecimiento: {e}")
-                continue
-            time.sleep(2)
-            
-        return enriched_opportunities
+                print(f"  -> ❌ Error crítico durante el enriquecimiento de '{opportunity.origin}': {e}")
+                return None
+
+    results = await asyncio.gather(*(process_item(i, o) for i, o in enumerate(opportunities_list)))
+    return [r for r in results if r is not None]
+
+async def enrich_queued_by_item(opportunities_list: List[FundingOpportunity]) -> List[Optional[FundingOpportunity]]:
+    """
+    Encola cada oportunidad (en el orden recibido) para que la enriquezcan los
+    workers. Devuelve, en el mismo orden, la versión enriquecida, la original si
+    no se resolvió a tiempo, o None si acabó en fallidos.
+    """
+    if not opportunities_list: return []
+    items = [(task_key(ENRICH_STAGE, opportunity_key(o), o.model_dump(mode="json")), o.model_dump(mode="json"))
+             for o in opportunities_list]
+    outcomes = await adispatch(ENRICH_STAGE, items)
+    results: List[Optional[FundingOpportunity]] = []
+    enriched = []
+    for (key, _), opportunity in zip(items, opportunities_list):
+        outcome = outcomes.get(key)
+        if outcome is None:
+            results.append(opportunity)
+        elif outcome.status == "done" and outcome.result:
+            enriched.append(FundingOpportunity(**outcome.result))
+            results.append(enriched[-1])
+        else:
+            results.append(None)
+    # Los workers pueden estar en otros hosts: el almacén local también se actualiza.
+    if enriched and settings.OPPORTUNITY_STORE_ENABLED:
+        await asyncio.to_thread(get_opportunity_store().upsert, enriched)
+    return results
+
+async def enrich_queued(opportunities_list: List[FundingOpportunity]) -> List[FundingOpportunity]:
+    """
+    Como `enrich_concurrently`, pero cada oportunidad se encola (en orden de
+    prioridad) y la enriquecen los workers. Las que acaban en fallidos se
+    descartan; las que no se resuelven a tiempo se devuelven sin enriquecer.
+    """
+    opportunities_list = await asyncio.to_thread(prioritize_opportunities, opportunities_list)
+    return [o for o in await enrich_queued_by_item(opportunities_list) if o is not None]
+
+def create_enrichment_orchestrator(
+    deep_dive_factory: Callable[[], Runnable] = create_deep_dive_chain,
+    url_finder: Callable[[Dict], Dict] = find_best_url,
+    rate_limiter: Optional[TokenBucketRateLimiter] = None,
+):
+    """
+    Crea una cadena que toma una LISTA de oportunidades y las enriquece en paralelo.
+    El LLM, la búsqueda de URL y el limitador son inyectables (ver `create_discovery_pipeline`).
+    """
+
+    refinement_chain = deep_dive_factory()
+
+    async def process_list_concurrently(opportunities_list: List[FundingOpportunity]) -> List[FundingOpportunity]:
+        if settings.TASK_QUEUE_ENABLED:
+            return await enrich_queued(opportunities_list)
+        return await enrich_concurrently(opportunities_list, refinement_chain, rate_limiter, url_finder=url_finder)
 
-    return RunnableLambda(process_list_sequentially)
\ No newline at end of file
+    return RunnableLambda(
+        lambda opportunities_list: run_sync(process_list_concurrently(opportunities_list)),
+        afunc=process_list_concurrently
+    )
@@ -1,20 +1,51 @@
 # src/pipelines/full_agent.py
-from langchain_core.runnables import RunnableLambda
+from typing import Dict, List
+from langchain_core.runnables import RunnableLambda, RunnableConfig
 from .discovery import create_discovery_pipeline
 from .enrichment import create_enrichment_orchestrator as create_enrichment_pipeline
+from .streaming import create_streaming_agent_pipeline
+from ..schemas.models import FundingOpportunity
+from ..utils.dedup import IncrementalOpportunityResolver
 from ..utils.normalizers import flatten_opportunities
+from ..utils.opportunity_store import recall_known_opportunities
+from ..utils.budget import RunBudget, use_budget
+from ..config import settings
 
-def create_full_agent_pipeline():
+def exclude_known(known: List[FundingOpportunity], discovered: List[FundingOpportunity]) -> List[FundingOpportunity]:
+    """Descarta las oportunidades descubiertas que ya están entre las conocidas (no se vuelven a enriquecer)."""
+    resolver = IncrementalOpportunityResolver()
+    for opportunity in known:
+        resolver.add(opportunity)
+    new = [o for o in discovered if resolver.add(o)]
+    if resolver.duplicates:
+        print(f"\n[Opportunity Store] {resolver.duplicates} oportunidades ya conocidas no se vuelven a enriquecer.")
+    return new
+
+def create_full_agent_pipeline(streaming: bool = False):
     """
     Crea y devuelve el pipeline COMPLETO y unificado, con nombres de pasos
     para la observabilidad y el streaming.
+
+    Antes de buscar en la web se consulta el almacén local de oportunidades:
+    si ya hay suficientes coincidencias vigentes se devuelven al instante y la
+    investigación web solo se lanza para cubrir los huecos.
+
+    Cada ejecución tiene un presupuesto (`RunBudget`) con límites duros de
+    llamadas al LLM, tokens y tiempo, configurables por ejecución con
+    `config={"configurable": {"budget": {"max_llm_calls": 50, ...}}}`. Al
+    alcanzarlos se devuelven las oportunidades conseguidas hasta entonces.
+
+    Con `streaming=True` se usa la versión sin barreras entre etapas, que emite
+    cada oportunidad enriquecida en cuanto está lista (ver `create_streaming_agent_pipeline`).
     """
-    
+    if streaming:
+        return create_streaming_agent_pipeline()
+
     # Obtenemos los pipelines y les asignamos un nombre de alto nivel
     discovery_pipeline = create_discovery_pipeline().with_config({
         "run_name": "Stage 1: Discovery"
     })
-    
+
     enrichment_pipeline = create_enrichment_pipeline().with_config({
         "run_name": "Stage 2: Enrichment"
     })
@@ -24,11 +55,35 @@ def create_full_agent_pipeline():
         "run_name": "Formatting Final Output"
     })
 
+    recall_step = RunnableLambda(
+        lambda project_input: {"project_input": project_input, "known": recall_known_opportunities(project_input)}
+    ).with_config({"run_name": "Recalling Known Opportunities"})
+
+    def has_enough_known(state: Dict) -> bool:
+        if len(state["known"]) >= settings.OPPORTUNITY_STORE_MIN_HITS:
+            print(f"\n[Opportunity Store] {len(state['known'])} coincidencias vigentes: se omite la investigación web.")
+            return True
+        return False
+
+    def research_gaps(state: Dict, config: RunnableConfig) -> List[FundingOpportunity]:
+        if has_enough_known(state):
+            return state["known"]
+        with use_budget(RunBudget.from_config(config)):
+            discovered = discovery_pipeline.invoke(state["project_input"], config)
+            return state["known"] + enrichment_pipeline.invoke(exclude_known(state["known"], discovered), config)
+
+    async def aresearch_gaps(state: Dict, config: RunnableConfig) -> List[FundingOpportunity]:
+        if has_enough_known(state):
+            return state["known"]
+        with use_budget(RunBudget.from_config(config)):
+            discovered = await discovery_pipeline.ainvoke(state["project_input"], config)
+            return state["known"] + await enrichment_pipeline.ainvoke(exclude_known(state["known"], discovered), config)
+
     # Unimos los grandes bloques ya nombrados
     full_pipeline = (
-        discovery_pipeline 
-        | enrichment_pipeline 
+        recall_step
+        | RunnableLambda(research_gaps, afunc=aresearch_gaps).with_config({"run_name": "Researching Gaps"})
         | final_formatter
     )
-    
-    return full_pipeline
\ No newline at end of file
+
+    return full_pipeline
@@ -0,0 +1,206 @@
+# src/pipelines/graph.py
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, TypedDict
+
+from langgraph.graph import StateGraph, START, END
+from langgraph.checkpoint.memory import MemorySaver
+
+from ..components.query_generator import create_query_generator_chain
+from ..components.enricher import create_deep_dive_chain
+from ..components.prefilter import prefilter_results, load_trained_model
+from ..schemas.models import FundingOpportunity
+from ..utils.checkpoints import CheckpointStore, get_checkpoint_store, item_key
+from ..utils.dedup import resolve_opportunities
+from ..utils.concurrency import run_sync
+from ..config import settings
+from .discovery import (
+    create_research_pipeline, create_llm_scrutinizer, create_item_extractor, mark_rejected_entries, record_verdict,
+)
+from .enrichment import create_item_enricher
+
+
+class AgentState(TypedDict, total=False):
+    run_id: str
+    project_input: Dict[str, Any]
+    queries: List[Dict]
+    search_results: List[Dict]
+    relevant_results: List[Dict]
+    opportunities: List[Dict]
+    enriched: List[Dict]
+
+
+@asynccontextmanager
+async def _open_checkpointer():
+    """
+    Checkpointer asíncrono de LangGraph (el grafo se ejecuta con `ainvoke`):
+    `AsyncSqliteSaver` sobre aiosqlite, abierto en el event loop de la ejecución.
+    Sin `langgraph-checkpoint-sqlite` se usa `MemorySaver`, que no persiste entre
+    procesos (los items completados siguen en el `CheckpointStore`).
+    """
+    try:
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    except ImportError:
+        print("⚠️ [Checkpoint] 'langgraph-checkpoint-sqlite' no está instalado: el estado del grafo se guarda "
+              "en memoria (MemorySaver) y NO persiste entre procesos; solo se reutilizan los items del CheckpointStore.")
+        yield MemorySaver()
+        return
+    async with AsyncSqliteSaver.from_conn_string(settings.CHECKPOINT_PATH + ".graph") as checkpointer:
+        yield checkpointer
+
+
+def create_agent_graph(store: Optional[CheckpointStore] = None, checkpointer: Optional[Any] = None):
+    """
+    Versión en grafo (LangGraph) del flujo descubrimiento -> enriquecimiento con
+    checkpoints durables por etapa e item.
+
+    Cada nodo consulta el `CheckpointStore` antes de trabajar: los items ya
+    completados en una ejecución anterior con el mismo `run_id` se reutilizan
+    y solo se procesa lo que faltaba.
+    """
+    store = store or get_checkpoint_store()
+    query_generator = create_query_generator_chain().with_config({"run_name": "Generating Queries"})
+    research_pipeline = create_research_pipeline()
+    llm_scrutinize = create_llm_scrutinizer()
+    extract_item = create_item_extractor()
+    enrich_item = create_item_enricher(create_deep_dive_chain())
+
+    async def generate_queries(state: AgentState) -> AgentState:
+        cached = store.get(state["run_id"], "queries", "all")
+        if cached is None:
+            cached = (await query_generator.ainvoke(state["project_input"]))["queries"]
+            store.put(state["run_id"], "queries", "all", cached)
+        return {"queries": cached}
+
+    async def research(state: AgentState) -> AgentState:
+        cached = store.get(state["run_id"], "research", "all")
+        if cached is None:
+            cached = await research_pipeline.ainvoke(state["queries"])
+            store.put(state["run_id"], "research", "all", cached)
+        return {"search_results": cached}
+
+    async def scrutinize(state: AgentState) -> AgentState:
+        run_id, results = state["run_id"], state["search_results"]
+        verdicts = {item_key(r): store.get(run_id, "scrutiny", item_key(r)) for r in results}
+        pending = [r for r in results if verdicts[item_key(r)] is None]
+        print(f"\n[Checkpoint] Escrutinio: {len(results) - len(pending)} reutilizados, {len(pending)} pendientes.")
+
+        def save_verdict(result: Dict, is_relevant: bool):
+            verdicts[item_key(result)] = is_relevant
+            store.put(run_id, "scrutiny", item_key(result), is_relevant)
+
+        if pending:
+            model = await asyncio.to_thread(load_trained_model) if settings.PREFILTER_ENABLED else None
+            decisions, _ = prefilter_results(pending, model) if settings.PREFILTER_ENABLED else ([None] * len(pending), {})
+            for result, decision in zip(pending, decisions):
+                if decision is not None:
+                    save_verdict(result, decision)
+            await mark_rejected_entries([r for r, d in zip(pending, decisions) if d is False])
+            uncertain = [r for r, d in zip(pending, decisions) if d is None]
+            if uncertain:
+                async def on_verdict(result: Dict, is_relevant: bool):
+                    save_verdict(result, is_relevant)
+                    await record_verdict(result, is_relevant)
+                await llm_scrutinize(uncertain, on_verdict=on_verdict)
+        return {"relevant_results": [r for r in results if verdicts.get(item_key(r))]}
+
+    async def extract(state: AgentState) -> AgentState:
+        run_id = state["run_id"]
+        semaphore = asyncio.Semaphore(settings.STREAM_EXTRACTION_WORKERS)
+
+        async def extract_one(result: Dict) -> List[Dict]:
+            key = item_key(result)
+            cached = store.get(run_id, "extraction", key)
+            if cached is not None:
+                return cached
+            async with semaphore:
+                try:
+                    extracted = await extract_item(result)
+                except Exception as e:
+                    # No guardamos el fallo: al reanudar se volverá a intentar.
+                    print(f"    ⚠️ Error durante la extracción de {result.get('url')}: {e}")
+                    return []
+            opportunities = [o.model_dump(mode="json") for o in extracted]
+            store.put(run_id, "extraction", key, opportunities)
+            return opportunities
+
+        extracted = await asyncio.gather(*(extract_one(r) for r in state["relevant_results"]))
+        resolved, _ = resolve_opportunities([FundingOpportunity(**o) for group in extracted for o in group])
+        return {"opportunities": [o.model_dump(mode="json") for o in resolved]}
+
+    async def enrich(state: AgentState) -> AgentState:
+        run_id = state["run_id"]
+        semaphore = asyncio.Semaphore(settings.ENRICHMENT_MAX_CONCURRENCY)
+
+        async def enrich_one(opportunity: Dict) -> Optional[Dict]:
+            key = item_key(opportunity)
+            cached = store.get(run_id, "enrichment", key)
+            if cached is not None:
+                return cached
+            async with semaphore:
+                try:
+                    enriched = await enrich_item(FundingOpportunity(**opportunity))
+                except Exception as e:
+                    print(f"  -> ❌ Error crítico durante el enriquecimiento de '{opportunity.get('origin')}': {e}")
+                    return None
+            if enriched is None:
+                return None
+            payload = enriched.model_dump(mode="json")
+            store.put(run_id, "enrichment", key, payload)
+            return payload
+
+        results = await asyncio.gather(*(enrich_one(o) for o in state["opportunities"]))
+        return {"enriched": [r for r in results if r is not None]}
+
+    graph = StateGraph(AgentState)
+    graph.add_node("generate_queries", generate_queries)
+    graph.add_node("research", research)
+    graph.add_node("scrutinize", scrutinize)
+    graph.add_node("extract", extract)
+    graph.add_node("enrich", enrich)
+    graph.add_edge(START, "generate_queries")
+    graph.add_edge("generate_queries", "research")
+    graph.add_edge("research", "scrutinize")
+    graph.add_edge("scrutinize", "extract")
+    graph.add_edge("extract", "enrich")
+    graph.add_edge("enrich", END)
+    return graph.compile(checkpointer=checkpointer or MemorySaver())
+
+
+async def arun_agent(project_input: Dict[str, Any], run_id: Optional[str] = None,
+                     store: Optional[CheckpointStore] = None) -> List[Dict]:
+    """
+    Ejecuta el agente con checkpoints. Si `run_id` corresponde a una ejecución
+    anterior, los items ya completados se reutilizan.
+    """
+    store = store or get_checkpoint_store()
+    run_id = store.start_run(project_input, run_id)
+    print(f"\n[Checkpoint] Ejecución {run_id}")
+    try:
+        async with _open_checkpointer() as checkpointer:
+            graph = create_agent_graph(store, checkpointer)
+            state = await graph.ainvoke(
+                {"run_id": run_id, "project_input": project_input},
+                config={"configurable": {"thread_id": run_id}, "run_name": "Checkpointed Agent"},
+            )
+    except BaseException:
+        store.set_status(run_id, "failed")
+        raise
+    store.set_status(run_id, "completed")
+    return state["enriched"]
+
+async def aresume_run(run_id: str, store: Optional[CheckpointStore] = None) -> List[Dict]:
+    """Reanuda una ejecución interrumpida saltándose los items ya completados."""
+    store = store or get_checkpoint_store()
+    run = store.get_run(run_id)
+    if run is None:
+        raise ValueError(f"No existe la ejecución '{run_id}'.")
+    return await arun_agent(run["input"], run_id, store)
+
+def run_agent(project_input: Dict[str, Any], run_id: Optional[str] = None) -> List[Dict]:
+    """Versión síncrona de `arun_agent`."""
+    return run_sync(arun_agent(project_input, run_id))
+
+def resume_run(run_id: str) -> List[Dict]:
+    """Versión síncrona de `aresume_run`."""
+    return run_sync(aresume_run(run_id))
@@ -0,0 +1,183 @@
+# src/pipelines/streaming.py
+import asyncio
+import itertools
+from typing import AsyncIterator, Dict, List, Optional
+from langchain_core.runnables import RunnableGenerator, RunnableConfig
+
+from ..components.query_generator import create_query_generator_chain
+from ..components.enricher import create_deep_dive_chain
+from ..components.prefilter import prefilter_results, load_trained_model
+from ..components.prioritizer import prioritize_results, opportunity_priority, load_domain_history
+from ..schemas.models import FundingOpportunity
+from ..utils.dedup import IncrementalOpportunityResolver
+from ..utils.concurrency import run_sync
+from ..utils.budget import RunBudget, BudgetExceededError, use_budget
+from ..utils.opportunity_store import recall_known_opportunities
+from ..config import settings
+from .discovery import (
+    create_research_pipeline, create_llm_scrutinizer, create_item_extractor, mark_rejected_entries, record_verdict,
+)
+from .enrichment import create_item_enricher
+
+# Marcador de fin de cola para que los workers sepan que deben terminar.
+# En las colas con prioridad va detrás de cualquier item real.
+_DONE = object()
+_LAST = float("inf")
+
+def create_streaming_agent_pipeline():
+    """
+    Crea la versión en streaming del agente completo.
+
+    En lugar de barreras entre etapas, cada resultado fluye por
+    escrutinio -> scrape/extracción -> dedup -> enriquecimiento en cuanto está listo,
+    conectado por colas con prioridad acotadas (`STREAM_QUEUE_SIZE`), así que una
+    etapa lenta frena a la anterior (backpressure): cada worker toma siempre el
+    item pendiente más prometedor y las convocatorias vencidas no se encolan.
+    Los duplicados que llegan tarde se fusionan con la oportunidad ya aceptada; si
+    esta aún no se ha enriquecido, se enriquece la versión fusionada. Cada oportunidad terminada se emite
+    de inmediato: con `astream` se recibe una lista de un elemento por oportunidad
+    y con `ainvoke` la lista completa.
+
+    Las oportunidades conocidas y vigentes del almacén local se emiten primero;
+    si son suficientes no se lanza la investigación web.
+
+    El presupuesto de la ejecución (`RunBudget.from_config`) se aplica a las tres
+    etapas; al agotarse, lo que quede en la cola de enriquecimiento se emite sin enriquecer.
+
+    Este pipeline no usa la cola de tareas distribuida aunque `TASK_QUEUE_ENABLED`
+    esté activo: su objetivo es la latencia hasta la primera oportunidad, y las
+    etapas solapadas en memoria no encajan con el sondeo por lotes de la cola.
+    Para repartir el trabajo entre workers se usa el pipeline principal o el de lotes.
+    """
+    query_generator = create_query_generator_chain().with_config({"run_name": "Generating Queries"})
+    research_pipeline = create_research_pipeline()
+    llm_scrutinize = create_llm_scrutinizer()
+    extract_item = create_item_extractor()
+    enrich_item = create_item_enricher(create_deep_dive_chain())
+
+    async def stream_opportunities(inputs: AsyncIterator[Dict], config: RunnableConfig) -> AsyncIterator[List[Dict]]:
+        project_input = None
+        async for chunk in inputs:
+            project_input = chunk
+
+        resolver = IncrementalOpportunityResolver()
+        known = await asyncio.to_thread(recall_known_opportunities, project_input)
+        for opportunity in known:
+            resolver.add(opportunity)
+            yield [opportunity.dict()]
+        if len(known) >= settings.OPPORTUNITY_STORE_MIN_HITS:
+            print(f"\n[Opportunity Store] {len(known)} coincidencias vigentes: se omite la investigación web.")
+            return
+
+        queries = await query_generator.ainvoke(project_input, config)
+        search_results = await research_pipeline.ainvoke(queries['queries'], config)
+
+        # Entradas (prioridad, secuencia, item): menor primero; la secuencia desempata.
+        extract_queue: asyncio.PriorityQueue = asyncio.PriorityQueue(maxsize=settings.STREAM_QUEUE_SIZE)
+        enrich_queue: asyncio.PriorityQueue = asyncio.PriorityQueue(maxsize=settings.STREAM_QUEUE_SIZE)
+        output_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.STREAM_QUEUE_SIZE)
+        sequence = itertools.count()
+        budget = RunBudget.from_config(config)
+        history = await asyncio.to_thread(load_domain_history)
+
+        # --- Etapa 1: escrutinio (pre-filtro local + LLM), alimenta la cola de extracción ---
+        async def scrutinize_stage():
+            try:
+                model = await asyncio.to_thread(load_trained_model) if settings.PREFILTER_ENABLED else None
+                results = prioritize_results(search_results, model, history)
+                rank = {id(r): i for i, r in enumerate(results)}
+                decisions, stats = prefilter_results(results, model) if settings.PREFILTER_ENABLED else ([None] * len(results), {})
+                print(f"\n[Streaming] Pre-filtro local: {stats}")
+                await mark_rejected_entries([r for r, d in zip(results, decisions) if d is False])
+                for result, decision in zip(results, decisions):
+                    if decision:
+                        await extract_queue.put((rank[id(result)], next(sequence), result))
+
+                async def on_verdict(result: Dict, is_relevant: bool):
+                    # El escrutinio espera aquí mientras la cola de extracción esté llena.
+                    await record_verdict(result, is_relevant)
+                    if is_relevant:
+                        await extract_queue.put((rank.get(id(result), len(rank)), next(sequence), result))
+
+                uncertain = [r for r, d in zip(results, decisions) if d is None]
+                if uncertain:
+                    await llm_scrutinize(uncertain, on_verdict=on_verdict)
+            finally:
+                for _ in range(settings.STREAM_EXTRACTION_WORKERS):
+                    await extract_queue.put((_LAST, next(sequence), _DONE))
+
+        # --- Etapa 2: scrape + extracción + dedup incremental, alimenta la cola de enriquecimiento ---
+        async def extract_worker():
+            while (item := (await extract_queue.get())[2]) is not _DONE:
+                try:
+                    opportunities = await extract_item(item)
+                except Exception as e:
+                    print(f"    ⚠️ Error durante la extracción de {item.get('url')}: {e}")
+                    continue
+                for opportunity in opportunities:
+                    priority = opportunity_priority(opportunity, history) if settings.PRIORITY_ENABLED else 0.0
+                    if priority is None:
+                        print(f"  -> Convocatoria vencida, no se enriquece: {opportunity.origin}")
+                    elif resolver.add(opportunity):
+                        await enrich_queue.put((-priority, next(sequence), opportunity))
+
+        async def extract_stage():
+            try:
+                await asyncio.gather(*(extract_worker() for _ in range(settings.STREAM_EXTRACTION_WORKERS)))
+            finally:
+                for _ in range(settings.ENRICHMENT_MAX_CONCURRENCY):
+                    await enrich_queue.put((_LAST, next(sequence), _DONE))
+
+        # --- Etapa 3: enriquecimiento, alimenta la cola de salida ---
+        async def enrich_worker():
+            while (opportunity := (await enrich_queue.get())[2]) is not _DONE:
+                opportunity = resolver.merged(opportunity)
+                try:
+                    enriched: Optional[FundingOpportunity] = await enrich_item(opportunity, config)
+                except BudgetExceededError:
+                    enriched = opportunity
+                except Exception as e:
+                    print(f"  -> ❌ Error crítico durante el enriquecimiento de '{opportunity.origin}': {e}")
+                    continue
+                if enriched is not None:
+                    await output_queue.put(enriched)
+
+        async def enrich_stage():
+            try:
+                await asyncio.gather(*(enrich_worker() for _ in range(settings.ENRICHMENT_MAX_CONCURRENCY)))
+            finally:
+                await output_queue.put(_DONE)
+
+        async def run_with_budget(stage):
+            # Cada etapa es una tarea con su propio contexto: el presupuesto se activa dentro.
+            with use_budget(budget):
+                await stage()
+
+        tasks = [asyncio.create_task(run_with_budget(stage)) for stage in (scrutinize_stage, extract_stage, enrich_stage)]
+        try:
+            while (enriched := await output_queue.get()) is not _DONE:
+                yield [enriched.dict()]
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        print(f"\n[Streaming] Completado. {resolver.duplicates} oportunidades duplicadas fusionadas.")
+
+    def stream_opportunities_sync(inputs, config: RunnableConfig):
+        # En modo síncrono no hay emisión incremental: devolvemos todo al final.
+        project_inputs = list(inputs)
+
+        async def collect() -> List[Dict]:
+            async def replay():
+                for chunk in project_inputs:
+                    yield chunk
+            collected = []
+            async for chunk in stream_opportunities(replay(), config):
+                collected.extend(chunk)
+            return collected
+
+        yield run_sync(collect())
+
+    return RunnableGenerator(stream_opportunities_sync, stream_opportunities).with_config({
+        "run_name": "Streaming Agent"
+    })
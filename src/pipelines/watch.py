@@ -0,0 +1,195 @@
+# src/pipelines/watch.py
+import json
+import time
+import asyncio
+import argparse
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.runnables import Runnable, RunnableLambda, RunnableConfig
+
+from ..components.enricher import create_deep_dive_chain, aload_page_content
+from ..components.fetcher import afetch_page
+from ..schemas.models import FundingOpportunity
+from ..utils.document_parser import areduce_document, adocument_to_text
+from ..utils.page_cache import CachedPage, get_page_cache
+from ..utils.opportunity_store import get_opportunity_store, opportunity_key
+from ..utils.watch_state import PageFingerprint, get_watch_state
+from ..utils.rate_limiter import TokenBucketRateLimiter, get_gemini_rate_limiter, ainvoke_rate_limited
+from ..utils.prompt_budget import estimate_tokens
+from ..utils.normalizers import canonicalize_url
+from ..utils.concurrency import run_sync
+from ..utils.metrics import arecord_metric
+from ..utils.budget import BudgetExceededError, RunBudget, use_budget
+from ..config import settings
+
+# Campos cuyo cambio se publica en el feed (además de fecha límite y requisitos).
+_DIFF_FIELDS = ("origin", "description", "financing_type", "opportunity_url")
+
+
+async def fingerprint_page(page: CachedPage) -> PageFingerprint:
+    """
+    Huella del texto reducido de la página (sin consulta: el mismo texto en cada revisión).
+    Si la reducción no deja nada de una página con contenido, la huella se calcula
+    sobre el texto completo: una huella vacía nunca detectaría cambios.
+    """
+    text = await areduce_document(page.body, page.content_type, page.url, settings.WATCH_FINGERPRINT_TOKENS, "")
+    if not text.strip() and page.body.strip():
+        print(f"  -> ⚠️ Reducción vacía para {page.url}; se usa el texto completo para la huella.")
+        text = await adocument_to_text(page.body, page.content_type, page.url)
+    return PageFingerprint.from_text(text)
+
+def diff_opportunities(old: FundingOpportunity, new: FundingOpportunity) -> Dict:
+    """Cambios de campo entre la versión guardada y la re-enriquecida (vacío si no hay ninguno)."""
+    changes: Dict = {}
+    if (old.application_deadline or None) != (new.application_deadline or None):
+        changes["application_deadline"] = {"old": old.application_deadline, "new": new.application_deadline}
+    old_requirements = {" ".join(r.lower().split()): r for r in old.main_requirements or []}
+    new_requirements = {" ".join(r.lower().split()): r for r in new.main_requirements or []}
+    added = [r for k, r in new_requirements.items() if k not in old_requirements]
+    removed = [r for k, r in old_requirements.items() if k not in new_requirements]
+    if added or removed:
+        changes["main_requirements"] = {"added": added, "removed": removed}
+    for field in _DIFF_FIELDS:
+        before, after = getattr(old, field), getattr(new, field)
+        if (before or None) != (after or None):
+            changes[field] = {"old": before, "new": after}
+    return changes
+
+
+def create_watch_pipeline(
+    deep_dive_factory: Callable[[], Runnable] = create_deep_dive_chain,
+    rate_limiter: Optional[TokenBucketRateLimiter] = None,
+    max_concurrency: int = settings.WATCH_MAX_CONCURRENCY,
+):
+    """
+    Crea la cadena del modo vigilancia. En cada pasada:
+    1. Agrupa por URL canónica las oportunidades vigentes del almacén.
+    2. Revalida cada página con una petición condicional (un 304 no descarga nada)
+       y compara la huella de su texto reducido con la de referencia.
+    3. Solo las páginas con un cambio material (fechas distintas o SimHash lejano)
+       vuelven a pasar por la cadena de deep dive; las ediciones menores se ignoran.
+    4. Actualiza el almacén y publica en el feed de cambios las diferencias de
+       campo (fecha límite, requisitos añadidos/quitados, etc.).
+    La primera vez que se ve una URL se toma como referencia la copia de la caché
+    de páginas (la que se usó al enriquecerla), o la descarga actual si no la hay.
+    Devuelve la lista de cambios publicados.
+    """
+    rate_limiter = rate_limiter or get_gemini_rate_limiter()
+    refinement_chain = deep_dive_factory()
+
+    async def reenrich(opportunity: FundingOpportunity, config: RunnableConfig) -> Optional[FundingOpportunity]:
+        payload = await aload_page_content(opportunity.model_dump())
+        tokens = estimate_tokens(json.dumps(payload, ensure_ascii=False))
+        refreshed, _, _ = await ainvoke_rate_limited(
+            refinement_chain, payload, rate_limiter, tokens,
+            max_attempts=settings.ENRICHMENT_MAX_ATTEMPTS, label=opportunity.origin, config=config
+        )
+        if refreshed is not None:
+            refreshed.source_url = opportunity.source_url
+        return refreshed
+
+    async def check_url(url: str, opportunities: List[FundingOpportunity], semaphore: asyncio.Semaphore,
+                        config: RunnableConfig) -> List[Dict]:
+        watch_state, store = get_watch_state(), get_opportunity_store()
+        async with semaphore:
+            try:
+                state = await asyncio.to_thread(watch_state.get, url)
+                if state is None:
+                    cached = await asyncio.to_thread(get_page_cache().get, url)
+                    if cached is not None:
+                        baseline = await fingerprint_page(cached)
+                        await asyncio.to_thread(watch_state.save_baseline, url, cached.content_hash, baseline)
+                        state = {"body_hash": cached.content_hash, "baseline": baseline}
+                page = await afetch_page(url, max_age=0)
+                if state is None:
+                    print(f"  -> 👁️ Nueva página vigilada: {url}")
+                    await asyncio.to_thread(watch_state.save_baseline, url, page.content_hash, await fingerprint_page(page))
+                    return []
+                if page.content_hash == state["body_hash"]:
+                    await asyncio.to_thread(watch_state.mark_checked, url, page.content_hash)
+                    return []
+                current = await fingerprint_page(page)
+                if not current.is_material_change(state["baseline"]):
+                    print(f"  -> ✏️ Cambio menor, se ignora: {url}")
+                    await asyncio.to_thread(watch_state.mark_checked, url, page.content_hash)
+                    return []
+            except Exception as e:
+                print(f"  -> ⚠️ No se pudo revisar {url}: {e}")
+                return []
+
+            print(f"  -> 🔄 Cambio material en {url}: re-enriqueciendo {len(opportunities)} oportunidades...")
+            await arecord_metric("watch_pages_changed", 1, config)
+            changes, failed = [], False
+            for old in opportunities:
+                try:
+                    refreshed = await reenrich(old, config)
+                except BudgetExceededError:
+                    return changes
+                except Exception as e:
+                    print(f"  -> ❌ Error al re-enriquecer '{old.origin}': {e}")
+                    failed = True
+                    continue
+                if refreshed is None:
+                    failed = True
+                    continue
+                old_key, new_key = opportunity_key(old), opportunity_key(refreshed)
+                await asyncio.to_thread(store.upsert, [refreshed])
+                if new_key != old_key:
+                    await asyncio.to_thread(store.delete, [old_key])
+                diff = diff_opportunities(old, refreshed)
+                if diff:
+                    changes.append({
+                        "detected_at": time.time(), "url": url, "opportunity_key": new_key,
+                        "origin": refreshed.origin, "changes": diff,
+                        "opportunity": refreshed.model_dump(mode="json"),
+                    })
+            # Si algún item falló, la referencia no se mueve y se reintenta en la próxima pasada.
+            if not failed:
+                await asyncio.to_thread(watch_state.save_baseline, url, page.content_hash, current)
+            return changes
+
+    async def awatch(_input: Optional[Dict] = None, config: Optional[RunnableConfig] = None) -> List[Dict]:
+        opportunities = await asyncio.to_thread(get_opportunity_store().all)
+        by_url: Dict[str, List[FundingOpportunity]] = defaultdict(list)
+        for opportunity in opportunities:
+            if opportunity.opportunity_url:
+                by_url[canonicalize_url(opportunity.opportunity_url)].append(opportunity)
+        print(f"\n[Watch] Revisando {len(by_url)} páginas de {len(opportunities)} oportunidades vigentes...")
+        semaphore = asyncio.Semaphore(max_concurrency)
+        with use_budget(RunBudget.from_config(config)):
+            results = await asyncio.gather(*(
+                check_url(group[0].opportunity_url, group, semaphore, config) for group in by_url.values()
+            ))
+        changes = [change for result in results for change in result]
+        await asyncio.to_thread(get_watch_state().append_changes, changes)
+        print(f"[Watch] {len(changes)} oportunidades con cambios publicadas en el feed.")
+        return changes
+
+    return RunnableLambda(
+        lambda x, config: run_sync(awatch(x, config)), afunc=awatch
+    ).with_config({"run_name": "Watching Opportunities"})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Modo vigilancia: re-enriquece solo las oportunidades cuya página cambió.")
+    parser.add_argument("--once", action="store_true", help="Una sola pasada y salir.")
+    parser.add_argument("--interval", type=int, default=settings.WATCH_INTERVAL_SECONDS,
+                        help="Segundos entre pasadas (por defecto, una al día).")
+    args = parser.parse_args(argv)
+
+    pipeline = create_watch_pipeline()
+    while True:
+        for change in pipeline.invoke({}):
+            print(f"  * {change['origin']}: {', '.join(change['changes'])}")
+        if args.once:
+            break
+        print(f"[Watch] Próxima pasada en {args.interval}s.")
+        try:
+            time.sleep(args.interval)
+        except KeyboardInterrupt:
+            break
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from typing import List, Optional
 from pydantic import BaseModel, Field
+from pydantic.json_schema import SkipJsonSchema
 
 # --- Modelo para la generación de Queries ---
 class SearchQuery(BaseModel):
@@ -13,6 +14,14 @@ class QueryList(BaseModel):
 # --- esquema para validacion de fuentes ------------------------
 class ScrutinyResult(BaseModel):
     is_relevant: bool = Field(description="Verdadero si la fuente parece ser una convocatoria, grant, o página de financiación directa. Falso si es una noticia, un blog, un directorio o un artículo académico.")
+
+# --- esquema para validacion de fuentes por lotes ---------------
+class ScrutinyVerdict(BaseModel):
+    index: int = Field(description="El índice numérico de la fuente, tal como aparece entre corchetes en la lista.")
+    is_relevant: bool = Field(description="Verdadero si la fuente es una convocatoria, grant, o página de financiación directa. Falso si es contenido secundario.")
+
+class BatchScrutinyResult(BaseModel):
+    verdicts: List[ScrutinyVerdict] = Field(description="Un veredicto por cada fuente de la lista, sin omitir ninguna.")
     
 # --- Modelo para el paso de "Identification of Opportunities" ---
 class FundingOpportunity(BaseModel):
@@ -22,6 +31,9 @@ class FundingOpportunity(BaseModel):
     main_requirements: Optional[List[str]] = Field(default_factory=list, description="Lista de los requisitos principales para aplicar.")
     application_deadline: Optional[str] = Field(None, description="Fecha límite para la postulación (formato YYYY-MM-DD).")
     opportunity_url: Optional[str] = Field(None, description="El enlace directo a la página específica de la convocatoria, si se encuentra.")
+    # Página de la que se extrajo la oportunidad. La rellena el pipeline, no el LLM
+    # (queda fuera del JSON schema de la salida estructurada).
+    source_url: SkipJsonSchema[Optional[str]] = None
 
 # --- Modelo para contener la lista de oportunidades ---
 class FundingOpportunityList(BaseModel):
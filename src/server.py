@@ -0,0 +1,311 @@
+# src/server.py
+"""
+Servicio HTTP residente del agente.
+
+Construye los pipelines (y con ellos los clientes de Gemini, de búsqueda y de
+descarga) UNA sola vez por proceso y los reutiliza en cada petición. El
+progreso de cada ejecución (runs con nombre de `STAGE_RUN_NAMES` y
+"Enriching Item: ...") se emite por Server-Sent Events para el frontend.
+
+Uso:
+    python -m src.server --port 8000
+    # y abrir http://127.0.0.1:8000/project.html
+
+API:
+    POST /api/runs                 {"project_details": "...", "format_instructions"?: "...",
+                                    "budget"?: {"max_llm_calls", "max_tokens", "max_wall_seconds"}} -> {"run_id": ...}
+    GET  /api/runs/<id>            estado y resultado
+    GET  /api/runs/<id>/events     flujo SSE (admite Last-Event-ID para reconectar)
+    GET  /api/health
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import threading
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from typing import Any, Dict, List, Optional
+
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.runnables import Runnable
+
+from .config import settings
+from .pipelines.full_agent import create_full_agent_pipeline
+from .schemas.models import FundingOpportunity, QueryList
+from .utils.metrics import STAGE_RUN_NAMES, ITEM_RUN_PREFIX
+
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "frontend")
+
+# Cuántas fuentes se envían al frontend al terminar la deduplicación.
+_MAX_SOURCES_EVENT = 50
+_BUDGET_KEYS = {"max_llm_calls", "max_tokens", "max_wall_seconds"}
+
+
+def _parse_budget(budget: Any) -> Optional[Dict]:
+    """Valida los límites de presupuesto de una petición (ver `RunBudget`)."""
+    if budget is None:
+        return None
+    if not isinstance(budget, dict) or set(budget) - _BUDGET_KEYS:
+        raise ValueError(f"'budget' debe ser un objeto con las claves {sorted(_BUDGET_KEYS)}.")
+    for key, value in budget.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            raise ValueError(f"'budget.{key}' debe ser un número >= 0.")
+    return budget
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, FundingOpportunity):
+        return value.model_dump(mode="json")
+    if isinstance(value, list):
+        return [_to_json(v) for v in value]
+    return value
+
+
+class AgentRun:
+    """Una ejecución del agente y su registro de eventos (se conserva para reconexiones)."""
+
+    def __init__(self, project_input: Dict, budget: Optional[Dict] = None):
+        self.id = uuid.uuid4().hex
+        self.project_input = project_input
+        self.budget = budget
+        self.status = "pending"
+        self.result: Optional[List[Dict]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.events: List[Dict] = []
+        self._condition = threading.Condition()
+
+    def emit(self, event: str, data: Any) -> None:
+        with self._condition:
+            self.events.append({"id": len(self.events), "event": event, "data": data})
+            self._condition.notify_all()
+
+    def finish(self, status: str, result: Optional[List[Dict]] = None, error: Optional[str] = None) -> None:
+        self.status, self.result, self.error, self.finished_at = status, result, error, time.time()
+        if error is not None:
+            self.emit("error", {"message": error})
+        self.emit("done", {"status": status, "opportunities": result or []})
+
+    def wait_events(self, after: int, timeout: float) -> List[Dict]:
+        """Eventos con id > `after`; espera hasta `timeout` segundos si todavía no hay ninguno."""
+        with self._condition:
+            if len(self.events) <= after + 1 and self.finished_at is None:
+                self._condition.wait(timeout)
+            return self.events[after + 1:]
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    def summary(self) -> Dict:
+        return {"run_id": self.id, "status": self.status, "created_at": self.created_at,
+                "finished_at": self.finished_at, "events": len(self.events),
+                "opportunities": self.result, "error": self.error}
+
+
+class AgentService:
+    """
+    Mantiene vivos el pipeline del agente y un event loop propio (hilo en segundo
+    plano) donde se ejecutan todas las ejecuciones. Así los clientes HTTP, los
+    limitadores de cuota y los semáforos se comparten entre peticiones.
+    """
+
+    def __init__(self, pipeline: Optional[Runnable] = None,
+                 max_concurrent_runs: int = settings.SERVICE_MAX_CONCURRENT_RUNS):
+        started = time.perf_counter()
+        self.pipeline = pipeline or create_full_agent_pipeline()
+        self.format_instructions = JsonOutputParser(pydantic_object=QueryList).get_format_instructions()
+        self.runs: Dict[str, AgentRun] = {}
+        self._runs_lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="agent-service", daemon=True)
+        self._thread.start()
+        self._slots = asyncio.run_coroutine_threadsafe(self._make_slots(max_concurrent_runs), self._loop).result()
+        print(f"[Service] Pipelines construidos en {time.perf_counter() - started:.2f}s.")
+
+    @staticmethod
+    async def _make_slots(n: int) -> asyncio.Semaphore:
+        return asyncio.Semaphore(n)
+
+    # --- Ejecuciones ---
+
+    def start_run(self, payload: Dict) -> AgentRun:
+        project_details = (payload.get("project_details") or "").strip()
+        if not project_details:
+            raise ValueError("Falta 'project_details'.")
+        run = AgentRun({
+            "project_details": project_details,
+            "format_instructions": payload.get("format_instructions") or self.format_instructions,
+        }, budget=_parse_budget(payload.get("budget")))
+        with self._runs_lock:
+            self._purge_finished()
+            self.runs[run.id] = run
+        asyncio.run_coroutine_threadsafe(self._execute(run), self._loop)
+        return run
+
+    def get_run(self, run_id: str) -> Optional[AgentRun]:
+        with self._runs_lock:
+            return self.runs.get(run_id)
+
+    def _purge_finished(self) -> None:
+        cutoff = time.time() - settings.SERVICE_RUN_TTL_SECONDS
+        for run_id in [r.id for r in self.runs.values() if r.done and r.finished_at < cutoff]:
+            del self.runs[run_id]
+
+    async def _execute(self, run: AgentRun) -> None:
+        async with self._slots:
+            run.status = "running"
+            run.emit("status", {"status": "running"})
+            try:
+                result = None
+                config = {"configurable": {"budget": run.budget}} if run.budget else None
+                async for event in self.pipeline.astream_events(run.project_input, config, version="v2"):
+                    self._relay(run, event)
+                    if event["event"] == "on_chain_end" and not event.get("parent_ids"):
+                        result = event["data"].get("output")
+                run.finish("completed", result=_to_json(result or []))
+            except Exception as e:
+                print(f"[Service] ❌ Error en la ejecución {run.id}: {e}")
+                run.finish("failed", error=str(e))
+
+    @staticmethod
+    def _relay(run: AgentRun, event: Dict) -> None:
+        """Traduce los eventos de LangChain de los runs con nombre a eventos SSE."""
+        kind, name = event["event"], event.get("name") or ""
+        if name in STAGE_RUN_NAMES:
+            if kind == "on_chain_start":
+                run.emit("stage", {"name": name, "status": "started"})
+            elif kind == "on_chain_end":
+                output = event["data"].get("output")
+                data = {"name": name, "status": "completed"}
+                if isinstance(output, list):
+                    data["count"] = len(output)
+                run.emit("stage", data)
+                if name == "Deduplicating Results" and isinstance(output, list):
+                    run.emit("sources", [
+                        {"title": r.get("title"), "url": r.get("url"), "description": r.get("description")}
+                        for r in output[:_MAX_SOURCES_EVENT]
+                    ])
+            elif kind == "on_chain_error":
+                run.emit("stage", {"name": name, "status": "failed"})
+        elif name.startswith(ITEM_RUN_PREFIX):
+            if kind == "on_chain_start":
+                run.emit("item", {"name": name[len(ITEM_RUN_PREFIX):], "status": "started"})
+            elif kind == "on_chain_end" and isinstance(event["data"].get("output"), FundingOpportunity):
+                run.emit("opportunity", _to_json(event["data"]["output"]))
+
+
+# --- Capa HTTP (biblioteca estándar) ---
+
+def create_handler(service: AgentService):
+    """Handler HTTP: API bajo /api y los ficheros estáticos del frontend en el resto de rutas."""
+
+    class AgentRequestHandler(SimpleHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=FRONTEND_DIR, **kwargs)
+
+        def log_message(self, format, *args):
+            if settings.SERVICE_ACCESS_LOG:
+                super().log_message(format, *args)
+
+        def end_headers(self):
+            self.send_header("Access-Control-Allow-Origin", settings.SERVICE_ALLOW_ORIGIN)
+            super().end_headers()
+
+        def _send_json(self, status: int, body: Any) -> None:
+            payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_OPTIONS(self):
+            self.send_response(HTTPStatus.NO_CONTENT)
+            self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+            self.send_header("Access-Control-Allow-Headers", "Content-Type, Last-Event-ID")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/api/runs":
+                return self._send_json(HTTPStatus.NOT_FOUND, {"error": "Ruta no encontrada."})
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                run = service.start_run(payload)
+            except (ValueError, json.JSONDecodeError) as e:
+                return self._send_json(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+            self._send_json(HTTPStatus.ACCEPTED, {"run_id": run.id, "events": f"/api/runs/{run.id}/events"})
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0].rstrip("/")
+            if not path.startswith("/api/"):
+                return super().do_GET()
+            if path == "/api/health":
+                return self._send_json(HTTPStatus.OK, {"status": "ok", "runs": len(service.runs)})
+            parts = path.split("/")  # ['', 'api', 'runs', <id>, ('events')]
+            run = service.get_run(parts[3]) if len(parts) >= 4 and parts[2] == "runs" else None
+            if run is None:
+                return self._send_json(HTTPStatus.NOT_FOUND, {"error": "Ejecución no encontrada."})
+            if len(parts) == 5 and parts[4] == "events":
+                return self._stream_events(run)
+            self._send_json(HTTPStatus.OK, run.summary())
+
+        def _stream_events(self, run: AgentRun) -> None:
+            try:
+                last_id = int(self.headers.get("Last-Event-ID") or -1)
+            except ValueError:
+                return self._send_json(HTTPStatus.BAD_REQUEST, {"error": "Last-Event-ID debe ser un entero."})
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            try:
+                while True:
+                    events = run.wait_events(last_id, settings.SERVICE_SSE_HEARTBEAT_SECONDS)
+                    if not events and run.done:
+                        return  # ejecución terminada y sin eventos pendientes (p. ej. reconexión tras "done")
+                    if not events:
+                        self.wfile.write(b": ping\n\n")  # mantiene viva la conexión
+                    for event in events:
+                        last_id = event["id"]
+                        data = json.dumps(event["data"], ensure_ascii=False)
+                        self.wfile.write(f"id: {last_id}\nevent: {event['event']}\ndata: {data}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    if events and events[-1]["event"] == "done":
+                        return
+            except (BrokenPipeError, ConnectionResetError):
+                return
+
+    return AgentRequestHandler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio HTTP residente del agente de oportunidades.")
+    parser.add_argument("--host", default=settings.SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVICE_PORT)
+    args = parser.parse_args(argv)
+
+    service = AgentService()
+    server = ThreadingHTTPServer((args.host, args.port), create_handler(service))
+    server.daemon_threads = True
+    print(f"[Service] Escuchando en http://{args.host}:{args.port} (frontend: /project.html)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# src/utils/budget.py
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Iterator, Optional
+
+from ..config import settings
+
+
+class BudgetExceededError(Exception):
+    """La ejecución alcanzó uno de sus límites duros (llamadas al LLM, tokens o tiempo)."""
+
+
+class RunBudget:
+    """
+    Límites duros de UNA ejecución del agente: llamadas al LLM, tokens estimados
+    y tiempo de reloj (0 = sin límite).
+
+    Cada llamada al LLM se cobra con `charge` justo antes de enviarse, cuando
+    ya se sabe que no la resuelve la caché de respuestas (ver
+    `ainvoke_rate_limited` y `take_llm_turn`); si no
+    cabe, se lanza `BudgetExceededError` y las
+    etapas devuelven lo que ya tienen (la generación inicial de queries no pasa
+    por el limitador y no se cobra). El contador es seguro entre hilos porque
+    las etapas síncronas ejecutan sus corrutinas en hilos auxiliares.
+    """
+
+    def __init__(self, max_llm_calls: int = settings.BUDGET_MAX_LLM_CALLS,
+                 max_tokens: int = settings.BUDGET_MAX_TOKENS,
+                 max_wall_seconds: float = settings.BUDGET_MAX_WALL_SECONDS):
+        self.max_llm_calls = int(max_llm_calls or 0)
+        self.max_tokens = int(max_tokens or 0)
+        self.max_wall_seconds = float(max_wall_seconds or 0)
+        self.started = time.monotonic()
+        self.llm_calls = 0
+        self.tokens = 0
+        self.exhausted: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Optional[dict] = None) -> "RunBudget":
+        """Límites de `config["configurable"]["budget"]`; los que falten salen de `settings`."""
+        limits = ((config or {}).get("configurable") or {}).get("budget") or {}
+        return cls(
+            max_llm_calls=limits.get("max_llm_calls", settings.BUDGET_MAX_LLM_CALLS),
+            max_tokens=limits.get("max_tokens", settings.BUDGET_MAX_TOKENS),
+            max_wall_seconds=limits.get("max_wall_seconds", settings.BUDGET_MAX_WALL_SECONDS),
+        )
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def timed_out(self) -> bool:
+        """Se superó el tiempo máximo (el único límite que no depende de cobrar llamadas)."""
+        return bool(self.max_wall_seconds) and self.elapsed >= self.max_wall_seconds
+
+    def _violation(self, tokens: int) -> Optional[str]:
+        if self.max_wall_seconds and self.elapsed >= self.max_wall_seconds:
+            return f"tiempo máximo ({self.max_wall_seconds:g}s)"
+        if self.max_llm_calls and self.llm_calls + 1 > self.max_llm_calls:
+            return f"llamadas al LLM ({self.max_llm_calls})"
+        if self.max_tokens and self.tokens + tokens > self.max_tokens:
+            return f"tokens ({self.max_tokens})"
+        return None
+
+    def _exhaust(self, reason: str) -> BudgetExceededError:
+        if self.exhausted is None:
+            self.exhausted = reason
+            print(f"\n[Budget] ⛔ Límite alcanzado: {reason}. Se devuelven los resultados parciales.")
+        return BudgetExceededError(f"Presupuesto agotado: {self.exhausted}")
+
+    def check(self) -> None:
+        """Lanza `BudgetExceededError` si el presupuesto ya está agotado (no consume nada)."""
+        with self._lock:
+            reason = self.exhausted or self._violation(0)
+            if reason:
+                raise self._exhaust(reason)
+
+    def charge(self, tokens: int = 0) -> None:
+        """Cobra una llamada al LLM de `tokens` tokens, o lanza `BudgetExceededError` si no cabe."""
+        with self._lock:
+            reason = self.exhausted or self._violation(tokens)
+            if reason:
+                raise self._exhaust(reason)
+            self.llm_calls += 1
+            self.tokens += tokens
+
+    def summary(self) -> Dict:
+        return {"llm_calls": self.llm_calls, "tokens": self.tokens,
+                "elapsed_seconds": round(self.elapsed, 3), "exhausted": self.exhausted}
+
+
+# --- Presupuesto de la ejecución en curso ---
+# Se propaga con el contexto (tareas de asyncio, `asyncio.to_thread` y los
+# hilos de LangChain), así que no hace falta pasarlo por todas las funciones.
+
+_current_budget: contextvars.ContextVar[Optional[RunBudget]] = contextvars.ContextVar("flow_search_budget", default=None)
+
+def get_current_budget() -> Optional[RunBudget]:
+    return _current_budget.get()
+
+@contextmanager
+def use_budget(budget: Optional[RunBudget]) -> Iterator[Optional[RunBudget]]:
+    """Activa `budget` para todo el código ejecutado dentro del bloque."""
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+
+class LLMCall:
+    """
+    Llamada en curso de `ainvoke_rate_limited`. `turn` espera el hueco en el
+    limitador y cobra el presupuesto; la caché de respuestas lo pide solo si
+    falla (`take_llm_turn`) y marca la llamada si la resuelve.
+    """
+    __slots__ = ("served_from_cache", "turn", "turn_taken")
+
+    def __init__(self, turn: Optional[Callable[[], Awaitable[None]]] = None):
+        self.served_from_cache = False
+        self.turn = turn
+        self.turn_taken = False
+
+_current_llm_call: contextvars.ContextVar[Optional[LLMCall]] = contextvars.ContextVar("flow_search_llm_call", default=None)
+
+@contextmanager
+def track_llm_call(turn: Optional[Callable[[], Awaitable[None]]] = None) -> Iterator[LLMCall]:
+    """Abre el registro de una llamada al LLM para el código ejecutado dentro del bloque."""
+    call = LLMCall(turn)
+    token = _current_llm_call.set(call)
+    try:
+        yield call
+    finally:
+        _current_llm_call.reset(token)
+
+async def take_llm_turn() -> None:
+    """
+    Justo antes de invocar al LLM: espera el turno de la llamada en curso en el
+    limitador y la cobra (una sola vez). Fuera de `ainvoke_rate_limited` no hace nada.
+    """
+    call = _current_llm_call.get()
+    if call is not None and call.turn is not None and not call.turn_taken:
+        call.turn_taken = True
+        await call.turn()
+
+def mark_served_from_cache() -> None:
+    """La llamada en curso se resolvió sin el LLM (acierto de caché): no debe cobrarse."""
+    call = _current_llm_call.get()
+    if call is not None:
+        call.served_from_cache = True
+
+def check_budget() -> None:
+    """Atajo: falla pronto (antes de scrapear o esperar cuota) si el presupuesto en curso está agotado."""
+    budget = get_current_budget()
+    if budget is not None:
+        budget.check()
@@ -0,0 +1,108 @@
+# src/utils/checkpoints.py
+import os
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+
+from ..config import settings
+
+
+def item_key(item: Any) -> str:
+    """Hash estable de un item (dict o modelo pydantic) para usarlo como clave de checkpoint."""
+    if isinstance(item, BaseModel):
+        item = item.model_dump(mode="json")
+    raw = json.dumps(item, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CheckpointStore:
+    """
+    Checkpoints durables por etapa e item (SQLite), indexados por `run_id`.
+    Cada etapa guarda el resultado de cada item en cuanto termina, de modo que al
+    reanudar una ejecución solo se procesa lo que faltaba.
+    """
+
+    def __init__(self, path: str = settings.CHECKPOINT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id TEXT PRIMARY KEY,
+                    input TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    run_id TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    item_key TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (run_id, stage, item_key)
+                );
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    # --- Ejecuciones ---
+
+    def start_run(self, inputs: Dict, run_id: Optional[str] = None) -> str:
+        run_id = run_id or uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute("""
+                INSERT INTO runs (run_id, input, status, created_at, updated_at) VALUES (?, ?, 'running', ?, ?)
+                ON CONFLICT(run_id) DO UPDATE SET status = 'running', updated_at = excluded.updated_at
+            """, (run_id, json.dumps(inputs, ensure_ascii=False), now, now))
+        return run_id
+
+    def set_status(self, run_id: str, status: str) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE runs SET status = ?, updated_at = ? WHERE run_id = ?", (status, time.time(), run_id))
+
+    def get_run(self, run_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT input, status FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return {"input": json.loads(row[0]), "status": row[1]} if row else None
+
+    # --- Items por etapa ---
+
+    def get(self, run_id: str, stage: str, key: str) -> Optional[Any]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT payload FROM checkpoints WHERE run_id = ? AND stage = ? AND item_key = ?",
+                               (run_id, stage, key)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, run_id: str, stage: str, key: str, payload: Any) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO checkpoints (run_id, stage, item_key, payload, created_at) VALUES (?, ?, ?, ?, ?)
+            """, (run_id, stage, key, json.dumps(payload, ensure_ascii=False, default=str), time.time()))
+
+    def count(self, run_id: str, stage: str) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM checkpoints WHERE run_id = ? AND stage = ?",
+                                (run_id, stage)).fetchone()[0]
+
+
+_checkpoint_store: Optional[CheckpointStore] = None
+_checkpoint_store_lock = threading.Lock()
+
+def get_checkpoint_store() -> CheckpointStore:
+    """Devuelve la instancia compartida del almacén de checkpoints."""
+    global _checkpoint_store
+    with _checkpoint_store_lock:
+        if _checkpoint_store is None:
+            _checkpoint_store = CheckpointStore()
+        return _checkpoint_store
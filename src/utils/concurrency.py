@@ -0,0 +1,33 @@
+# src/utils/concurrency.py
+import asyncio
+import threading
+import contextvars
+from typing import Any, Coroutine
+
+
+def run_sync(coro: Coroutine) -> Any:
+    """
+    Ejecuta una corrutina desde código síncrono.
+    Si ya hay un event loop corriendo en este hilo (p. ej. un notebook), la
+    ejecutamos en un hilo auxiliar con su propio loop (y el mismo contexto,
+    para conservar p. ej. el presupuesto de la ejecución en curso).
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    result: dict = {}
+
+    def _runner():
+        try:
+            result["value"] = asyncio.run(coro)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(_runner,))
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result.get("value")
@@ -0,0 +1,146 @@
+# src/utils/content_reducer.py
+import re
+import math
+from collections import Counter
+from typing import List
+
+from bs4 import BeautifulSoup
+
+# --- Limpieza de boilerplate ---
+
+BOILERPLATE_TAGS = ["script", "style", "noscript", "nav", "header", "footer", "aside", "form", "iframe", "svg", "button"]
+BOILERPLATE_PATTERN = re.compile(
+    r"cookie|consent|banner|navbar|menu|footer|breadcrumb|social|share|modal|popup|newsletter|sidebar|skip-link",
+    re.IGNORECASE,
+)
+_HEADING_MARK = "␞"  # separador que no aparece en el texto normal
+
+def truncate_words(text: str, max_chars: int) -> str:
+    """Corta `text` a `max_chars` por la última palabra completa (o en seco si no hay espacios)."""
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", 0, max_chars + 1)
+    return text[:cut if cut > 0 else max_chars].rstrip()
+
+def _split_long(text: str, max_chars: int) -> List[str]:
+    """Trocea por palabras un bloque más largo que `max_chars` (HTML minificado, PDFs sin líneas en blanco)."""
+    pieces = []
+    while len(text) > max_chars:
+        piece = truncate_words(text, max_chars)
+        pieces.append(piece)
+        text = text[len(piece):].lstrip()
+    if text:
+        pieces.append(text)
+    return pieces
+
+def extract_sections(html: bytes | str, max_section_chars: int = 1500) -> List[str]:
+    """
+    Limpia el HTML (menús, banners de cookies, pies de página...) y lo divide en
+    secciones a partir de los encabezados. Las secciones largas se trocean por párrafos.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(BOILERPLATE_TAGS):
+        tag.decompose()
+    for tag in soup.find_all(True):
+        if tag.decomposed or tag.attrs is None:
+            continue
+        marker = " ".join(tag.get("class") or []) + " " + (tag.get("id") or "") + " " + (tag.get("role") or "")
+        if marker.strip() and BOILERPLATE_PATTERN.search(marker) and tag.name not in ("html", "body", "main", "article"):
+            tag.decompose()
+    for heading in soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6"]):
+        heading.insert_before(_HEADING_MARK)
+
+    text = soup.get_text("\n")
+    sections = []
+    for raw_section in text.split(_HEADING_MARK):
+        lines = [re.sub(r"\s+", " ", line).strip() for line in raw_section.splitlines()]
+        lines = [piece for line in lines if line for piece in _split_long(line, max_section_chars)]
+        chunk = ""
+        for line in lines:
+            if chunk and len(chunk) + len(line) > max_section_chars:
+                sections.append(chunk)
+                chunk = ""
+            chunk = f"{chunk}\n{line}" if chunk else line
+        if chunk:
+            sections.append(chunk)
+    return sections
+
+def split_text_sections(text: str, max_section_chars: int = 1500) -> List[str]:
+    """Equivalente para texto plano (p. ej. PDFs): trocea por bloques separados por líneas en blanco."""
+    sections, chunk = [], ""
+    blocks = (re.sub(r"[ \t]+", " ", block).strip() for block in re.split(r"\n\s*\n", text))
+    for block in (piece for block in blocks if block for piece in _split_long(block, max_section_chars)):
+        if chunk and len(chunk) + len(block) > max_section_chars:
+            sections.append(chunk)
+            chunk = ""
+        chunk = f"{chunk}\n{block}" if chunk else block
+    if chunk:
+        sections.append(chunk)
+    return sections
+
+
+# --- Ranking por señales de financiación y similitud con la oportunidad ---
+
+FUNDING_SIGNALS = [
+    "deadline", "fecha límite", "fecha limite", "fecha de cierre", "cierre", "cronograma", "plazo",
+    "requisitos", "requirements", "eligibility", "elegible", "elegibles", "beneficiarios", "dirigido a",
+    "monto", "amount", "financiación", "financiacion", "funding", "presupuesto", "cofinanciación",
+    "términos de referencia", "terminos de referencia", "convocatoria", "postulación", "postulacion",
+    "apply", "application", "how to apply", "inscripción", "inscripcion", "award", "grant",
+]
+DATE_PATTERN = re.compile(
+    r"\b\d{4}-\d{2}-\d{2}\b|\b\d{1,2}\s+de\s+[a-záéíóú]+\s+(de\s+)?\d{4}\b|\b\d{1,2}/\d{1,2}/\d{2,4}\b|"
+    r"\b(january|february|march|april|may|june|july|august|september|october|november|december)\s+\d{1,2},?\s+\d{4}\b",
+    re.IGNORECASE,
+)
+_MONEY_PATTERN = re.compile(r"(\$|usd|cop|eur|€)\s?\d", re.IGNORECASE)
+_WORD_PATTERN = re.compile(r"\w{3,}", re.UNICODE)
+
+def _cosine(a: Counter, b: Counter) -> float:
+    common = set(a) & set(b)
+    if not common:
+        return 0.0
+    dot = sum(a[t] * b[t] for t in common)
+    return dot / (math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values())))
+
+def score_section(section: str, query_tokens: Counter, position: int, total: int) -> float:
+    """Puntúa una sección: señales de financiación + fechas/montos + similitud con la consulta + leve prior por posición."""
+    lowered = section.lower()
+    signals = sum(lowered.count(s) for s in FUNDING_SIGNALS)
+    signals += 2 * len(DATE_PATTERN.findall(section)) + len(_MONEY_PATTERN.findall(section))
+    density = signals / (1 + len(section) / 500)
+    similarity = _cosine(Counter(_WORD_PATTERN.findall(lowered)), query_tokens) if query_tokens else 0.0
+    position_prior = 0.3 * (1 - position / max(total, 1))
+    return density + 3 * similarity + position_prior
+
+def pack_sections(sections: List[str], max_chars: int, query: str = "") -> str:
+    """
+    Elige las mejores secciones hasta llenar el presupuesto y las devuelve en su
+    orden original. Si ni la mejor cabe entera, se devuelve recortada por palabras.
+    """
+    if sum(len(s) for s in sections) <= max_chars:
+        return "\n\n".join(sections)
+    query_tokens = Counter(_WORD_PATTERN.findall((query or "").lower()))
+    ranked = sorted(
+        range(len(sections)),
+        key=lambda i: score_section(sections[i], query_tokens, i, len(sections)),
+        reverse=True,
+    )
+    chosen, used = [], 0
+    for i in ranked:
+        length = len(sections[i]) + 2
+        if used + length > max_chars:
+            continue
+        chosen.append(i)
+        used += length
+    if not chosen and ranked:
+        return truncate_words(sections[ranked[0]], max_chars)
+    return "\n\n".join(sections[i] for i in sorted(chosen))
+
+def reduce_html(html: bytes | str, max_tokens: int, query: str = "") -> str:
+    """Reduce una página HTML al contenido más útil que cabe en `max_tokens` (~4 caracteres por token)."""
+    return pack_sections(extract_sections(html), max_tokens * 4, query)
+
+def reduce_text(text: str, max_tokens: int, query: str = "") -> str:
+    """Igual que `reduce_html` pero para texto plano."""
+    return pack_sections(split_text_sections(text), max_tokens * 4, query)
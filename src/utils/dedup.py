@@ -0,0 +1,291 @@
+# src/utils/dedup.py
+import re
+import hashlib
+import unicodedata
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import List, Dict, Tuple, Iterable
+
+from .normalizers import canonicalize_url
+from ..schemas.models import FundingOpportunity
+
+# --- SimHash para detectar casi-duplicados ---
+
+_WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+def _shingles(text: str, size: int = 3) -> List[str]:
+    words = _WORD_PATTERN.findall((text or "").lower())
+    if len(words) < size:
+        return words
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+def simhash(text: str, bits: int = 64) -> int:
+    """Huella SimHash de 64 bits: textos parecidos producen huellas a poca distancia de Hamming."""
+    weights = [0] * bits
+    for shingle in _shingles(text):
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for i in range(bits):
+            weights[i] += 1 if (h >> i) & 1 else -1
+    return sum(1 << i for i, w in enumerate(weights) if w > 0)
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+def _bands(fingerprint: int, n_bands: int = 4, bits: int = 64) -> Iterable[Tuple[int, int]]:
+    # Con distancia <= n_bands - 1, al menos una banda coincide exactamente (principio del palomar).
+    width = bits // n_bands
+    for band in range(n_bands):
+        yield band, (fingerprint >> (band * width)) & ((1 << width) - 1)
+
+
+# --- Deduplicación de resultados de búsqueda ---
+
+def _richness(result: Dict) -> int:
+    return len(result.get("description") or "") + len(result.get("title") or "")
+
+def cluster_results(results: List[Dict], max_distance: int = 3, min_words: int = 8) -> List[List[int]]:
+    """
+    Agrupa los índices de los resultados que son la misma fuente:
+    1. Resultados con la misma URL canónica.
+    2. Resultados cuyo título + descripción son casi idénticos (SimHash).
+    Los grupos se devuelven en el orden en que aparece su primer elemento.
+    """
+    clusters: List[List[int]] = []
+    by_url: Dict[str, int] = {}
+    band_index: Dict[Tuple[int, int], List[int]] = {}
+    fingerprints: List[int] = []
+
+    for index, result in enumerate(results):
+        url_key = canonicalize_url(result.get("url") or "")
+        cluster_id = by_url.get(url_key) if result.get("url") else None
+
+        text = f"{result.get('title') or ''} {result.get('description') or ''}"
+        fingerprint = None
+        if len(_WORD_PATTERN.findall(text)) >= min_words:
+            fingerprint = simhash(text)
+            if cluster_id is None:
+                candidates = {c for band in _bands(fingerprint) for c in band_index.get(band, [])}
+                for candidate in sorted(candidates):
+                    if hamming_distance(fingerprint, fingerprints[candidate]) <= max_distance:
+                        cluster_id = candidate
+                        break
+
+        if cluster_id is None:
+            cluster_id = len(clusters)
+            clusters.append([])
+            fingerprints.append(fingerprint if fingerprint is not None else 0)
+            if fingerprint is not None:
+                for band in _bands(fingerprint):
+                    band_index.setdefault(band, []).append(cluster_id)
+        clusters[cluster_id].append(index)
+        if result.get("url"):
+            by_url.setdefault(url_key, cluster_id)
+    return clusters
+
+def dedupe_results_with_clusters(results: List[Dict], max_distance: int = 3,
+                                 min_words: int = 8) -> Tuple[List[Dict], List[List[int]]]:
+    """
+    Como `dedupe_results`, pero devuelve también, por cada resultado conservado,
+    los índices de `results` que agrupa (p. ej. para unir la procedencia de todos).
+    """
+    clusters = cluster_results(results, max_distance, min_words)
+    unique = []
+    for cluster in clusters:
+        best = max((results[i] for i in cluster), key=_richness)
+        unique.append({**best, "cluster_size": len(cluster)} if len(cluster) > 1 else best)
+    return unique, clusters
+
+def dedupe_results(results: List[Dict], max_distance: int = 3, min_words: int = 8) -> Tuple[List[Dict], int]:
+    """
+    Elimina duplicados entre fuentes antes del escrutinio (ver `cluster_results`).
+    De cada grupo se conserva el registro más completo, en la posición del primero;
+    si el grupo tenía varios, se anota su tamaño en `cluster_size` (lo usa la prioridad).
+    Devuelve la lista deduplicada y el número de elementos eliminados.
+    """
+    unique, _ = dedupe_results_with_clusters(results, max_distance, min_words)
+    return unique, len(results) - len(unique)
+
+def dedupe_search_results(results: List[Dict]) -> List[Dict]:
+    """Versión para el pipeline: deduplica e informa cuántos elementos se eliminaron."""
+    unique, removed = dedupe_results(results)
+    print(f"\n[Dedup] {removed} duplicados eliminados ({len(results)} -> {len(unique)} resultados).")
+    return unique
+
+
+# --- Resolución de entidades entre oportunidades extraídas ---
+
+_STOPWORDS = {
+    "de", "del", "la", "el", "los", "las", "y", "en", "para", "por", "con", "a", "al",
+    "the", "of", "and", "for", "in", "to", "on", "convocatoria", "call", "program", "programa",
+}
+
+def normalize_text(text: str) -> str:
+    """Minúsculas y sin tildes ni diacríticos."""
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+def content_tokens(text: str) -> set:
+    """Palabras con contenido del texto normalizado (sin stopwords ni letras sueltas)."""
+    return {w for w in _WORD_PATTERN.findall(normalize_text(text)) if w not in _STOPWORDS and len(w) > 1}
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+def _blocking_keys(opportunity: FundingOpportunity) -> List[str]:
+    keys = []
+    origin_tokens = sorted(content_tokens(opportunity.origin))
+    if origin_tokens:
+        keys.append("origin:" + " ".join(origin_tokens[:3]))
+    if opportunity.opportunity_url:
+        keys.append("url:" + canonicalize_url(opportunity.opportunity_url))
+    if opportunity.application_deadline:
+        keys.append("deadline:" + opportunity.application_deadline.strip())
+    return keys
+
+# La misma URL suma, pero no decide: una página de listado suele ser la
+# `opportunity_url` de todas las convocatorias que contiene.
+_SAME_URL_BONUS = 0.3
+_SAME_URL_MIN_ORIGIN = 0.3
+
+def opportunity_similarity(a: FundingOpportunity, b: FundingOpportunity) -> float:
+    """Puntuación en [0, 1] de que dos oportunidades sean la misma convocatoria."""
+    origin_score = _jaccard(content_tokens(a.origin), content_tokens(b.origin))
+    description_score = SequenceMatcher(None, normalize_text(a.description), normalize_text(b.description)).ratio()
+    score = 0.45 * origin_score + 0.4 * description_score
+    deadlines_differ = False
+    if a.application_deadline and b.application_deadline:
+        # Fechas distintas suelen indicar convocatorias distintas de la misma entidad.
+        deadlines_differ = a.application_deadline.strip() != b.application_deadline.strip()
+        score += -0.3 if deadlines_differ else 0.15
+    else:
+        score += 0.075
+    same_url = bool(a.opportunity_url and b.opportunity_url
+                    and canonicalize_url(a.opportunity_url) == canonicalize_url(b.opportunity_url))
+    if same_url and not deadlines_differ and origin_score >= _SAME_URL_MIN_ORIGIN:
+        score += _SAME_URL_BONUS
+    return max(0.0, min(1.0, score))
+
+def merge_opportunities(group: List[FundingOpportunity]) -> FundingOpportunity:
+    """Fusiona un grupo de duplicados en un único registro con la información más completa."""
+    def most_common(values):
+        values = [v for v in values if v]
+        return Counter(values).most_common(1)[0][0] if values else None
+
+    requirements, seen = [], set()
+    for opportunity in group:
+        for requirement in opportunity.main_requirements or []:
+            key = normalize_text(requirement).strip()
+            if key and key not in seen:
+                seen.add(key)
+                requirements.append(requirement)
+
+    return FundingOpportunity(
+        origin=max((o.origin for o in group), key=len),
+        description=max((o.description for o in group), key=len),
+        financing_type=most_common(o.financing_type for o in group),
+        main_requirements=requirements,
+        application_deadline=most_common(o.application_deadline for o in group),
+        opportunity_url=most_common(o.opportunity_url for o in group),
+        source_url=most_common(o.source_url for o in group),
+    )
+
+def cluster_opportunities(opportunities: List[FundingOpportunity], threshold: float = 0.6) -> List[List[int]]:
+    """
+    Agrupa los índices de las oportunidades que son la misma convocatoria:
+    bloquea por origen/URL/fecha normalizados y compara solo dentro de cada bloque.
+    """
+    parent = list(range(len(opportunities)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    blocks: Dict[str, List[int]] = {}
+    for i, opportunity in enumerate(opportunities):
+        for key in _blocking_keys(opportunity):
+            blocks.setdefault(key, []).append(i)
+
+    compared = set()
+    for members in blocks.values():
+        for x in range(len(members)):
+            for y in range(x + 1, len(members)):
+                i, j = members[x], members[y]
+                if (i, j) in compared or find(i) == find(j):
+                    continue
+                compared.add((i, j))
+                if opportunity_similarity(opportunities[i], opportunities[j]) >= threshold:
+                    parent[find(j)] = find(i)
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(opportunities)):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+def resolve_opportunities(opportunities: List[FundingOpportunity], threshold: float = 0.6) -> Tuple[List[FundingOpportunity], int]:
+    """
+    Deduplica oportunidades extraídas de varias páginas y fusiona los grupos
+    resultantes. Devuelve la lista resuelta y cuántas se fusionaron.
+    """
+    groups = [[opportunities[i] for i in group] for group in cluster_opportunities(opportunities, threshold)]
+    resolved = [merge_opportunities(g) if len(g) > 1 else g[0] for g in groups]
+    return resolved, len(opportunities) - len(resolved)
+
+def resolve_extracted_opportunities(opportunities: List[FundingOpportunity]) -> List[FundingOpportunity]:
+    """Versión para el pipeline: resuelve duplicados e informa cuántos se fusionaron."""
+    resolved, merged = resolve_opportunities(opportunities)
+    print(f"\n[Dedup] {merged} oportunidades duplicadas fusionadas ({len(opportunities)} -> {len(resolved)}).")
+    return resolved
+
+class IncrementalOpportunityResolver:
+    """
+    Versión incremental de `resolve_opportunities` para el modo streaming:
+    cada oportunidad nueva se compara (dentro de sus bloques) con las ya aceptadas
+    y solo se deja pasar si no es un duplicado. Como en `resolve_opportunities`,
+    los duplicados no se descartan: se fusionan (`merge_opportunities`) con el
+    registro aceptado, que `merged` devuelve actualizado.
+    """
+
+    def __init__(self, threshold: float = 0.6):
+        self.threshold = threshold
+        self.accepted: List[FundingOpportunity] = []
+        self.groups: List[List[FundingOpportunity]] = []
+        self.blocks: Dict[str, List[int]] = {}
+        self.duplicates = 0
+        self._index_by_id: Dict[int, int] = {}
+
+    def _index_keys(self, index: int, opportunity: FundingOpportunity) -> None:
+        for key in _blocking_keys(opportunity):
+            members = self.blocks.setdefault(key, [])
+            if index not in members:
+                members.append(index)
+
+    def add(self, opportunity: FundingOpportunity) -> bool:
+        """
+        Registra la oportunidad. Devuelve True si es nueva y False si es un
+        duplicado, en cuyo caso se fusiona con el registro aceptado.
+        """
+        candidates = {i for key in _blocking_keys(opportunity) for i in self.blocks.get(key, [])}
+        for i in sorted(candidates):
+            if opportunity_similarity(self.accepted[i], opportunity) >= self.threshold:
+                self.duplicates += 1
+                self.groups[i].append(opportunity)
+                self.accepted[i] = merge_opportunities(self.groups[i])
+                # La fusión puede aportar URL o fecha nuevas: también se bloquea por ellas.
+                self._index_keys(i, self.accepted[i])
+                return False
+        index = len(self.accepted)
+        self.accepted.append(opportunity)
+        self.groups.append([opportunity])
+        self._index_by_id[id(opportunity)] = index
+        self._index_keys(index, opportunity)
+        return True
+
+    def merged(self, opportunity: FundingOpportunity) -> FundingOpportunity:
+        """
+        Registro fusionado del grupo que aceptó `opportunity` (el objeto para el
+        que `add` devolvió True), con los duplicados llegados desde entonces.
+        """
+        index = self._index_by_id.get(id(opportunity))
+        return self.accepted[index] if index is not None else opportunity
@@ -0,0 +1,262 @@
+# src/utils/document_parser.py
+import signal
+import asyncio
+import weakref
+import functools
+import importlib.util
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from bs4 import BeautifulSoup
+
+from ..config import settings
+from .content_reducer import reduce_html, reduce_text
+
+# --- Parseo de documentos (se ejecuta dentro de los procesos del pool) ---
+
+class DocumentParseError(Exception):
+    """El documento no se pudo convertir en texto (formato sin soporte, tiempo o memoria agotados)."""
+
+
+def is_pdf(body: bytes, content_type: Optional[str] = None, url: str = "") -> bool:
+    return body.startswith(b"%PDF") or "pdf" in (content_type or "").lower() or url.lower().endswith(".pdf")
+
+@functools.lru_cache(maxsize=1)
+def pdf_extractor_available() -> bool:
+    """Hay algún extractor de PDF instalado (pymupdf o pypdf)."""
+    return any(importlib.util.find_spec(name) is not None for name in ("pymupdf", "pypdf"))
+
+def pdf_to_text(body: bytes, max_pages: int = settings.PARSE_PDF_MAX_PAGES) -> str:
+    """
+    Extrae el texto de un PDF con PyMuPDF (`pip install pymupdf`) o, si no está,
+    con pypdf. Sin ninguno de los dos lanza `DocumentParseError`.
+    """
+    try:
+        import pymupdf
+    except ImportError:
+        pymupdf = None
+    if pymupdf is not None:
+        with pymupdf.open(stream=body, filetype="pdf") as document:
+            return "\n\n".join(page.get_text() for page in document.pages(0, min(max_pages, document.page_count)))
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise DocumentParseError("No hay extractor de PDF instalado (pymupdf o pypdf).")
+    from io import BytesIO
+    reader = PdfReader(BytesIO(body))
+    return "\n\n".join((page.extract_text() or "") for page in reader.pages[:max_pages])
+
+def html_to_text(body: bytes, url: str = "") -> str:
+    """Convierte el HTML en texto plano, igual que hacía `WebBaseLoader`."""
+    parser = "xml" if url.endswith(".xml") else "html.parser"
+    return BeautifulSoup(body, parser).get_text()
+
+def document_to_text(body: bytes, content_type: Optional[str] = None, url: str = "") -> str:
+    """Texto plano completo de un documento (PDF, feed o HTML)."""
+    if is_pdf(body, content_type, url):
+        return pdf_to_text(body)
+    return html_to_text(body, url)
+
+def reduce_document(body: bytes, content_type: Optional[str], url: str, max_tokens: int, query: str = "") -> str:
+    """Quita el boilerplate y empaqueta las secciones más relevantes en `max_tokens`."""
+    content_type = (content_type or "").lower()
+    if is_pdf(body, content_type, url):
+        return reduce_text(pdf_to_text(body), max_tokens, query)
+    is_feed = ("xml" in content_type and "html" not in content_type) or url.endswith(".xml")
+    if is_feed or content_type.startswith("text/plain"):
+        return reduce_text(html_to_text(body, url), max_tokens, query)
+    return reduce_html(body, max_tokens, query)
+
+
+def _init_worker(max_memory_mb: int) -> None:
+    """Limita la memoria de cada proceso del pool (solo en sistemas POSIX)."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        import resource
+    except ImportError:
+        return
+    if max_memory_mb:
+        limit = max_memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def _on_alarm(signum, frame):
+    raise TimeoutError("Tiempo de parseo agotado")
+
+def _run_with_deadline(timeout: float, func, *args):
+    """
+    Ejecuta `func` en el proceso del pool con una alarma de `timeout` segundos,
+    para que un documento patológico no retenga al worker. Los errores de memoria
+    se convierten en `DocumentParseError`.
+    """
+    use_alarm = timeout and hasattr(signal, "setitimer")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return func(*args)
+    except MemoryError:
+        raise DocumentParseError(f"El documento supera el límite de memoria ({settings.PARSE_MAX_MEMORY_MB} MB).")
+    except TimeoutError:
+        raise DocumentParseError(f"El parseo superó {timeout:g}s.")
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+# --- Pool de procesos compartido ---
+
+class _ParseService:
+    """
+    Pool de procesos compartido para convertir documentos en texto.
+
+    La descarga sigue siendo asíncrona en el cliente HTTP compartido; aquí solo
+    se hace el trabajo de CPU (BeautifulSoup, extracción de PDFs), repartido
+    entre todos los núcleos. Cada worker tiene un límite de memoria y cada
+    documento un tiempo máximo (una alarma dentro del propio worker, que cubre
+    casi todos los casos sin tocar el pool).
+
+    Si aun así un worker muere o se cuelga en código nativo, hay que recrear el
+    pool: `ProcessPoolExecutor` no permite matar un solo worker (la muerte de
+    cualquiera de ellos rompe el pool entero). El documento culpable se da por
+    fallido; los demás que estaban en vuelo en ese pool (rotos o a la espera)
+    se reintentan una vez en el pool nuevo, así que el reinicio no los arrastra.
+
+    Los workers se arrancan con 'spawn': los scripts que usen el agente deben
+    proteger su punto de entrada con `if __name__ == "__main__":`.
+    """
+
+    def __init__(self, max_workers: int = settings.PARSE_WORKERS):
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Pools descartados a propósito: sus fallos en vuelo son víctimas, no culpables.
+        self._retired: "weakref.WeakSet[ProcessPoolExecutor]" = weakref.WeakSet()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # 'spawn' evita heredar por fork los hilos del cliente HTTP.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(settings.PARSE_MAX_MEMORY_MB,),
+                )
+            return self._executor
+
+    def _restart(self, executor: ProcessPoolExecutor) -> None:
+        """Descarta un pool roto o con un worker colgado (solo si sigue siendo el actual)."""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self._retired.add(executor)
+        # ProcessPoolExecutor no expone cómo matar un worker colgado: lo hacemos a mano.
+        # Sin cancel_futures, los items pendientes fallan con BrokenProcessPool y se reintentan.
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False)
+
+    def _is_victim(self, executor: ProcessPoolExecutor) -> bool:
+        """El pool se rompió porque otro documento forzó su reinicio."""
+        with self._lock:
+            return executor in self._retired
+
+    def submit(self, func, *args) -> tuple[ProcessPoolExecutor, Future]:
+        executor = self._get_executor()
+        try:
+            return executor, executor.submit(_run_with_deadline, settings.PARSE_TIMEOUT_SECONDS, func, *args)
+        except BrokenProcessPool:
+            self._restart(executor)
+            executor = self._get_executor()
+            return executor, executor.submit(_run_with_deadline, settings.PARSE_TIMEOUT_SECONDS, func, *args)
+
+    def _failed(self, executor: ProcessPoolExecutor, error: BaseException) -> DocumentParseError:
+        self._restart(executor)
+        if isinstance(error, BrokenProcessPool):
+            return DocumentParseError("El proceso de parseo murió (¿límite de memoria?).")
+        return DocumentParseError(f"El parseo superó {settings.PARSE_TIMEOUT_SECONDS:g}s.")
+
+    async def _await(self, future: Future):
+        # Margen sobre la alarma del worker: solo salta si el worker no responde.
+        # Mientras el documento sigue en cola detrás de otros, la espera no cuenta.
+        wrapped = asyncio.wrap_future(future)
+        while True:
+            try:
+                return await asyncio.wait_for(asyncio.shield(wrapped), settings.PARSE_TIMEOUT_SECONDS + 5)
+            except asyncio.TimeoutError:
+                if future.running():
+                    raise
+
+    def _wait(self, future: Future):
+        while True:
+            try:
+                return future.result(timeout=settings.PARSE_TIMEOUT_SECONDS + 5)
+            except TimeoutError:
+                if future.running():
+                    raise
+
+    async def arun(self, func, *args):
+        for retry in (False, True):
+            executor, future = self.submit(func, *args)
+            try:
+                return await self._await(future)
+            except (BrokenProcessPool, asyncio.TimeoutError) as e:
+                if not retry and self._is_victim(executor):
+                    continue
+                raise self._failed(executor, e) from e
+
+    def run(self, func, *args):
+        for retry in (False, True):
+            executor, future = self.submit(func, *args)
+            try:
+                return self._wait(future)
+            except (BrokenProcessPool, TimeoutError) as e:
+                if not retry and self._is_victim(executor):
+                    continue
+                raise self._failed(executor, e) from e
+
+
+_service: Optional[_ParseService] = None
+_service_lock = threading.Lock()
+
+def _get_service() -> _ParseService:
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = _ParseService()
+        return _service
+
+def _use_pool(body: bytes, content_type: Optional[str], url: str) -> bool:
+    # Las páginas pequeñas se parsean en un hilo: enviarlas a otro proceso cuesta más que parsearlas.
+    if not settings.PARSE_POOL_ENABLED:
+        return False
+    return len(body) >= settings.PARSE_INLINE_MAX_BYTES or is_pdf(body, content_type, url)
+
+
+async def areduce_document(body: bytes, content_type: Optional[str], url: str, max_tokens: int, query: str = "") -> str:
+    """Versión asíncrona de `reduce_document`: los documentos grandes y los PDFs van al pool de procesos."""
+    if _use_pool(body, content_type, url):
+        return await _get_service().arun(reduce_document, body, content_type, url, max_tokens, query)
+    return await asyncio.to_thread(reduce_document, body, content_type, url, max_tokens, query)
+
+def reduce_document_isolated(body: bytes, content_type: Optional[str], url: str, max_tokens: int, query: str = "") -> str:
+    """Versión bloqueante de `areduce_document` para código síncrono."""
+    if _use_pool(body, content_type, url):
+        return _get_service().run(reduce_document, body, content_type, url, max_tokens, query)
+    return reduce_document(body, content_type, url, max_tokens, query)
+
+async def adocument_to_text(body: bytes, content_type: Optional[str] = None, url: str = "") -> str:
+    """Versión asíncrona de `document_to_text` (mismo criterio que `areduce_document`)."""
+    if _use_pool(body, content_type, url):
+        return await _get_service().arun(document_to_text, body, content_type, url)
+    return await asyncio.to_thread(document_to_text, body, content_type, url)
+
+def document_to_text_isolated(body: bytes, content_type: Optional[str] = None, url: str = "") -> str:
+    """Versión bloqueante de `adocument_to_text`."""
+    if _use_pool(body, content_type, url):
+        return _get_service().run(document_to_text, body, content_type, url)
+    return document_to_text(body, content_type, url)
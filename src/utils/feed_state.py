@@ -0,0 +1,117 @@
+# src/utils/feed_state.py
+import os
+import time
+import sqlite3
+import threading
+from typing import Iterable, Optional, Tuple
+
+from ..config import settings
+from .normalizers import canonicalize_url
+
+
+class FeedStateStore:
+    """
+    Estado persistente de la ingesta RSS (SQLite):
+    - por feed: ETag y Last-Modified de la última descarga, para peticiones condicionales;
+    - por entrada: su identificador y un hash de su contenido, para detectar
+      entradas nuevas o actualizadas.
+
+    Una entrada leída queda "pendiente" hasta que tiene un resultado definitivo:
+    el escrutinio la descarta o se extraen sus oportunidades (`mark_processed`).
+    Solo si la ejecución se corta antes (error, LLM caído, presupuesto agotado)
+    la entrada se vuelve a ofrecer.
+    La extracción no depende del proyecto y sus oportunidades acaban en el
+    almacén compartido, que cada proyecto consulta: por eso el estado es global.
+    """
+
+    def __init__(self, path: str = settings.FEED_STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS feeds (
+                    feed_url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    modified TEXT,
+                    checked_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS entries (
+                    feed_url TEXT NOT NULL,
+                    entry_id TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    seen_at REAL NOT NULL,
+                    PRIMARY KEY (feed_url, entry_id)
+                );
+                CREATE TABLE IF NOT EXISTS pending_entries (
+                    feed_url TEXT NOT NULL,
+                    entry_id TEXT NOT NULL,
+                    url_key TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    ingested_at REAL NOT NULL,
+                    PRIMARY KEY (feed_url, entry_id)
+                );
+                CREATE INDEX IF NOT EXISTS idx_pending_url ON pending_entries(url_key);
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get_validators(self, feed_url: str) -> Tuple[Optional[str], Optional[str]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT etag, modified FROM feeds WHERE feed_url = ?", (feed_url,)).fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    def save_validators(self, feed_url: str, etag: Optional[str], modified: Optional[str]) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO feeds (feed_url, etag, modified, checked_at) VALUES (?, ?, ?, ?)",
+                         (feed_url, etag, modified, time.time()))
+
+    def is_new_or_updated(self, feed_url: str, entry_id: str, content_hash: str) -> bool:
+        with self._connect() as conn:
+            row = conn.execute("SELECT content_hash FROM entries WHERE feed_url = ? AND entry_id = ?",
+                               (feed_url, entry_id)).fetchone()
+        return row is None or row[0] != content_hash
+
+    def mark_ingested(self, feed_url: str, entry_id: str, entry_url: Optional[str], content_hash: str) -> None:
+        """Registra la entrada como pendiente de procesar (aún no cuenta como vista)."""
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO pending_entries (feed_url, entry_id, url_key, content_hash, ingested_at) VALUES (?, ?, ?, ?, ?)",
+                         (feed_url, entry_id, canonicalize_url(entry_url or entry_id), content_hash, time.time()))
+
+    def has_pending(self, feed_url: str) -> bool:
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM pending_entries WHERE feed_url = ? LIMIT 1", (feed_url,)).fetchone() is not None
+
+    def mark_processed(self, entry_urls: Iterable[Optional[str]]) -> int:
+        """
+        Da por vistas las entradas pendientes que apuntan a `entry_urls` (descartadas
+        en el escrutinio o ya extraídas). Devuelve cuántas.
+        """
+        url_keys = sorted({canonicalize_url(url) for url in entry_urls if url})
+        if not url_keys:
+            return 0
+        rows = []
+        with self._lock, self._connect() as conn:
+            for url_key in url_keys:
+                rows += conn.execute("SELECT feed_url, entry_id, content_hash FROM pending_entries WHERE url_key = ?",
+                                     (url_key,)).fetchall()
+            if rows:
+                now = time.time()
+                conn.executemany("INSERT OR REPLACE INTO entries (feed_url, entry_id, content_hash, seen_at) VALUES (?, ?, ?, ?)",
+                                 [(feed_url, entry_id, content_hash, now) for feed_url, entry_id, content_hash in rows])
+                conn.executemany("DELETE FROM pending_entries WHERE url_key = ?", [(url_key,) for url_key in url_keys])
+        return len(rows)
+
+
+_feed_state: Optional[FeedStateStore] = None
+_feed_state_lock = threading.Lock()
+
+def get_feed_state() -> FeedStateStore:
+    """Devuelve la instancia compartida del estado de feeds."""
+    global _feed_state
+    with _feed_state_lock:
+        if _feed_state is None:
+            _feed_state = FeedStateStore()
+        return _feed_state
@@ -0,0 +1,177 @@
+# src/utils/llm_cache.py
+import os
+import json
+import asyncio
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Optional, Type
+
+from pydantic import BaseModel
+from langchain_core.runnables import Runnable, RunnableLambda, RunnableConfig
+
+from ..config import settings
+from .metrics import record_metric, arecord_metric
+from .budget import mark_served_from_cache, take_llm_turn
+
+
+class LLMResponseCache:
+    """
+    Caché persistente (SQLite) de respuestas del LLM.
+    La clave combina modelo, temperatura, hash del prompt ya renderizado y el
+    schema de salida, de modo que cualquier cambio en alguno de ellos invalida
+    la entrada. Expulsa por LRU cuando se supera `max_entries`.
+    """
+
+    def __init__(self, path: str = settings.LLM_CACHE_PATH, max_entries: int = settings.LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0})
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS responses (
+                    cache_key TEXT PRIMARY KEY,
+                    chain_name TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at);
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def make_key(model_name: str, temperature: float, prompt_text: str, output_schema: Optional[Type[BaseModel]]) -> str:
+        schema = json.dumps(output_schema.model_json_schema(), sort_keys=True) if output_schema else ""
+        raw = "\x1f".join([
+            model_name, f"{temperature:.3f}",
+            hashlib.sha256(prompt_text.encode("utf-8")).hexdigest(),
+            hashlib.sha256(schema.encode("utf-8")).hexdigest(),
+        ])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT payload FROM responses WHERE cache_key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE cache_key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key: str, chain_name: str, payload: dict) -> None:
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO responses (cache_key, chain_name, payload, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (key, chain_name, json.dumps(payload, ensure_ascii=False), now, now))
+            count = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_entries:
+                conn.execute("""
+                    DELETE FROM responses WHERE cache_key IN (
+                        SELECT cache_key FROM responses ORDER BY accessed_at ASC LIMIT ?
+                    )
+                """, (count - self.max_entries,))
+
+    def record(self, chain_name: str, hit: bool) -> None:
+        with self._lock:
+            self.stats[chain_name]["hits" if hit else "misses"] += 1
+
+
+_llm_cache: Optional[LLMResponseCache] = None
+_llm_cache_lock = threading.Lock()
+
+def get_llm_cache() -> LLMResponseCache:
+    """Devuelve la instancia compartida de la caché de respuestas."""
+    global _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = LLMResponseCache()
+        return _llm_cache
+
+def get_llm_cache_stats() -> Dict[str, Dict[str, int]]:
+    """Contadores de aciertos/fallos por cadena desde el inicio del proceso."""
+    return {name: dict(counts) for name, counts in get_llm_cache().stats.items()}
+
+
+def _serialize(output: Any) -> dict:
+    if isinstance(output, BaseModel):
+        return {"kind": "model", "data": output.model_dump(mode="json")}
+    return {"kind": "json", "data": output}
+
+def _deserialize(payload: dict, output_schema: Optional[Type[BaseModel]]) -> Any:
+    if payload["kind"] == "model" and output_schema is not None:
+        return output_schema.model_validate(payload["data"])
+    return payload["data"]
+
+async def _await_llm_turn(prompt_value: Any) -> Any:
+    await take_llm_turn()
+    return prompt_value
+
+# Paso neutro que, sin caché, pide el turno en el limitador antes del LLM.
+_LLM_TURN = RunnableLambda(lambda prompt_value: prompt_value, afunc=_await_llm_turn, name="llm_turn")
+
+def with_response_cache(
+    prompt: Runnable,
+    llm_step: Runnable,
+    chain_name: str,
+    model_name: str,
+    temperature: float,
+    output_schema: Optional[Type[BaseModel]] = None,
+    bypass: bool = False,
+) -> Runnable:
+    """
+    Envuelve `prompt | llm_step` con la caché de respuestas.
+    El prompt se renderiza primero para calcular la clave; si hay acierto no se
+    llama al LLM ni se pide turno en el limitador (`take_llm_turn`), que solo se
+    espera ante un fallo: la consulta a la caché va siempre antes que el limitador. Con `bypass=True` (o `LLM_CACHE_BYPASS=true`) se llama siempre.
+    """
+    if bypass or not settings.LLM_CACHE_ENABLED:
+        return prompt | _LLM_TURN | llm_step
+
+    def _lookup(prompt_value) -> tuple:
+        cache = get_llm_cache()
+        key = cache.make_key(model_name, temperature, prompt_value.to_string(), output_schema)
+        payload = cache.get(key)
+        cache.record(chain_name, payload is not None)
+        return cache, key, payload
+
+    def _metric_name(payload) -> str:
+        return "llm_cache_hits" if payload is not None else "llm_cache_misses"
+
+    def _store(cache: LLMResponseCache, key: str, output: Any) -> None:
+        if output is not None:
+            cache.put(key, chain_name, _serialize(output))
+
+    def invoke_cached(inputs: dict, config: RunnableConfig) -> Any:
+        prompt_value = prompt.invoke(inputs, config)
+        cache, key, payload = _lookup(prompt_value)
+        record_metric(_metric_name(payload), 1, config)
+        if payload is not None:
+            mark_served_from_cache()
+            return _deserialize(payload, output_schema)
+        output = llm_step.invoke(prompt_value, config)
+        _store(cache, key, output)
+        return output
+
+    async def ainvoke_cached(inputs: dict, config: RunnableConfig) -> Any:
+        prompt_value = await prompt.ainvoke(inputs, config)
+        # SQLite es bloqueante: la consulta y la escritura van a un hilo para no frenar el bucle de eventos.
+        cache, key, payload = await asyncio.to_thread(_lookup, prompt_value)
+        await arecord_metric(_metric_name(payload), 1, config)
+        if payload is not None:
+            mark_served_from_cache()
+            return _deserialize(payload, output_schema)
+        await take_llm_turn()
+        output = await llm_step.ainvoke(prompt_value, config)
+        await asyncio.to_thread(_store, cache, key, output)
+        return output
+
+    return RunnableLambda(invoke_cached, afunc=ainvoke_cached, name=f"{chain_name} (cached)")
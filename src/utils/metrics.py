@@ -0,0 +1,218 @@
+# src/utils/metrics.py
+import os
+import json
+import time
+import threading
+import weakref
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.callbacks.manager import dispatch_custom_event, adispatch_custom_event
+
+from ..config import settings
+from .prompt_budget import estimate_message_tokens
+
+# Nombre del evento personalizado con el que el código emite métricas propias
+# (espera en el limitador, aciertos de caché, bytes HTTP...).
+METRIC_EVENT = "flow_search_metric"
+
+# Runs con nombre que se miden como etapas. Los runs "Enriching Item: ..." se miden como items.
+STAGE_RUN_NAMES = {
+    "Stage 1: Discovery", "Stage 2: Enrichment", "Recalling Known Opportunities", "Researching Gaps",
+    "Generating Queries", "Performing Research (Web + RSS)", "Deduplicating Results", "Scrutinizing Results",
+    "Extracting Opportunities", "Resolving Duplicate Opportunities", "Formatting Final Output",
+    "Streaming Agent", "Batch Agent", "Checkpointed Agent", "Watching Opportunities",
+}
+ITEM_RUN_PREFIX = "Enriching Item: "
+
+_live_handlers: "weakref.WeakSet[RunMetricsHandler]" = weakref.WeakSet()
+
+
+def record_metric(name: str, value: float = 1.0, config: Optional[dict] = None) -> None:
+    """
+    Suma `value` a la métrica `name` de la etapa/item en curso.
+    No hace nada si no hay ningún `RunMetricsHandler` activo o si no se está
+    dentro de un run de LangChain.
+    """
+    if not _live_handlers:
+        return
+    try:
+        dispatch_custom_event(METRIC_EVENT, {"name": name, "value": value}, config=config)
+    except RuntimeError:
+        pass
+
+async def arecord_metric(name: str, value: float = 1.0, config: Optional[dict] = None) -> None:
+    """Versión asíncrona de `record_metric` (para usar dentro de código async)."""
+    if not _live_handlers:
+        return
+    try:
+        await adispatch_custom_event(METRIC_EVENT, {"name": name, "value": value}, config=config)
+    except RuntimeError:
+        pass
+
+
+class RunMetricsHandler(BaseCallbackHandler):
+    """
+    Callback que mide una ejecución del agente por etapa (runs con nombre de
+    `STAGE_RUN_NAMES`) y por item ("Enriching Item: ..."):
+    tiempo de reloj, espera en el limitador, tokens de entrada/salida del LLM
+    (y los de entrada estimados antes de la llamada, para comparar),
+    llamadas por proveedor, aciertos de caché, bytes HTTP y errores.
+
+    Uso: `pipeline.invoke(x, config={"callbacks": [handler]})` y después
+    `handler.export_jsonl()` / `handler.to_prometheus()`.
+    """
+
+    def __init__(self, stage_names: Optional[set] = None):
+        self.stage_names = stage_names or STAGE_RUN_NAMES
+        self._lock = threading.Lock()
+        self._runs: Dict[UUID, Dict[str, Any]] = {}
+        self.stages: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self.items: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self.providers: Dict[str, int] = defaultdict(int)
+        self.started_at = time.time()
+        _live_handlers.add(self)
+
+    # --- Árbol de runs ---
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], name: Optional[str]) -> None:
+        with self._lock:
+            self._runs[run_id] = {"name": name or "", "parent": parent_run_id, "started": time.perf_counter()}
+
+    def _owners(self, run_id: Optional[UUID]) -> List[Dict[str, float]]:
+        """Acumuladores de la etapa y el item más cercanos entre los ancestros del run."""
+        stage = item = None
+        while run_id is not None and run_id in self._runs and (stage is None or item is None):
+            name = self._runs[run_id]["name"]
+            if stage is None and name in self.stage_names:
+                stage = self.stages[name]
+            if item is None and name.startswith(ITEM_RUN_PREFIX):
+                item = self.items[name[len(ITEM_RUN_PREFIX):]]
+            run_id = self._runs[run_id]["parent"]
+        return [acc for acc in (stage, item) if acc is not None]
+
+    def _add(self, run_id: Optional[UUID], metric: str, value: float) -> None:
+        with self._lock:
+            for acc in self._owners(run_id):
+                acc[metric] += value
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None:
+                return
+            elapsed = time.perf_counter() - run["started"]
+            name = run["name"]
+            if name in self.stage_names:
+                self.stages[name]["runs"] += 1
+                self.stages[name]["wall_seconds"] += elapsed
+            elif name.startswith(ITEM_RUN_PREFIX):
+                self.items[name[len(ITEM_RUN_PREFIX):]]["wall_seconds"] += elapsed
+            # La misma excepción atraviesa todos los runs padre: se cuenta una sola vez.
+            if error is not None and not getattr(error, "_metrics_counted", False):
+                try:
+                    error._metrics_counted = True
+                except AttributeError:
+                    pass
+                for acc in self._owners(run_id):
+                    acc["errors"] += 1
+            del self._runs[run_id]
+
+    # --- Callbacks de LangChain ---
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, kwargs.get("name") or (serialized or {}).get("name"))
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self._llm_start(serialized, run_id, parent_run_id, kwargs)
+        self._add(run_id, "llm_input_tokens_estimated", estimate_message_tokens(messages))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._llm_start(serialized, run_id, parent_run_id, kwargs)
+
+    def _llm_start(self, serialized, run_id, parent_run_id, kwargs) -> None:
+        provider = kwargs.get("name") or ((serialized or {}).get("id") or ["llm"])[-1]
+        self._start(run_id, parent_run_id, provider)
+        with self._lock:
+            self.providers[provider] += 1
+        self._add(parent_run_id, "llm_calls", 1)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+        self._add(run_id, "llm_input_tokens", input_tokens)
+        self._add(run_id, "llm_output_tokens", output_tokens)
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        provider = kwargs.get("name") or (serialized or {}).get("name") or "tool"
+        self._start(run_id, parent_run_id, provider)
+        with self._lock:
+            self.providers[provider] += 1
+        self._add(parent_run_id, "tool_calls", 1)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    def on_custom_event(self, name, data, *, run_id, **kwargs):
+        if name == METRIC_EVENT:
+            self._add(run_id, data["name"], data.get("value", 1.0))
+
+    # --- Exportación ---
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "wall_seconds": time.time() - self.started_at,
+                "stages": {name: dict(values) for name, values in self.stages.items()},
+                "items": {name: dict(values) for name, values in self.items.items()},
+                "providers": dict(self.providers),
+            }
+
+    def export_jsonl(self, path: str = settings.METRICS_PATH) -> None:
+        """Añade al fichero una línea JSON por etapa, por item y una de resumen de la ejecución."""
+        summary = self.summary()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            for kind in ("stages", "items"):
+                for name, values in summary[kind].items():
+                    f.write(json.dumps({"type": kind[:-1], "name": name, "started_at": self.started_at, **values}, ensure_ascii=False) + "\n")
+            f.write(json.dumps({"type": "run", "started_at": self.started_at, "wall_seconds": summary["wall_seconds"],
+                                "providers": summary["providers"]}, ensure_ascii=False) + "\n")
+
+    def to_prometheus(self, prefix: str = "flow_search") -> str:
+        """Resumen en formato de texto de Prometheus (una serie por etapa y métrica)."""
+        summary = self.summary()
+        lines = []
+        metrics = sorted({metric for values in summary["stages"].values() for metric in values})
+        for metric in metrics:
+            lines.append(f"# TYPE {prefix}_stage_{metric} gauge")
+            for stage, values in summary["stages"].items():
+                if metric in values:
+                    label = stage.replace("\\", "\\\\").replace('"', '\\"')
+                    lines.append(f'{prefix}_stage_{metric}{{stage="{label}"}} {values[metric]:g}')
+        lines.append(f"# TYPE {prefix}_provider_calls counter")
+        for provider, calls in summary["providers"].items():
+            lines.append(f'{prefix}_provider_calls{{provider="{provider}"}} {calls}')
+        lines.append(f"# TYPE {prefix}_items gauge")
+        lines.append(f"{prefix}_items {len(summary['items'])}")
+        return "\n".join(lines) + "\n"
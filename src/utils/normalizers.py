@@ -2,8 +2,9 @@
 import json
 import time
 from typing import List, Dict, Any
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 from langchain_core.runnables import Runnable
-from ..schemas.models import FundingOpportunityList
+from ..schemas.models import FundingOpportunityList, FundingOpportunity
 
 # --- Funciones que no cambian ---
 def flatten_queries(query_list: List[Dict[str, Any]]) -> List[Dict[str, str]]:
@@ -15,6 +16,29 @@ def flatten_queries(query_list: List[Dict[str, Any]]) -> List[Dict[str, str]]:
             flat_list.append({"query": item['national_query']})
     return flat_list
 
+def normalize_url(url: str) -> str:
+    """Normaliza una URL para usarla como clave: esquema/host en minúsculas, sin fragmento ni '/' final y con la query ordenada."""
+    parts = urlsplit((url or "").strip())
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ""))
+
+TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "mc_cid", "mc_eid", "_ga", "_gl", "ref", "ref_src", "igshid", "spm"}
+
+def canonicalize_url(url: str) -> str:
+    """
+    Forma canónica de una URL para detectar duplicados entre fuentes:
+    ignora http/https, 'www.', parámetros de seguimiento (utm_*, gclid...), fragmento y '/' final.
+    """
+    parts = urlsplit((url or "").strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS]
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(("https", host, path, urlencode(sorted(query)), ""))
+
 def combine_results(list_of_lists: List[List[Dict]]) -> List[Dict]:
     combined = []
     for sublist in list_of_lists:
@@ -43,11 +67,14 @@ def normalize_search_results(raw_results: Dict[str, Any]) -> List[Dict[str, str]
         })
     return normalized
 
-def flatten_opportunities(list_of_opportunity_lists: List[FundingOpportunityList]) -> List[dict]:
+def flatten_opportunities(list_of_opportunity_lists: List[FundingOpportunityList | FundingOpportunity]) -> List[dict]:
     final_list = []
     for opportunity_list in list_of_opportunity_lists:
         # Nos aseguramos de que el objeto es del tipo esperado antes de acceder a sus atributos
         if isinstance(opportunity_list, FundingOpportunityList):
             for opportunity in opportunity_list.opportunities:
                 final_list.append(opportunity.dict())
+        # El enriquecimiento devuelve oportunidades individuales
+        elif isinstance(opportunity_list, FundingOpportunity):
+            final_list.append(opportunity_list.dict())
     return final_list
\ No newline at end of file
@@ -0,0 +1,224 @@
+# src/utils/opportunity_store.py
+import os
+import re
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .dedup import content_tokens, normalize_text, opportunity_similarity
+from .normalizers import canonicalize_url
+from ..schemas.models import FundingOpportunity
+from ..config import settings
+
+
+def _url_prefix(opportunity: FundingOpportunity) -> Optional[str]:
+    return "url:" + canonicalize_url(opportunity.opportunity_url) if opportunity.opportunity_url else None
+
+def opportunity_key(opportunity: FundingOpportunity) -> str:
+    """
+    Clave estable de una oportunidad: origen + fecha límite, precedidos de la URL
+    canónica si la tiene. La URL sola no basta: una página de listado suele ser la
+    `opportunity_url` de todas las convocatorias que contiene.
+    """
+    identity = " ".join(sorted(content_tokens(opportunity.origin))) + "|" + (opportunity.application_deadline or "").strip()
+    prefix = _url_prefix(opportunity)
+    return f"{prefix}|{identity}" if prefix else "origin:" + identity
+
+def opportunity_text(opportunity: FundingOpportunity) -> str:
+    return " ".join([
+        opportunity.origin or "", opportunity.description or "", opportunity.financing_type or "",
+        *(opportunity.main_requirements or []),
+    ])
+
+_ISO_DATE_PATTERN = re.compile(r"\b(\d{4})[-/](\d{1,2})[-/](\d{1,2})\b")
+_DATE_FORMATS = ("%d/%m/%Y", "%d-%m-%Y", "%B %d, %Y", "%d %B %Y")
+
+def parse_deadline(deadline: Optional[str]) -> Optional[date]:
+    """Interpreta la fecha límite (el extractor pide YYYY-MM-DD). Devuelve None si no se reconoce."""
+    text = (deadline or "").strip()
+    match = _ISO_DATE_PATTERN.search(text)
+    try:
+        if match:
+            return date(*(int(g) for g in match.groups()))
+    except ValueError:
+        return None
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+class HashedTfidfVectorizer:
+    """
+    TF-IDF con hashing a `dim` dimensiones y vectores normalizados (L2), sobre numpy.
+    Los textos son cortos, así que se usa TF binario (presencia del término).
+    """
+
+    def __init__(self, dim: int = settings.OPPORTUNITY_INDEX_DIM):
+        self.dim = dim
+        self.idf = np.ones(dim, dtype=np.float32)
+
+    def _features(self, text: str) -> List[int]:
+        return list({zlib.crc32(token.encode("utf-8")) % self.dim for token in content_tokens(text)})
+
+    def fit(self, texts: List[str]) -> "HashedTfidfVectorizer":
+        document_frequency = np.zeros(self.dim, dtype=np.float32)
+        for text in texts:
+            document_frequency[self._features(text)] += 1
+        self.idf = (np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(np.float32)
+        return self
+
+    def transform(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            matrix[row, self._features(text)] = 1.0
+        matrix *= self.idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+
+class OpportunityStore:
+    """
+    Almacén persistente (SQLite) de oportunidades ya enriquecidas, con un índice
+    vectorial plano en memoria para buscarlas por similitud con la descripción
+    de un proyecto. Solo se devuelven oportunidades vigentes: con fecha límite
+    futura o, si no tienen fecha legible, actualizadas hace menos de
+    `OPPORTUNITY_STORE_MAX_AGE_DAYS`.
+    """
+
+    def __init__(self, path: str = settings.OPPORTUNITY_STORE_PATH, dim: int = settings.OPPORTUNITY_INDEX_DIM):
+        self.path = path
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._index: Optional[Tuple[HashedTfidfVectorizer, np.ndarray, List[FundingOpportunity]]] = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS opportunities (
+                    opportunity_key TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    deadline TEXT,
+                    updated_at REAL NOT NULL
+                );
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def upsert(self, opportunities: List[FundingOpportunity], threshold: float = 0.6) -> int:
+        """
+        Inserta o actualiza las oportunidades e invalida el índice en memoria.
+        Una versión guardada de la misma convocatoria (misma URL y parecida según
+        `opportunity_similarity`) se reemplaza aunque su clave haya cambiado, p. ej.
+        porque el origen se redactó de otra forma en la nueva extracción.
+        """
+        if not opportunities:
+            return 0
+        now = time.time()
+        rows = [(opportunity_key(o), json.dumps(o.model_dump(mode="json"), ensure_ascii=False),
+                 o.application_deadline, now) for o in opportunities]
+        with self._lock, self._connect() as conn:
+            stale = set()
+            for opportunity, (key, *_) in zip(opportunities, rows):
+                prefix = _url_prefix(opportunity)
+                if prefix is None:
+                    continue
+                # Incluye la clave antigua, que era solo la URL.
+                for stored_key, payload in conn.execute(
+                    "SELECT opportunity_key, payload FROM opportunities WHERE opportunity_key = ? OR substr(opportunity_key, 1, ?) = ?",
+                    (prefix, len(prefix) + 1, prefix + "|"),
+                ):
+                    stored = FundingOpportunity(**json.loads(payload))
+                    if stored_key != key and opportunity_similarity(stored, opportunity) >= threshold:
+                        stale.add(stored_key)
+            stale -= {row[0] for row in rows}
+            conn.executemany("DELETE FROM opportunities WHERE opportunity_key = ?", [(k,) for k in stale])
+            conn.executemany("INSERT OR REPLACE INTO opportunities (opportunity_key, payload, deadline, updated_at) VALUES (?, ?, ?, ?)", rows)
+            self._index = None
+        return len(rows)
+
+    def delete(self, keys: List[str]) -> int:
+        """Elimina las oportunidades con esas claves (p. ej. si su URL cambió al re-enriquecerlas)."""
+        with self._lock, self._connect() as conn:
+            conn.executemany("DELETE FROM opportunities WHERE opportunity_key = ?", [(k,) for k in keys])
+            self._index = None
+        return len(keys)
+
+    def all(self) -> List[FundingOpportunity]:
+        """Todas las oportunidades vigentes del almacén."""
+        return list(self._get_index()[2])
+
+    def purge_expired(self) -> int:
+        """Elimina las oportunidades que ya no están vigentes."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT opportunity_key, deadline, updated_at FROM opportunities").fetchall()
+        expired = [(key,) for key, deadline, updated_at in rows if not self._is_valid(deadline, updated_at)]
+        with self._lock, self._connect() as conn:
+            conn.executemany("DELETE FROM opportunities WHERE opportunity_key = ?", expired)
+            self._index = None
+        return len(expired)
+
+    @staticmethod
+    def _is_valid(deadline: Optional[str], updated_at: float) -> bool:
+        parsed = parse_deadline(deadline)
+        if parsed is not None:
+            return parsed >= date.today()
+        return time.time() - updated_at < settings.OPPORTUNITY_STORE_MAX_AGE_DAYS * 86400
+
+    def _get_index(self):
+        with self._lock:
+            if self._index is None:
+                with self._connect() as conn:
+                    rows = conn.execute("SELECT payload, deadline, updated_at FROM opportunities").fetchall()
+                rows = [r for r in rows if self._is_valid(r[1], r[2])]
+                opportunities = [FundingOpportunity(**json.loads(r[0])) for r in rows]
+                texts = [opportunity_text(o) for o in opportunities]
+                vectorizer = HashedTfidfVectorizer(self.dim).fit(texts)
+                matrix = vectorizer.transform(texts) if texts else np.zeros((0, self.dim), dtype=np.float32)
+                self._index = (vectorizer, matrix, opportunities)
+            return self._index
+
+    def search(self, text: str, top_k: int = settings.OPPORTUNITY_STORE_TOP_K,
+               min_score: float = settings.OPPORTUNITY_STORE_MIN_SCORE) -> List[Tuple[FundingOpportunity, float]]:
+        """Devuelve las oportunidades vigentes más parecidas al texto, con su similitud coseno."""
+        vectorizer, matrix, opportunities = self._get_index()
+        if not opportunities or not normalize_text(text).strip():
+            return []
+        scores = matrix @ vectorizer.transform([text])[0]
+        best = np.argsort(-scores)[:top_k]
+        return [(opportunities[i], float(scores[i])) for i in best if scores[i] >= min_score]
+
+    def count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM opportunities").fetchone()[0]
+
+
+_opportunity_store: Optional[OpportunityStore] = None
+_opportunity_store_lock = threading.Lock()
+
+def get_opportunity_store() -> OpportunityStore:
+    """Devuelve la instancia compartida del almacén de oportunidades."""
+    global _opportunity_store
+    with _opportunity_store_lock:
+        if _opportunity_store is None:
+            _opportunity_store = OpportunityStore()
+        return _opportunity_store
+
+def recall_known_opportunities(project_input: Dict) -> List[FundingOpportunity]:
+    """Busca en el almacén local las oportunidades vigentes que encajan con el proyecto."""
+    if not settings.OPPORTUNITY_STORE_ENABLED:
+        return []
+    hits = get_opportunity_store().search(project_input.get("project_details", ""))
+    print(f"\n[Opportunity Store] {len(hits)} oportunidades conocidas y vigentes para este proyecto.")
+    for opportunity, score in hits:
+        print(f"  -> 📚 {opportunity.origin} (similitud {score:.2f})")
+    return [opportunity for opportunity, _ in hits]
@@ -0,0 +1,140 @@
+# src/utils/page_cache.py
+import os
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from ..config import settings
+from .normalizers import normalize_url
+
+
+@dataclass
+class CachedPage:
+    url: str
+    body: bytes
+    content_type: Optional[str]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_hash: str
+    fetched_at: float
+    # Bytes descargados para obtener esta copia (0 si salió de la caché).
+    network_bytes: int = 0
+
+    def is_fresh(self, max_age: float) -> bool:
+        return time.time() - self.fetched_at < max_age
+
+
+class PageCache:
+    """
+    Caché en disco (SQLite) de páginas descargadas, indexada por URL normalizada.
+
+    Los cuerpos se guardan comprimidos y direccionados por su hash, así que dos URLs
+    con el mismo contenido comparten almacenamiento. Guarda ETag/Last-Modified para
+    revalidar con peticiones condicionales y expulsa entradas por TTL y por LRU
+    cuando el tamaño total supera `max_bytes`.
+    """
+
+    def __init__(self, path: str = settings.PAGE_CACHE_PATH, ttl_seconds: int = settings.PAGE_CACHE_TTL_SECONDS,
+                 max_bytes: int = settings.PAGE_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS bodies (
+                    content_hash TEXT PRIMARY KEY,
+                    body BLOB NOT NULL,
+                    size INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS pages (
+                    url_key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    content_type TEXT,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_pages_accessed ON pages(accessed_at);
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        """Devuelve la página cacheada (aunque esté caducada, para poder revalidarla) o None."""
+        with self._connect() as conn:
+            row = conn.execute("""
+                SELECT p.url, b.body, p.content_type, p.etag, p.last_modified, p.content_hash, p.fetched_at
+                FROM pages p JOIN bodies b ON b.content_hash = p.content_hash
+                WHERE p.url_key = ?
+            """, (normalize_url(url),)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE pages SET accessed_at = ? WHERE url_key = ?", (time.time(), normalize_url(url)))
+        return CachedPage(row[0], zlib.decompress(row[1]), *row[2:])
+
+    def put(self, url: str, body: bytes, content_type: Optional[str] = None,
+            etag: Optional[str] = None, last_modified: Optional[str] = None) -> str:
+        """Guarda (o reemplaza) una página. Devuelve el hash de su contenido."""
+        content_hash = hashlib.sha256(body).hexdigest()
+        now = time.time()
+        compressed = zlib.compress(body, 6)
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR IGNORE INTO bodies (content_hash, body, size) VALUES (?, ?, ?)",
+                         (content_hash, compressed, len(compressed)))
+            conn.execute("""
+                INSERT OR REPLACE INTO pages (url_key, url, content_hash, content_type, etag, last_modified, fetched_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (normalize_url(url), url, content_hash, content_type, etag, last_modified, now, now))
+            self._evict(conn)
+        return content_hash
+
+    def touch(self, url: str) -> None:
+        """Marca una página como revalidada (respuesta 304) sin reescribir su cuerpo."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE url_key = ?", (now, now, normalize_url(url)))
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        # 1) TTL: fuera lo que no se ha usado en mucho tiempo.
+        conn.execute("DELETE FROM pages WHERE accessed_at < ?", (time.time() - self.ttl_seconds,))
+        # 2) LRU: mientras superemos el tamaño máximo, eliminamos las menos usadas.
+        # Un cuerpo compartido por varias URLs solo libera espacio al borrar la última.
+        total = conn.execute("""
+            SELECT COALESCE(SUM(size), 0) FROM bodies WHERE content_hash IN (SELECT content_hash FROM pages)
+        """).fetchone()[0]
+        if total > self.max_bytes:
+            references = dict(conn.execute("SELECT content_hash, COUNT(*) FROM pages GROUP BY content_hash").fetchall())
+            rows = conn.execute("""
+                SELECT p.url_key, p.content_hash, b.size FROM pages p JOIN bodies b ON b.content_hash = p.content_hash
+                ORDER BY p.accessed_at ASC
+            """).fetchall()
+            for url_key, content_hash, size in rows:
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM pages WHERE url_key = ?", (url_key,))
+                references[content_hash] -= 1
+                if references[content_hash] == 0:
+                    total -= size
+        conn.execute("DELETE FROM bodies WHERE content_hash NOT IN (SELECT content_hash FROM pages)")
+
+
+_page_cache: Optional[PageCache] = None
+_page_cache_lock = threading.Lock()
+
+def get_page_cache() -> PageCache:
+    """Devuelve la instancia compartida de la caché de páginas."""
+    global _page_cache
+    with _page_cache_lock:
+        if _page_cache is None:
+            _page_cache = PageCache()
+        return _page_cache
@@ -0,0 +1,237 @@
+# src/utils/prompt_budget.py
+import json
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Type
+from uuid import UUID
+
+from pydantic import BaseModel
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from ..config import settings
+from .content_reducer import reduce_text
+
+
+class PromptBudgetError(ValueError):
+    """El prompt supera el techo de tokens de su cadena y no tiene campos que se puedan recortar."""
+
+
+# --- Conteo de tokens antes de la llamada ---
+
+def estimate_tokens(*texts: str) -> int:
+    """Estimación barata de tokens (~4 caracteres por token)."""
+    return sum(len(t or "") for t in texts) // 4 + 1
+
+def estimate_message_tokens(messages: Iterable[Any]) -> int:
+    """Tokens estimados de una lista de mensajes (o de listas de mensajes, como en los callbacks)."""
+    texts = []
+    for message in messages:
+        if isinstance(message, BaseMessage):
+            texts.append(str(message.content))
+        else:
+            texts.extend(str(m.content) for m in message)
+    return estimate_tokens(*texts)
+
+
+# --- Serialización compacta ---
+
+def compact_json(record: Dict[str, Any], exclude: Sequence[str] = ()) -> str:
+    """
+    JSON de una línea sin espacios superfluos ni campos vacíos (None, "", []):
+    la misma información en bastantes menos tokens que `str(dict)` o `json.dumps(indent=...)`.
+    """
+    compact = {k: v for k, v in record.items() if k not in exclude and v not in (None, "", [], {})}
+    return json.dumps(compact, ensure_ascii=False, separators=(",", ":"))
+
+_TYPE_NAMES = {"string": "texto", "integer": "entero", "number": "número", "boolean": "true/false"}
+
+def compact_schema(model: Type[BaseModel]) -> str:
+    """
+    Instrucciones de formato compactas para `model`: la forma del JSON en una
+    línea (los campos opcionales llevan `?`) y la descripción de cada campo.
+    Sustituyen a las de `JsonOutputParser`, que repiten un ejemplo genérico y
+    el JSON schema completo en cada llamada.
+    """
+    schema = model.model_json_schema()
+    definitions = schema.get("$defs", {})
+    descriptions: Dict[str, str] = {}
+
+    def render(node: Dict) -> str:
+        if "$ref" in node:
+            return render(definitions[node["$ref"].rsplit("/", 1)[-1]])
+        if "anyOf" in node:
+            return " | ".join(render(option) for option in node["anyOf"] if option.get("type") != "null")
+        kind = node.get("type")
+        if kind == "array":
+            return f"[{render(node.get('items', {}))}, ...]"
+        if kind == "object":
+            required = set(node.get("required", []))
+            fields = []
+            for name, prop in node.get("properties", {}).items():
+                if prop.get("description"):
+                    descriptions.setdefault(name, prop["description"])
+                fields.append(f'"{name}"{"" if name in required else "?"}: {render(prop)}')
+            return "{" + ", ".join(fields) + "}"
+        return _TYPE_NAMES.get(kind, kind or "valor")
+
+    shape = render(schema)
+    legend = "\n".join(f"- {name}: {description}" for name, description in descriptions.items())
+    return f"Responde ÚNICAMENTE con un JSON válido con esta forma:\n{shape}\nCampos:\n{legend}"
+
+
+# --- Recorte al techo de tokens de cada cadena ---
+
+def truncate_to_tokens(text: str, max_tokens: int, query: str = "") -> str:
+    """Reduce `text` a ~`max_tokens` conservando las secciones más relevantes (y su orden)."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return reduce_text(text, max_tokens, query)
+
+def fit_prompt_inputs(
+    prompt: ChatPromptTemplate,
+    inputs: Dict[str, Any],
+    max_input_tokens: int,
+    compressible: Sequence[str] = (),
+    chain_name: str = "",
+    query: str = "",
+) -> Dict[str, Any]:
+    """
+    Devuelve `inputs` tal cual si el prompt renderizado cabe en `max_input_tokens`;
+    si no, recorta los campos `compressible` de forma proporcional a su tamaño.
+    El techo se corrige con la relación real/estimado observada para la cadena.
+    """
+    if not max_input_tokens:
+        return inputs
+    stats = get_prompt_token_stats()
+    limit = int(max_input_tokens / stats.calibration(chain_name))
+    total = estimate_message_tokens(prompt.format_messages(**inputs))
+    if total <= limit:
+        return inputs
+    if not compressible:
+        raise PromptBudgetError(f"El prompt de '{chain_name}' ocupa ~{total} tokens (límite {max_input_tokens}).")
+
+    fixed = estimate_message_tokens(prompt.format_messages(**{**inputs, **{f: "" for f in compressible}}))
+    sizes = {f: estimate_tokens(str(inputs.get(f) or "")) for f in compressible}
+    scale = max(limit - fixed, 0) / max(sum(sizes.values()), 1)
+    fitted = dict(inputs)
+    for field in compressible:
+        fitted[field] = truncate_to_tokens(str(inputs.get(field) or ""), int(sizes[field] * scale), query)
+    stats.record_trim(chain_name)
+    print(f"    ✂️ Prompt de '{chain_name}' recortado: ~{total} -> ~{limit} tokens.")
+    return fitted
+
+def with_prompt_budget(
+    prompt: ChatPromptTemplate,
+    chain_name: str,
+    max_input_tokens: int,
+    compressible: Sequence[str] = (),
+    query: Optional[Callable[[Dict[str, Any]], str]] = None,
+) -> Runnable:
+    """
+    Antepone al prompt el ajuste a su techo de tokens (ver `fit_prompt_inputs`).
+    `query(inputs)` guía qué secciones de los campos recortados se conservan.
+    """
+    def fit(inputs: Dict[str, Any]) -> Dict[str, Any]:
+        return fit_prompt_inputs(prompt, inputs, max_input_tokens, compressible, chain_name, query(inputs) if query else "")
+
+    return RunnableLambda(fit, name=f"{chain_name} (prompt budget)") | prompt
+
+
+# --- Tokens estimados frente a reales ---
+
+class PromptTokenStats:
+    """
+    Contadores por cadena de llamadas, tokens de entrada estimados antes de la
+    llamada y tokens reales informados por el modelo (`usage_metadata`).
+    La relación real/estimado calibra los techos de `fit_prompt_inputs`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.chains: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"calls": 0, "estimated": 0, "actual": 0, "output": 0, "trimmed": 0}
+        )
+
+    def record_call(self, chain_name: str, estimated: int, actual: int, output: int) -> None:
+        with self._lock:
+            counts = self.chains[chain_name]
+            counts["calls"] += 1
+            counts["estimated"] += estimated
+            counts["actual"] += actual
+            counts["output"] += output
+
+    def record_trim(self, chain_name: str) -> None:
+        with self._lock:
+            self.chains[chain_name]["trimmed"] += 1
+
+    def calibration(self, chain_name: str) -> float:
+        """Tokens reales por token estimado (1.0 hasta tener suficientes llamadas)."""
+        with self._lock:
+            counts = self.chains.get(chain_name)
+            if not counts or counts["calls"] < settings.PROMPT_CALIBRATION_MIN_CALLS or not counts["actual"]:
+                return 1.0
+            return counts["actual"] / max(counts["estimated"], 1)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                name: {**counts, "input_per_call": round(counts["actual"] / counts["calls"], 1) if counts["calls"] else 0,
+                       "actual_vs_estimated": round(counts["actual"] / max(counts["estimated"], 1), 3)}
+                for name, counts in self.chains.items()
+            }
+
+    def report(self) -> str:
+        lines = [f"{'cadena':<20}{'llamadas':>9}{'estimados':>11}{'reales':>9}{'real/est':>9}{'recortes':>9}"]
+        for name, s in sorted(self.summary().items()):
+            lines.append(f"{name:<20}{s['calls']:>9}{s['estimated']:>11}{s['actual']:>9}"
+                         f"{s['actual_vs_estimated']:>9.2f}{s['trimmed']:>9}")
+        return "\n".join(lines)
+
+
+_prompt_token_stats: Optional[PromptTokenStats] = None
+_prompt_token_stats_lock = threading.Lock()
+
+def get_prompt_token_stats() -> PromptTokenStats:
+    """Devuelve la instancia compartida de los contadores de tokens por cadena."""
+    global _prompt_token_stats
+    with _prompt_token_stats_lock:
+        if _prompt_token_stats is None:
+            _prompt_token_stats = PromptTokenStats()
+        return _prompt_token_stats
+
+
+class _TokenAccountingHandler(BaseCallbackHandler):
+    """Empareja, por run, los tokens estimados del prompt con el uso real que devuelve el modelo."""
+
+    def __init__(self, chain_name: str):
+        self.chain_name = chain_name
+        self._lock = threading.Lock()
+        self._pending: Dict[UUID, int] = {}
+
+    def on_chat_model_start(self, serialized, messages: List[List[BaseMessage]], *, run_id, **kwargs):
+        with self._lock:
+            self._pending[run_id] = estimate_message_tokens(messages)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            estimated = self._pending.pop(run_id, None)
+        if estimated is None:
+            return
+        actual = output = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                actual += usage.get("input_tokens", 0)
+                output += usage.get("output_tokens", 0)
+        get_prompt_token_stats().record_call(self.chain_name, estimated, actual, output)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._pending.pop(run_id, None)
+
+def with_token_accounting(llm_step: Runnable, chain_name: str) -> Runnable:
+    """Registra en `PromptTokenStats` los tokens estimados y reales de cada llamada de `llm_step`."""
+    return llm_step.with_config(callbacks=[_TokenAccountingHandler(chain_name)])
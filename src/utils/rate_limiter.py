@@ -0,0 +1,240 @@
+# src/utils/rate_limiter.py
+import re
+import time
+import asyncio
+import threading
+from typing import Optional
+
+from ..config import settings
+from .metrics import arecord_metric
+from .budget import get_current_budget, track_llm_call
+
+
+class TokenBucketRateLimiter:
+    """
+    Limitador de doble cubeta (peticiones por minuto y tokens por minuto).
+
+    Cada llamada "reserva" su hueco de forma atómica y recibe el tiempo que debe
+    esperar, así que el mismo limitador sirve tanto para código async como para
+    hilos. Ante un 429 la tasa efectiva se reduce a la mitad y se recupera poco a
+    poco con cada llamada exitosa.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: Optional[int] = None,
+                 burst: Optional[int] = None, min_rate_scale: float = 0.1, recovery_step: float = 0.05):
+        self.requests_per_minute = requests_per_minute
+        # La ráfaga máxima se mantiene pequeña para no superar la cuota en ventanas de 60s.
+        self.burst = burst or max(1, requests_per_minute // 4)
+        self.tokens_per_minute = tokens_per_minute
+        self.min_rate_scale = min_rate_scale
+        self.recovery_step = recovery_step
+
+        self._lock = threading.Lock()
+        self._rate_scale = 1.0
+        self._blocked_until = 0.0
+        self._last_refill = time.monotonic()
+        # Empezamos con la cubeta llena para permitir una ráfaga inicial acotada.
+        self._request_level = float(self.burst)
+        self._token_level = float(tokens_per_minute or 0)
+
+    # --- Lógica interna de la cubeta ---
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._request_level = min(
+            float(self.burst),
+            self._request_level + elapsed * self.requests_per_minute / 60.0 * self._rate_scale
+        )
+        if self.tokens_per_minute:
+            self._token_level = min(
+                float(self.tokens_per_minute),
+                self._token_level + elapsed * self.tokens_per_minute / 60.0 * self._rate_scale
+            )
+
+    def reserve(self, tokens: int = 0) -> float:
+        """Reserva un hueco para una llamada y devuelve los segundos que hay que esperar."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._request_level -= 1
+            delay = 0.0
+            if self._request_level < 0:
+                delay = -self._request_level / (self.requests_per_minute / 60.0 * self._rate_scale)
+            if self.tokens_per_minute and tokens:
+                # Una petición mayor que la cubeta entera nunca cabría; la acotamos.
+                self._token_level -= min(tokens, self.tokens_per_minute)
+                if self._token_level < 0:
+                    token_delay = -self._token_level / (self.tokens_per_minute / 60.0 * self._rate_scale)
+                    delay = max(delay, token_delay)
+            return max(delay, self._blocked_until - now)
+
+    def estimated_delay(self) -> float:
+        """Segundos que esperaría ahora una petición, sin reservar su hueco."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            delay = 0.0
+            if self._request_level < 1:
+                delay = (1 - self._request_level) / (self.requests_per_minute / 60.0 * self._rate_scale)
+            return max(delay, self._blocked_until - now)
+
+    async def acquire(self, tokens: int = 0) -> float:
+        """Espera (sin bloquear el event loop) hasta que haya cupo. Devuelve el tiempo esperado."""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def acquire_sync(self, tokens: int = 0) -> float:
+        """Versión bloqueante de `acquire` para código basado en hilos."""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    # --- Adaptación de la tasa ---
+
+    def on_rate_limited(self, retry_after: Optional[float] = None) -> None:
+        """Registra un 429: reduce la tasa y bloquea el cupo durante `retry_after` segundos."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._rate_scale = max(self.min_rate_scale, self._rate_scale * 0.5)
+            pause = retry_after if retry_after is not None else 60.0 / self.requests_per_minute
+            self._blocked_until = max(self._blocked_until, now + pause)
+            # Vaciamos la cubeta para no disparar otra ráfaga al terminar la pausa.
+            self._request_level = min(self._request_level, 0.0)
+
+    def on_success(self) -> None:
+        """Recupera la tasa configurada de forma gradual tras cada llamada exitosa."""
+        with self._lock:
+            if self._rate_scale < 1.0:
+                self._refill(time.monotonic())
+                self._rate_scale = min(1.0, self._rate_scale + self.recovery_step)
+
+    @property
+    def rate_scale(self) -> float:
+        return self._rate_scale
+
+
+# --- Detección de errores de cuota ---
+
+_RETRY_AFTER_PATTERNS = [
+    re.compile(r"retry[_ ]delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE),
+    re.compile(r"retry (?:in|after) (\d+(?:\.\d+)?)\s*s", re.IGNORECASE),
+]
+
+_RATE_LIMIT_TYPES = {"ResourceExhausted", "TooManyRequests", "RateLimitError"}
+# Sin código de estado, solo el texto de un error de cuota cuenta (un "429" suelto no:
+# puede ser parte de una URL, un id o un número de tokens).
+_RATE_LIMIT_TEXT = re.compile(r"resource[_ ]exhausted|too many requests|rate[_ ]limit(?:ed)?\b|quota exceeded", re.IGNORECASE)
+
+def _status_code(error: BaseException) -> Optional[int]:
+    for value in (getattr(error, "status_code", None), getattr(error, "code", None),
+                  getattr(getattr(error, "response", None), "status_code", None)):
+        if isinstance(value, int):
+            return value
+    return None
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """
+    Devuelve True si la excepción corresponde a un 429 / cuota agotada. Se mira
+    primero el código de estado y el tipo de la excepción (y los de su causa,
+    p. ej. el error de la API que envuelve LangChain); el texto del mensaje solo
+    se usa si ninguno de los dos lo decide.
+    """
+    seen = set()
+    current: Optional[BaseException] = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        status = _status_code(current)
+        if status is not None:
+            return status == 429
+        if type(current).__name__ in _RATE_LIMIT_TYPES:
+            return True
+        current = current.__cause__ or current.__context__
+    return bool(_RATE_LIMIT_TEXT.search(str(error)))
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Extrae el tiempo de espera sugerido por el proveedor (cabecera Retry-After o mensaje)."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    for pattern in _RETRY_AFTER_PATTERNS:
+        match = pattern.search(str(error))
+        if match:
+            return float(match.group(1))
+    return None
+
+
+# --- Invocación de cadenas respetando la cuota ---
+
+async def ainvoke_rate_limited(chain, payload, rate_limiter: TokenBucketRateLimiter, tokens: int = 0,
+                               max_attempts: int = 3, label: str = "", config: Optional[dict] = None):
+    """
+    Invoca una cadena de forma asíncrona esperando turno en el limitador.
+    Los 429 adaptan la tasa y se reintentan; cualquier otro error se propaga.
+
+    El turno no se pide de antemano: la caché de respuestas (`with_response_cache`)
+    lo pide con `take_llm_turn` solo cuando falla, justo antes de llamar al LLM,
+    así que un acierto no consume cuota ni espera. En ese momento el intento se
+    cobra del presupuesto de la ejecución en curso (ver `RunBudget`), que lanza
+    `BudgetExceededError` si ya no cabe. Una cadena que no pasa por la caché
+    reserva su hueco al terminar, para que las siguientes respeten la cuota.
+    Devuelve `(salida, latencia_en_segundos, segundos_de_espera)`.
+    """
+    budget = get_current_budget()
+    waited = 0.0
+    for attempt in range(1, max_attempts + 1):
+        if budget is not None:
+            budget.check()
+        attempt_wait = 0.0
+
+        async def take_turn() -> None:
+            nonlocal attempt_wait
+            attempt_wait = await rate_limiter.acquire(tokens)
+            await arecord_metric("rate_limit_wait_seconds", attempt_wait, config)
+            if budget is not None:
+                budget.charge(tokens)
+
+        started = time.perf_counter()
+        try:
+            with track_llm_call(take_turn) as call:
+                output = await chain.ainvoke(payload, config=config)
+            if not call.turn_taken and not call.served_from_cache:
+                await take_turn()
+            waited += attempt_wait
+            if not call.served_from_cache:
+                rate_limiter.on_success()
+            return output, time.perf_counter() - started - attempt_wait, waited
+        except Exception as e:
+            waited += attempt_wait
+            if not is_rate_limit_error(e) or attempt == max_attempts:
+                raise
+            retry_after = get_retry_after(e)
+            print(f"    ⏳ Cuota agotada en '{label}', reintentando (Retry-After: {retry_after}).")
+            await arecord_metric("rate_limited", 1, config)
+            rate_limiter.on_rate_limited(retry_after)
+
+
+# --- Limitador compartido para todas las llamadas a Gemini ---
+
+_gemini_rate_limiter: Optional[TokenBucketRateLimiter] = None
+_gemini_rate_limiter_lock = threading.Lock()
+
+def get_gemini_rate_limiter() -> TokenBucketRateLimiter:
+    """Devuelve la instancia única del limitador configurada desde `settings`."""
+    global _gemini_rate_limiter
+    with _gemini_rate_limiter_lock:
+        if _gemini_rate_limiter is None:
+            _gemini_rate_limiter = TokenBucketRateLimiter(
+                requests_per_minute=settings.GEMINI_RPM_LIMIT,
+                tokens_per_minute=settings.GEMINI_TPM_LIMIT,
+            )
+        return _gemini_rate_limiter
@@ -0,0 +1,491 @@
+# src/utils/task_queue.py
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+from ..config import settings
+from .budget import BudgetExceededError, get_current_budget
+from .prompt_budget import estimate_tokens
+
+
+@dataclass
+class Task:
+    stage: str
+    key: str
+    payload: Any
+    attempts: int
+    lease_id: str
+
+
+@dataclass
+class TaskOutcome:
+    """Estado final de un item: `done` con su resultado o `dead` con el último error."""
+    status: str
+    result: Any = None
+    error: Optional[str] = None
+
+
+@contextmanager
+def _immediate_transaction(path: str) -> Iterator[sqlite3.Connection]:
+    """
+    Transacción `BEGIN IMMEDIATE`: toma el bloqueo de escritura al empezar, entre procesos.
+    Si el propio BEGIN falla (p. ej. "database is locked") no hay nada que deshacer
+    y su error se propaga tal cual.
+    """
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+def task_key(*parts: Any) -> str:
+    """Clave idempotente de un item: el mismo contenido produce siempre la misma clave."""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+# --- Interfaz de la cola ---
+
+class TaskQueue(ABC):
+    """
+    Cola de trabajo compartida entre procesos o hosts. Un backend tipo Redis solo
+    tiene que implementar estos métodos (y registrarse con `register_task_queue_backend`).
+
+    - Claves idempotentes: encolar una clave ya pendiente o resuelta no la duplica.
+    - Arrendamientos con tiempo de visibilidad: un item arrendado es invisible para
+      los demás workers hasta que se confirme, falle o caduque el arrendamiento
+      (p. ej. porque su worker murió), y entonces vuelve a la cola.
+    - Reintentos con espera y, agotados los intentos, cola de fallidos (`dead`).
+    """
+
+    @abstractmethod
+    def enqueue(self, stage: str, items: Sequence[Tuple[str, Any]]) -> int:
+        """Encola pares `(clave, payload)` en orden (el orden es la prioridad). Devuelve cuántos se encolaron."""
+
+    @abstractmethod
+    def lease(self, stages: Sequence[str], worker_id: str,
+              visibility_timeout: float = settings.TASK_QUEUE_VISIBILITY_TIMEOUT,
+              max_attempts: int = settings.TASK_QUEUE_MAX_ATTEMPTS) -> Optional[Task]:
+        """
+        Arrienda el siguiente item visible de alguna de las etapas, o None si no hay.
+        Los items cuyo arrendamiento caducó ya `max_attempts` veces pasan a fallidos.
+        """
+
+    @abstractmethod
+    def extend(self, task: Task, visibility_timeout: float = settings.TASK_QUEUE_VISIBILITY_TIMEOUT) -> bool:
+        """Renueva el arrendamiento. False si ya se perdió (caducó y lo tomó otro worker)."""
+
+    @abstractmethod
+    def complete(self, task: Task, result: Any) -> None:
+        """Guarda el resultado del item."""
+
+    @abstractmethod
+    def fail(self, task: Task, error: str, max_attempts: int = settings.TASK_QUEUE_MAX_ATTEMPTS) -> bool:
+        """Devuelve el item a la cola con espera, o lo manda a fallidos. True si quedó en fallidos."""
+
+    @abstractmethod
+    def outcomes(self, stage: str, keys: Sequence[str]) -> Dict[str, TaskOutcome]:
+        """Resultados de las claves ya resueltas (`done` o `dead`); las pendientes no aparecen."""
+
+    @abstractmethod
+    def cancel(self, stage: str, keys: Sequence[str]) -> int:
+        """Retira de la cola las claves aún pendientes (las arrendadas terminan). Devuelve cuántas se retiraron."""
+
+    @abstractmethod
+    def requeue_dead(self, stage: Optional[str] = None) -> int:
+        """Vuelve a encolar los items fallidos (todos o los de una etapa)."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Número de items por etapa y estado."""
+
+
+class SQLiteTaskQueue(TaskQueue):
+    """
+    Backend por defecto: un fichero SQLite (WAL) que comparten todos los procesos
+    del host, o de varios hosts si está en un disco compartido. Las operaciones
+    que arriendan o cambian de estado un item van en transacciones `IMMEDIATE`,
+    así que dos workers nunca arriendan el mismo item.
+    """
+
+    def __init__(self, path: str = settings.TASK_QUEUE_PATH,
+                 result_ttl_seconds: int = settings.TASK_QUEUE_RESULT_TTL_SECONDS,
+                 retry_backoff_seconds: float = settings.TASK_QUEUE_RETRY_BACKOFF_SECONDS):
+        self.path = path
+        self.result_ttl_seconds = result_ttl_seconds
+        self.retry_backoff_seconds = retry_backoff_seconds
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS tasks (
+                    stage TEXT NOT NULL,
+                    item_key TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    priority REAL NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    available_at REAL NOT NULL,
+                    lease_id TEXT,
+                    lease_owner TEXT,
+                    result TEXT,
+                    error TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (stage, item_key)
+                );
+                CREATE INDEX IF NOT EXISTS idx_tasks_visible ON tasks(stage, status, available_at, priority);
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _transaction(self):
+        return _immediate_transaction(self.path)
+
+    def enqueue(self, stage: str, items: Sequence[Tuple[str, Any]]) -> int:
+        now = time.time()
+        stale_before = now - self.result_ttl_seconds
+        enqueued = 0
+        with self._transaction() as conn:
+            for position, (key, payload) in enumerate(items):
+                # La prioridad respeta el orden dentro de la llamada y, entre llamadas, el de llegada.
+                priority = now + position * 1e-6
+                row = conn.execute("SELECT status, updated_at FROM tasks WHERE stage = ? AND item_key = ?",
+                                   (stage, key)).fetchone()
+                if row is not None and (row[0] in ("pending", "leased") or row[1] >= stale_before):
+                    continue
+                conn.execute("""
+                    INSERT OR REPLACE INTO tasks (stage, item_key, payload, status, priority, attempts, available_at, updated_at)
+                    VALUES (?, ?, ?, 'pending', ?, 0, ?, ?)
+                """, (stage, key, json.dumps(payload, ensure_ascii=False), priority, now, now))
+                enqueued += 1
+        return enqueued
+
+    def lease(self, stages: Sequence[str], worker_id: str,
+              visibility_timeout: float = settings.TASK_QUEUE_VISIBILITY_TIMEOUT,
+              max_attempts: int = settings.TASK_QUEUE_MAX_ATTEMPTS) -> Optional[Task]:
+        now = time.time()
+        marks = ",".join("?" * len(stages))
+        with self._transaction() as conn:
+            while True:
+                # Un arrendamiento caducado (worker caído o colgado) vuelve a ser visible.
+                row = conn.execute(f"""
+                    SELECT stage, item_key, payload, attempts, status FROM tasks
+                    WHERE stage IN ({marks}) AND status IN ('pending', 'leased') AND available_at <= ?
+                    ORDER BY priority LIMIT 1
+                """, (*stages, now)).fetchone()
+                if row is None:
+                    return None
+                stage, key, payload, attempts, status = row
+                if status == "pending" or attempts < max_attempts:
+                    break
+                # Un item que agota sus intentos tumbando workers va a fallidos.
+                conn.execute("UPDATE tasks SET status = 'dead', error = ?, lease_id = NULL, updated_at = ? "
+                             "WHERE stage = ? AND item_key = ?",
+                             ("Arrendamiento caducado sin confirmar", now, stage, key))
+            lease_id = f"{worker_id}:{time.monotonic_ns()}"
+            conn.execute("""
+                UPDATE tasks SET status = 'leased', attempts = attempts + 1, available_at = ?,
+                                 lease_id = ?, lease_owner = ?, updated_at = ?
+                WHERE stage = ? AND item_key = ?
+            """, (now + visibility_timeout, lease_id, worker_id, now, stage, key))
+        return Task(stage=stage, key=key, payload=json.loads(payload), attempts=attempts + 1, lease_id=lease_id)
+
+    def extend(self, task: Task, visibility_timeout: float = settings.TASK_QUEUE_VISIBILITY_TIMEOUT) -> bool:
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET available_at = ? WHERE stage = ? AND item_key = ? AND lease_id = ? AND status = 'leased'",
+                (time.time() + visibility_timeout, task.stage, task.key, task.lease_id))
+        return cursor.rowcount > 0
+
+    def complete(self, task: Task, result: Any) -> None:
+        # Aunque el arrendamiento haya caducado, el resultado es válido: el item es idempotente.
+        with self._transaction() as conn:
+            conn.execute("""
+                UPDATE tasks SET status = 'done', result = ?, error = NULL, lease_id = NULL, updated_at = ?
+                WHERE stage = ? AND item_key = ? AND status != 'done'
+            """, (json.dumps(result, ensure_ascii=False), time.time(), task.stage, task.key))
+
+    def fail(self, task: Task, error: str, max_attempts: int = settings.TASK_QUEUE_MAX_ATTEMPTS) -> bool:
+        now = time.time()
+        dead = task.attempts >= max_attempts
+        with self._transaction() as conn:
+            conn.execute("""
+                UPDATE tasks SET status = ?, error = ?, available_at = ?, lease_id = NULL, updated_at = ?
+                WHERE stage = ? AND item_key = ? AND lease_id = ?
+            """, ("dead" if dead else "pending", error[:2000],
+                  now + self.retry_backoff_seconds * 2 ** (task.attempts - 1), now,
+                  task.stage, task.key, task.lease_id))
+        return dead
+
+    def outcomes(self, stage: str, keys: Sequence[str]) -> Dict[str, TaskOutcome]:
+        outcomes: Dict[str, TaskOutcome] = {}
+        with self._connect() as conn:
+            # Por tandas, para no superar el límite de parámetros de SQLite.
+            for start in range(0, len(keys), 500):
+                chunk = list(keys[start:start + 500])
+                rows = conn.execute(f"""
+                    SELECT item_key, status, result, error FROM tasks
+                    WHERE stage = ? AND status IN ('done', 'dead') AND item_key IN ({",".join("?" * len(chunk))})
+                """, (stage, *chunk)).fetchall()
+                for key, status, result, error in rows:
+                    outcomes[key] = TaskOutcome(status, json.loads(result) if result else None, error)
+        return outcomes
+
+    def cancel(self, stage: str, keys: Sequence[str]) -> int:
+        cancelled = 0
+        with self._transaction() as conn:
+            for start in range(0, len(keys), 500):
+                chunk = list(keys[start:start + 500])
+                cursor = conn.execute(f"""
+                    DELETE FROM tasks WHERE stage = ? AND status = 'pending' AND item_key IN ({",".join("?" * len(chunk))})
+                """, (stage, *chunk))
+                cancelled += cursor.rowcount
+        return cancelled
+
+    def requeue_dead(self, stage: Optional[str] = None) -> int:
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = 'pending', attempts = 0, available_at = ?, updated_at = ? "
+                "WHERE status = 'dead'" + (" AND stage = ?" if stage else ""),
+                (now, now, stage) if stage else (now, now))
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        stats: Dict[str, Dict[str, int]] = {}
+        with self._connect() as conn:
+            for stage, status, count in conn.execute("SELECT stage, status, COUNT(*) FROM tasks GROUP BY stage, status"):
+                stats.setdefault(stage, {})[status] = count
+        return stats
+
+
+TASK_QUEUE_BACKENDS: Dict[str, Callable[[], TaskQueue]] = {"sqlite": SQLiteTaskQueue}
+
+def register_task_queue_backend(name: str, factory: Callable[[], TaskQueue]) -> None:
+    """Registra un backend de cola (p. ej. uno sobre Redis) seleccionable con `TASK_QUEUE_BACKEND`."""
+    TASK_QUEUE_BACKENDS[name] = factory
+
+_task_queue: Optional[TaskQueue] = None
+_task_queue_lock = threading.Lock()
+
+def get_task_queue() -> TaskQueue:
+    """Devuelve la instancia compartida de la cola del backend configurado."""
+    global _task_queue
+    with _task_queue_lock:
+        if _task_queue is None:
+            _task_queue = TASK_QUEUE_BACKENDS[settings.TASK_QUEUE_BACKEND]()
+        return _task_queue
+
+
+# --- Lado productor: encolar una etapa y esperar a los workers ---
+
+# Etapas que procesan los workers (ver `src/worker.py`).
+SCRUTINIZE_STAGE, EXTRACT_STAGE, ENRICH_STAGE = "scrutinize", "extract", "enrich"
+WORKER_STAGES = (SCRUTINIZE_STAGE, EXTRACT_STAGE, ENRICH_STAGE)
+
+async def adispatch(stage: str, items: Sequence[Tuple[str, Any]], queue: Optional[TaskQueue] = None,
+                    timeout: float = settings.TASK_QUEUE_WAIT_TIMEOUT_SECONDS) -> Dict[str, TaskOutcome]:
+    """
+    Encola los items de una etapa y espera (sondeando la cola) a que los workers
+    los resuelvan. Las claves ya resueltas hace menos de `TASK_QUEUE_RESULT_TTL_SECONDS`
+    no se vuelven a procesar. Devuelve los resultados por clave; las que no se
+    resolvieron a tiempo (o si se agota el presupuesto de la ejecución) no aparecen.
+
+    Los workers no ven el presupuesto de la ejecución, así que se aplica aquí:
+    cada item nuevo se cobra (una llamada al LLM y los tokens de su payload) antes
+    de encolarlo, por orden de prioridad, y los que ya no caben no se encolan. Si
+    se alcanza el tiempo máximo mientras se espera, los items aún pendientes se
+    retiran de la cola; los ya arrendados terminan.
+    """
+    queue = queue or get_task_queue()
+    if not items:
+        return {}
+    outcomes: Dict[str, TaskOutcome] = await asyncio.to_thread(queue.outcomes, stage, [key for key, _ in items])
+    items = _charge_items([(key, payload) for key, payload in items if key not in outcomes])
+    enqueued = await asyncio.to_thread(queue.enqueue, stage, items)
+    print(f"\n[Task Queue] '{stage}': {len(items) + len(outcomes)} items ({enqueued} nuevos en la cola), esperando a los workers...")
+    pending = {key for key, _ in items}
+    budget = get_current_budget()
+    deadline = time.monotonic() + timeout
+    while pending:
+        resolved = await asyncio.to_thread(queue.outcomes, stage, list(pending))
+        outcomes.update(resolved)
+        pending.difference_update(resolved)
+        if not pending:
+            break
+        if time.monotonic() > deadline:
+            print(f"  -> ⏱️ {len(pending)} items de '{stage}' sin resolver tras {timeout:g}s (¿hay workers en marcha?).")
+            break
+        # Los items encolados ya están cobrados: solo el tiempo máximo corta la espera.
+        if budget is not None and budget.timed_out:
+            cancelled = await asyncio.to_thread(queue.cancel, stage, list(pending))
+            print(f"  -> ⛔ {cancelled} items pendientes de '{stage}' retirados de la cola (tiempo máximo agotado).")
+            break
+        await asyncio.sleep(settings.TASK_QUEUE_POLL_SECONDS)
+    dead = sum(1 for outcome in outcomes.values() if outcome.status == "dead")
+    if dead:
+        print(f"  -> ☠️ {dead} items de '{stage}' en la cola de fallidos.")
+    return outcomes
+
+
+def _charge_items(items: Sequence[Tuple[str, Any]]) -> Sequence[Tuple[str, Any]]:
+    """Cobra del presupuesto en curso cada item, en orden; devuelve los que caben."""
+    budget = get_current_budget()
+    if budget is None:
+        return items
+    for position, (_, payload) in enumerate(items):
+        try:
+            budget.charge(estimate_tokens(json.dumps(payload, ensure_ascii=False)))
+        except BudgetExceededError:
+            print(f"  -> ⛔ {len(items) - position} items no se encolan: presupuesto agotado.")
+            return items[:position]
+    return items
+
+
+# --- Cuotas por API key compartidas entre workers ---
+
+class SharedRateLimitRegistry:
+    """
+    Registro de cuotas por clave (una por API key) en SQLite, compartido por todos
+    los procesos que lo abren. Cada clave es una doble cubeta (peticiones y tokens
+    por minuto) con el mismo comportamiento que `TokenBucketRateLimiter`: reserva
+    atómica del hueco, pausa y reducción de la tasa ante un 429 y recuperación gradual.
+    Los workers con la misma API key se reparten su cuota; con keys distintas,
+    cada uno tiene la suya y el rendimiento total crece con el número de keys.
+    """
+
+    def __init__(self, path: str = settings.RATE_LIMIT_REGISTRY_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS buckets (
+                    bucket_key TEXT PRIMARY KEY,
+                    level REAL NOT NULL,
+                    token_level REAL,
+                    rate_scale REAL NOT NULL,
+                    blocked_until REAL NOT NULL,
+                    last_refill REAL NOT NULL
+                );
+            """)
+            # Registros creados antes de llevar la cuota de tokens.
+            if "token_level" not in {row[1] for row in conn.execute("PRAGMA table_info(buckets)")}:
+                conn.execute("ALTER TABLE buckets ADD COLUMN token_level REAL")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _transaction(self):
+        return _immediate_transaction(self.path)
+
+    def _update(self, key: str, requests_per_minute: int, burst: int, tokens_per_minute: Optional[int],
+                change: Callable[[float, float, float, float, float], Tuple[float, float, float, float, float]]
+                ) -> Tuple[float, float, float, float, float]:
+        now = time.time()
+        tpm = float(tokens_per_minute or 0)
+        with self._transaction() as conn:
+            row = conn.execute("SELECT level, token_level, rate_scale, blocked_until, last_refill FROM buckets WHERE bucket_key = ?",
+                               (key,)).fetchone()
+            level, token_level, rate_scale, blocked_until, last_refill = row or (float(burst), tpm, 1.0, 0.0, now)
+            elapsed_minutes = max(now - last_refill, 0) / 60.0
+            level = min(float(burst), level + elapsed_minutes * requests_per_minute * rate_scale)
+            token_level = min(tpm, (tpm if token_level is None else token_level) + elapsed_minutes * tpm * rate_scale)
+            level, token_level, rate_scale, blocked_until, now = change(level, token_level, rate_scale, blocked_until, now)
+            conn.execute("INSERT OR REPLACE INTO buckets (bucket_key, level, token_level, rate_scale, blocked_until, last_refill) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", (key, level, token_level, rate_scale, blocked_until, now))
+        return level, token_level, rate_scale, blocked_until, now
+
+    def reserve(self, key: str, requests_per_minute: int, burst: int,
+                tokens: int = 0, tokens_per_minute: Optional[int] = None) -> float:
+        """Reserva un hueco (y `tokens` de la cuota de tokens) en la cubeta `key`; devuelve los segundos de espera."""
+        # Una petición mayor que la cubeta entera nunca cabría; la acotamos.
+        cost = min(tokens, tokens_per_minute) if tokens_per_minute and tokens else 0
+        level, token_level, rate_scale, blocked_until, now = self._update(
+            key, requests_per_minute, burst, tokens_per_minute,
+            lambda lv, tk, sc, bl, now: (lv - 1, tk - cost, sc, bl, now))
+        delay = -level / (requests_per_minute / 60.0 * rate_scale) if level < 0 else 0.0
+        if cost and token_level < 0:
+            delay = max(delay, -token_level / (tokens_per_minute / 60.0 * rate_scale))
+        return max(delay, blocked_until - now)
+
+    def on_rate_limited(self, key: str, requests_per_minute: int, burst: int, tokens_per_minute: Optional[int] = None,
+                        retry_after: Optional[float] = None, min_rate_scale: float = 0.1) -> None:
+        pause = retry_after if retry_after is not None else 60.0 / requests_per_minute
+        self._update(key, requests_per_minute, burst, tokens_per_minute, lambda lv, tk, sc, bl, now: (
+            min(lv, 0.0), tk, max(min_rate_scale, sc * 0.5), max(bl, now + pause), now))
+
+    def on_success(self, key: str, requests_per_minute: int, burst: int, tokens_per_minute: Optional[int] = None,
+                   recovery_step: float = 0.05) -> None:
+        self._update(key, requests_per_minute, burst, tokens_per_minute,
+                     lambda lv, tk, sc, bl, now: (lv, tk, min(1.0, sc + recovery_step), bl, now))
+
+
+class SharedRateLimiter:
+    """
+    Limitador con la misma interfaz que `TokenBucketRateLimiter` (la que usa
+    `ainvoke_rate_limited`) pero cuyo estado vive en el `SharedRateLimitRegistry`,
+    bajo la clave de la API key: así varios workers no superan juntos su cuota
+    de peticiones ni la de tokens por minuto.
+    """
+
+    def __init__(self, key: str, requests_per_minute: int, tokens_per_minute: Optional[int] = None,
+                 burst: Optional[int] = None, registry: Optional[SharedRateLimitRegistry] = None):
+        self.key = key
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.burst = burst or max(1, requests_per_minute // 4)
+        self.registry = registry or get_rate_limit_registry()
+
+    def reserve(self, tokens: int = 0) -> float:
+        return self.registry.reserve(self.key, self.requests_per_minute, self.burst, tokens, self.tokens_per_minute)
+
+    async def acquire(self, tokens: int = 0) -> float:
+        delay = await asyncio.to_thread(self.reserve, tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def acquire_sync(self, tokens: int = 0) -> float:
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def on_rate_limited(self, retry_after: Optional[float] = None) -> None:
+        self.registry.on_rate_limited(self.key, self.requests_per_minute, self.burst, self.tokens_per_minute, retry_after)
+
+    def on_success(self) -> None:
+        self.registry.on_success(self.key, self.requests_per_minute, self.burst, self.tokens_per_minute)
+
+
+_rate_limit_registry: Optional[SharedRateLimitRegistry] = None
+_rate_limit_registry_lock = threading.Lock()
+
+def get_rate_limit_registry() -> SharedRateLimitRegistry:
+    """Devuelve la instancia compartida del registro de cuotas."""
+    global _rate_limit_registry
+    with _rate_limit_registry_lock:
+        if _rate_limit_registry is None:
+            _rate_limit_registry = SharedRateLimitRegistry()
+        return _rate_limit_registry
+
+def api_key_bucket(provider: str, api_key: Optional[str]) -> str:
+    """Clave de la cubeta de una API key sin guardar la key en claro."""
+    return f"{provider}:{hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()[:12]}"
@@ -0,0 +1,144 @@
+# src/utils/watch_state.py
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from ..config import settings
+from .dedup import simhash, hamming_distance
+from .normalizers import canonicalize_url
+from .content_reducer import DATE_PATTERN
+
+
+@dataclass
+class PageFingerprint:
+    """
+    Huella del texto reducido de una página:
+    - `text_hash`: hash estable del texto normalizado (cualquier cambio lo altera);
+    - `simhash`: huella SimHash, que apenas se mueve con ediciones menores;
+    - `dates_hash`: hash de las fechas que aparecen en la página (un cambio de
+      fecha es siempre material, aunque el SimHash apenas varíe).
+    """
+    text_hash: str
+    simhash: int
+    dates_hash: str
+
+    @classmethod
+    def from_text(cls, text: str) -> "PageFingerprint":
+        normalized = " ".join((text or "").lower().split())
+        dates = sorted({m.group(0) for m in DATE_PATTERN.finditer(normalized)})
+        return cls(
+            text_hash=hashlib.sha256(normalized.encode("utf-8")).hexdigest(),
+            simhash=simhash(normalized),
+            dates_hash=hashlib.sha256("|".join(dates).encode("utf-8")).hexdigest(),
+        )
+
+    def is_material_change(self, baseline: "PageFingerprint",
+                           max_distance: int = settings.WATCH_SIMHASH_MAX_DISTANCE) -> bool:
+        """Cambio material respecto a `baseline`: fechas distintas o texto más lejos que `max_distance`."""
+        if self.text_hash == baseline.text_hash:
+            return False
+        return self.dates_hash != baseline.dates_hash or hamming_distance(self.simhash, baseline.simhash) > max_distance
+
+
+class WatchStateStore:
+    """
+    Estado persistente del modo vigilancia (SQLite): por cada URL vigilada, el hash
+    del último cuerpo descargado y la huella de referencia (la del contenido con el
+    que se enriqueció por última vez). Las ediciones menores no mueven la referencia,
+    así que muchas ediciones pequeñas seguidas acaban contando como un cambio material.
+    Los cambios detectados se añaden a un feed JSONL.
+    """
+
+    def __init__(self, path: str = settings.WATCH_STATE_PATH, changes_path: str = settings.WATCH_CHANGES_PATH):
+        self.path = path
+        self.changes_path = changes_path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS pages (
+                    url_key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    body_hash TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    simhash TEXT NOT NULL,
+                    dates_hash TEXT NOT NULL,
+                    checked_at REAL NOT NULL,
+                    changed_at REAL NOT NULL
+                );
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Último hash de cuerpo y huella de referencia de la URL, o None si no se vigila aún."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT body_hash, text_hash, simhash, dates_hash, checked_at, changed_at FROM pages WHERE url_key = ?",
+                               (canonicalize_url(url),)).fetchone()
+        if row is None:
+            return None
+        return {
+            "body_hash": row[0],
+            # SQLite guarda enteros con signo de 64 bits: el SimHash va en hexadecimal.
+            "baseline": PageFingerprint(text_hash=row[1], simhash=int(row[2], 16), dates_hash=row[3]),
+            "checked_at": row[4], "changed_at": row[5],
+        }
+
+    def save_baseline(self, url: str, body_hash: str, fingerprint: PageFingerprint) -> None:
+        """Fija la huella de referencia (primera vez o tras re-enriquecer)."""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO pages (url_key, url, body_hash, text_hash, simhash, dates_hash, checked_at, changed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (canonicalize_url(url), url, body_hash, fingerprint.text_hash, f"{fingerprint.simhash:016x}",
+                  fingerprint.dates_hash, now, now))
+
+    def mark_checked(self, url: str, body_hash: str) -> None:
+        """Registra la revisión sin mover la referencia (sin cambios o cambio menor)."""
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE pages SET body_hash = ?, checked_at = ? WHERE url_key = ?",
+                         (body_hash, time.time(), canonicalize_url(url)))
+
+    def append_changes(self, changes: List[Dict]) -> None:
+        """Añade los cambios detectados al feed JSONL."""
+        if not changes:
+            return
+        os.makedirs(os.path.dirname(self.changes_path) or ".", exist_ok=True)
+        with self._lock, open(self.changes_path, "a", encoding="utf-8") as f:
+            for change in changes:
+                f.write(json.dumps(change, ensure_ascii=False) + "\n")
+
+    def load_changes(self, since: float = 0) -> List[Dict]:
+        """Cambios del feed detectados a partir de `since` (epoch)."""
+        if not os.path.exists(self.changes_path):
+            return []
+        changes = []
+        with open(self.changes_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    change = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if change.get("detected_at", 0) >= since:
+                    changes.append(change)
+        return changes
+
+
+_watch_state: Optional[WatchStateStore] = None
+_watch_state_lock = threading.Lock()
+
+def get_watch_state() -> WatchStateStore:
+    """Devuelve la instancia compartida del estado del modo vigilancia."""
+    global _watch_state
+    with _watch_state_lock:
+        if _watch_state is None:
+            _watch_state = WatchStateStore()
+        return _watch_state
@@ -0,0 +1,158 @@
+# src/worker.py
+"""
+Worker de la cola de tareas distribuida.
+
+Con `TASK_QUEUE_ENABLED=true`, el agente encola el escrutinio, la extracción y
+el enriquecimiento en vez de procesarlos en su propio proceso; cualquier número
+de workers (en este host o en otros que compartan la cola) los arriendan y
+resuelven. Cada worker puede usar su propia API key: las cuotas se llevan por
+key en un registro compartido, así que el rendimiento crece con el número de
+workers y de keys.
+
+Uso:
+    python -m src.worker                                   # todas las etapas
+    python -m src.worker --stages enrich --concurrency 16
+    python -m src.worker --api-key-env GEMINI_API_KEY_2    # otra key, otra cuota
+    python -m src.worker --drain                           # termina al vaciarse la cola
+    python -m src.worker --stats | --requeue-dead
+"""
+import os
+import json
+import socket
+import asyncio
+import argparse
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from langchain_core.runnables import Runnable
+
+from .config import settings
+from .components.scrutinizer import create_scrutinizer_chain, create_batch_scrutinizer_chain
+from .components.extractor import create_extractor_chain
+from .components.enricher import create_deep_dive_chain, find_best_url
+from .pipelines.discovery import create_llm_scrutinizer, create_item_extractor
+from .pipelines.enrichment import create_item_enricher
+from .schemas.models import FundingOpportunity
+from .utils.task_queue import (
+    Task, TaskQueue, SharedRateLimiter, SCRUTINIZE_STAGE, EXTRACT_STAGE, ENRICH_STAGE, WORKER_STAGES,
+    get_task_queue, api_key_bucket,
+)
+
+
+def create_stage_handlers(
+    rate_limiter,
+    scrutinizer_factory: Callable[[], Runnable] = create_scrutinizer_chain,
+    batch_scrutinizer_factory: Callable[[], Runnable] = create_batch_scrutinizer_chain,
+    extractor_factory: Callable[[], Runnable] = create_extractor_chain,
+    deep_dive_factory: Callable[[], Runnable] = create_deep_dive_chain,
+    url_finder: Callable[[Dict], Dict] = find_best_url,
+) -> Dict[str, Callable[[Any], Awaitable[Any]]]:
+    """
+    Funciones que resuelven un item de cada etapa con las mismas piezas que el
+    pipeline en un solo proceso. Reciben y devuelven JSON (lo que guarda la cola);
+    si lanzan una excepción, el item se reintenta y acaba en fallidos.
+    """
+    llm_scrutinize = create_llm_scrutinizer(scrutinizer_factory, batch_scrutinizer_factory, rate_limiter)
+    extract_item = create_item_extractor(extractor_factory, rate_limiter)
+    enrich_item = create_item_enricher(deep_dive_factory(), rate_limiter, url_finder=url_finder)
+
+    async def scrutinize(batch: List[Dict]) -> List[Optional[bool]]:
+        verdicts: Dict[int, bool] = {}
+        await llm_scrutinize(batch, on_verdict=lambda result, is_relevant: verdicts.__setitem__(id(result), is_relevant))
+        if not verdicts:
+            raise RuntimeError(f"Ningún veredicto para un lote de {len(batch)}")
+        return [verdicts.get(id(result)) for result in batch]
+
+    async def extract(result: Dict) -> List[Dict]:
+        return [o.model_dump(mode="json") for o in await extract_item(result)]
+
+    async def enrich(opportunity: Dict) -> Optional[Dict]:
+        enriched = await enrich_item(FundingOpportunity(**opportunity))
+        return enriched.model_dump(mode="json") if enriched is not None else None
+
+    return {SCRUTINIZE_STAGE: scrutinize, EXTRACT_STAGE: extract, ENRICH_STAGE: enrich}
+
+
+async def arun_worker(
+    handlers: Dict[str, Callable[[Any], Awaitable[Any]]],
+    stages: Sequence[str] = WORKER_STAGES,
+    queue: Optional[TaskQueue] = None,
+    worker_id: Optional[str] = None,
+    concurrency: int = settings.WORKER_CONCURRENCY,
+    drain: bool = False,
+) -> int:
+    """
+    Arrienda y procesa items de `stages` con `concurrency` bucles en paralelo.
+    Mientras un item está en proceso se renueva su arrendamiento, así que solo
+    vuelve a la cola si el worker muere. Con `drain`, termina cuando no quedan
+    items visibles. Devuelve el número de items procesados.
+    """
+    queue = queue or get_task_queue()
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    visibility = settings.TASK_QUEUE_VISIBILITY_TIMEOUT
+    processed = 0
+
+    async def keep_alive(task: Task) -> None:
+        while True:
+            await asyncio.sleep(visibility / 3)
+            if not await asyncio.to_thread(queue.extend, task, visibility):
+                return
+
+    async def work_loop() -> None:
+        nonlocal processed
+        while True:
+            task = await asyncio.to_thread(queue.lease, stages, worker_id, visibility)
+            if task is None:
+                if drain:
+                    return
+                await asyncio.sleep(settings.TASK_QUEUE_POLL_SECONDS)
+                continue
+            heartbeat = asyncio.create_task(keep_alive(task))
+            try:
+                result = await handlers[task.stage](task.payload)
+            except Exception as e:
+                dead = await asyncio.to_thread(queue.fail, task, f"{type(e).__name__}: {e}")
+                print(f"  -> ❌ [{task.stage}] intento {task.attempts} fallido{' (a fallidos)' if dead else ''}: {e}")
+            else:
+                await asyncio.to_thread(queue.complete, task, result)
+                processed += 1
+            finally:
+                heartbeat.cancel()
+
+    print(f"[Worker {worker_id}] Etapas: {', '.join(stages)} (concurrencia: {concurrency}).")
+    await asyncio.gather(*(work_loop() for _ in range(concurrency)))
+    return processed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Worker de la cola de tareas del agente de oportunidades.")
+    parser.add_argument("--stages", nargs="+", choices=WORKER_STAGES, default=list(WORKER_STAGES))
+    parser.add_argument("--concurrency", type=int, default=settings.WORKER_CONCURRENCY)
+    parser.add_argument("--api-key-env", help="Variable de entorno con la API key de Gemini de este worker.")
+    parser.add_argument("--rpm", type=int, default=settings.GEMINI_RPM_LIMIT, help="Cuota de la API key (peticiones/min).")
+    parser.add_argument("--tpm", type=int, default=settings.GEMINI_TPM_LIMIT, help="Cuota de la API key (tokens/min).")
+    parser.add_argument("--drain", action="store_true", help="Terminar cuando no queden items en la cola.")
+    parser.add_argument("--stats", action="store_true", help="Mostrar el estado de la cola y salir.")
+    parser.add_argument("--requeue-dead", action="store_true", help="Volver a encolar los items fallidos y salir.")
+    args = parser.parse_args(argv)
+
+    queue = get_task_queue()
+    if args.stats:
+        print(json.dumps(queue.stats(), indent=2))
+        return
+    if args.requeue_dead:
+        print(f"[Worker] {queue.requeue_dead()} items fallidos devueltos a la cola.")
+        return
+
+    if args.api_key_env:
+        settings.GEMINI_API_KEY = os.environ[args.api_key_env]
+    rate_limiter = SharedRateLimiter(api_key_bucket("gemini", settings.GEMINI_API_KEY), args.rpm, args.tpm)
+    handlers = create_stage_handlers(rate_limiter)
+    try:
+        processed = asyncio.run(arun_worker(handlers, args.stages, queue, concurrency=args.concurrency, drain=args.drain))
+        print(f"[Worker] {processed} items procesados.")
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()